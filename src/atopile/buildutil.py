@@ -7,18 +7,24 @@ from copy import deepcopy
 from pathlib import Path
 from typing import Callable, Optional
 
+import pathvalidate
+
 import faebryk.library._F as F
 from atopile import layout
-from atopile.cli.logging import LoggingStage
+from atopile.cli.logging import NOW, LoggingStage
 from atopile.config import config
 from atopile.errors import UserException, UserPickError
 from atopile.front_end import DeprecatedException
 from faebryk.core.cpp import set_max_paths
 from faebryk.core.module import Module
 from faebryk.core.pathfinder import MAX_PATHS
+from faebryk.core.solver.cache import SolverCache
 from faebryk.core.solver.defaultsolver import DefaultSolver
 from faebryk.core.solver.nullsolver import NullSolver
 from faebryk.core.solver.solver import Solver
+from faebryk.core.solver.trace import SolverTrace
+from faebryk.core.solver.utils import CACHE as SOLVER_CACHE
+from faebryk.core.solver.utils import PROFILE as SOLVER_PROFILE
 from faebryk.exporters.bom.jlcpcb import write_bom_jlcpcb
 from faebryk.exporters.documentation.i2c import export_i2c_tree
 from faebryk.exporters.netlist.graph import (
@@ -63,6 +69,8 @@ from faebryk.libs.exceptions import (
 )
 from faebryk.libs.kicad.fileformats_latest import C_kicad_fp_lib_table_file
 from faebryk.libs.picker.picker import PickError, pick_part_recursively
+from faebryk.libs.sexp import dataclass_sexp
+from faebryk.libs.sexp.decode_cache import DecodeCache
 from faebryk.libs.util import ConfigFlag, KeyErrorAmbiguous
 
 logger = logging.getLogger(__name__)
@@ -74,13 +82,26 @@ def _get_solver() -> Solver:
     if SKIP_SOLVING:
         logger.warning("Assertion checking is disabled")
         return NullSolver()
-    else:
-        return DefaultSolver()
+    solver = DefaultSolver()
+    if SOLVER_CACHE:
+        solver.cache = SolverCache(config.project.paths.build / "cache" / "solver")
+    if SOLVER_PROFILE:
+        solver.trace = SolverTrace(
+            config.project.paths.logs
+            / NOW
+            / pathvalidate.sanitize_filename(config.build.name)
+        )
+    return solver
 
 
 def build(app: Module) -> None:
     """Build the project."""
+    cache = DecodeCache() if dataclass_sexp.SEXP_CACHE else None
+    with dataclass_sexp.decode_cache(cache):
+        _build(app)
+
 
+def _build(app: Module) -> None:
     def G():
         return app.get_graph()
 
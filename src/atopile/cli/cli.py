@@ -19,6 +19,7 @@ from atopile.cli import (
     inspect,
     install,
     package,
+    solver_profile,
     view,
     lsp,
 )
@@ -150,6 +151,7 @@ app.command(rich_help_panel="Shortcuts")(install.sync)
 app.command(rich_help_panel="Shortcuts")(install.add)
 app.command(rich_help_panel="Shortcuts")(install.remove)
 app.add_typer(lsp.lsp_app, name="lsp", hidden=True)
+app.command(hidden=True)(solver_profile.solver_profile)
 
 
 @app.command(hidden=True)
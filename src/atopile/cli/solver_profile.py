@@ -0,0 +1,72 @@
+"""
+`ato solver-profile`
+"""
+
+import logging
+from pathlib import Path
+from typing import Annotated
+
+import typer
+
+from atopile import errors
+
+logger = logging.getLogger(__name__)
+
+
+def solver_profile(
+    paths: Annotated[
+        list[Path] | None,
+        typer.Argument(
+            help="Trace files or directories to search for them."
+            " Defaults to the build logs of the current project."
+        ),
+    ] = None,
+    top: Annotated[
+        int, typer.Option("--top", "-n", help="Number of algorithms to show")
+    ] = 20,
+):
+    """
+    Summarise solver traces, hottest algorithms first.
+
+    Record traces by building with FBRK_SPROFILE=1.
+    """
+    from rich.table import Table
+
+    from atopile.cli.console import console
+    from atopile.config import config
+    from faebryk.core.solver.trace import SolverTrace
+
+    if not paths:
+        config.apply_options(entry=None)
+        paths = [config.project.paths.logs]
+
+    records = SolverTrace.load(*paths)
+    if not records:
+        raise errors.UserFileNotFoundError(
+            "No solver traces found. Build with FBRK_SPROFILE=1 to record them."
+        )
+
+    stats = SolverTrace.summarize(records)
+    total = sum(s.total for s in stats)
+
+    table = Table(title=f"Solver profile: {len(records)} algorithm runs")
+    table.add_column("Algorithm")
+    table.add_column("Total [s]", justify="right")
+    table.add_column("Share", justify="right")
+    table.add_column("Runs", justify="right")
+    table.add_column("Dirty", justify="right")
+    table.add_column("Mean [ms]", justify="right")
+    table.add_column("Max [ms]", justify="right")
+
+    for s in stats[:top]:
+        table.add_row(
+            s.algorithm,
+            f"{s.total:.3f}",
+            f"{s.total / total:.1%}" if total else "-",
+            str(s.runs),
+            f"{s.dirty_rate:.0%}",
+            f"{s.mean * 1e3:.2f}",
+            f"{s.max * 1e3:.2f}",
+        )
+
+    console.print(table)
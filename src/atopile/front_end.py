@@ -7,6 +7,7 @@ import itertools
 import logging
 import operator
 import os
+import re
 import typing
 from collections import defaultdict
 from collections.abc import Callable, Generator
@@ -42,7 +43,7 @@ from atopile.datatypes import (
     TypeRef,
     is_int,
 )
-from atopile.parse import parser
+from atopile.parse import parser, read_source, stat_source
 from atopile.parser.AtoParser import AtoParser as ap
 from atopile.parser.AtoParserVisitor import AtoParserVisitor
 from faebryk.core.node import FieldExistsError, NodeException
@@ -74,6 +75,7 @@ from faebryk.libs.units import (
     Unit as UnitType,
 )
 from faebryk.libs.util import (
+    ConfigFlag,
     FuncDict,
     cast_assert,
     complete_type_string,
@@ -89,9 +91,29 @@ from faebryk.libs.util import (
 
 logger = logging.getLogger(__name__)
 
+BLOCK_PLANS = ConfigFlag(
+    "BLOCK_PLANS",
+    default=True,
+    descr="Replay precompiled plans of ato blocks instead of re-visiting their AST",
+)
+
 
 Numeric = Parameter | Arithmetic | Quantity_Set
 
+# `from "x.ato" import A` and the deprecated `import A from "x.ato"`
+_ATO_IMPORT = re.compile(
+    r"""\bfrom\s+(?P<q1>["'])(?P<a>[^"'\n]+\.ato)(?P=q1)\s+import\b"""
+    r"""|\bimport\s+[\w.]+\s+from\s+(?P<q2>["'])(?P<b>[^"'\n]+\.ato)(?P=q2)"""
+)
+
+
+def _scan_ato_imports(src: str) -> list[str]:
+    """
+    Paths of the .ato files a source imports from, without parsing it.
+    Approximate, only used to parse files ahead of their use.
+    """
+    return [m["a"] or m["b"] for m in _ATO_IMPORT.finditer(src)]
+
 
 class from_dsl(Trait.decless()):
     def __init__(self, src_ctx: ParserRuleContext) -> None:
@@ -552,6 +574,49 @@ class _ParameterDefinition:
         return len(self.ref) == 1
 
 
+@dataclass
+class _BlockPlan:
+    """
+    Instantiation plan of a block, replayed for every instance of it.
+
+    Holds the statements that do something when instantiated, flattened out of
+    their statement lists. Everything about them that doesn't depend on the
+    instance (field and type references, referenced classes, literals, units
+    and templates) is resolved once by `Bob._pre_resolved`.
+    """
+
+    steps: list[ParserRuleContext]
+
+    # Statements that are handled by the survey or have no effect on instances
+    _SKIPPED = (
+        ap.BlockdefContext,
+        ap.Import_stmtContext,
+        ap.Dep_import_stmtContext,
+        ap.Pass_stmtContext,
+        ap.String_stmtContext,
+        ap.Pragma_stmtContext,
+    )
+
+    @classmethod
+    def compile(cls, ctx: ap.BlockContext) -> "_BlockPlan":
+        if simple_stmts := ctx.simple_stmts():
+            stmts = [simple_stmts]
+        else:
+            stmts = [stmt.getChild(0) for stmt in ctx.stmt()]
+
+        steps = []
+        for stmt in stmts:
+            if isinstance(stmt, ap.Simple_stmtsContext):
+                children = [s.getChild(0) for s in stmt.simple_stmt()]
+            elif isinstance(stmt, ap.Compound_stmtContext):
+                children = [stmt.getChild(0)]
+            else:
+                children = [stmt]
+            steps.extend(c for c in children if not isinstance(c, cls._SKIPPED))
+
+        return cls(steps=steps)
+
+
 def _parse_pragma(pragma_text: str) -> tuple[str, list[str | int | float | bool]]:
     """
     pragma_stmt: '#pragma' function_call
@@ -700,6 +765,42 @@ class Bob(BasicsMixin, SequenceMixin, AtoParserVisitor):  # type: ignore  # Over
         self._failed_nodes = FuncDict[L.Node, set[str]]()
         self._in_for_loop = False  # Flag to detect nested loops
 
+        # Instantiation plans and their instance-independent results,
+        # shared between builds like the ASTs they're derived from
+        self._block_plans = FuncDict[ap.BlockContext, _BlockPlan]()
+        self._resolved = FuncDict[ParserRuleContext, Any]()
+        self._referenced_classes = FuncDict[
+            ParserRuleContext, dict[TypeRef, Type[L.Node] | ap.BlockdefContext]
+        ]()
+
+    def _pre_resolved[T](self, ctx: ParserRuleContext, resolve: Callable[[], T]) -> T:
+        """
+        Result of `resolve` for `ctx`, which must not depend on the node being
+        built. Only successful results are kept, so errors are raised for every
+        instance like before.
+        """
+        if not BLOCK_PLANS:
+            return resolve()
+        if ctx in self._resolved:
+            return self._resolved[ctx]
+        out = self._resolved[ctx] = resolve()
+        return out
+
+    def visitBlock(self, ctx: ap.BlockContext) -> KeyOptMap:
+        if not BLOCK_PLANS:
+            return super().visitBlock(ctx)
+        if ctx not in self._block_plans:
+            self._block_plans[ctx] = _BlockPlan.compile(ctx)
+        return self.visit_iterable_helper(self._block_plans[ctx].steps)
+
+    def visitTypeReference(self, ctx: ap.Type_referenceContext) -> TypeRef:
+        return self._pre_resolved(ctx, lambda: super(Bob, self).visitTypeReference(ctx))
+
+    def visitFieldReference(self, ctx: ap.Field_referenceContext) -> FieldRef:
+        return self._pre_resolved(
+            ctx, lambda: super(Bob, self).visitFieldReference(ctx)
+        )
+
     def _ensure_feature_enabled(
         self, ctx: ParserRuleContext, feature: _FeatureFlags.Feature
     ) -> None:
@@ -721,19 +822,23 @@ class Bob(BasicsMixin, SequenceMixin, AtoParserVisitor):  # type: ignore  # Over
         """Build a Module from an AST and reference."""
         file_path = self._sanitise_path(file_path) if file_path else None
         context = self.index_ast(ast, file_path)
+        self.prefetch_imports(context)
         return self._build(context, ref)
 
     def build_file(self, path: Path, ref: TypeRef) -> L.Node:
         """Build a Module from a file and reference."""
         context = self.index_file(self._sanitise_path(path))
+        self.prefetch_imports(context)
         return self._build(context, ref)
 
     def build_text(self, text: str, path: Path, ref: TypeRef) -> L.Node:
         """Build a Module from a string and reference."""
         context = self.index_text(text, path)
+        self.prefetch_imports(context)
         return self._build(context, ref)
 
     def _try_build_all(self, context: Context) -> dict[TypeRef, L.Node]:
+        self.prefetch_imports(context)
         out = {}
         with accumulate(errors.UserException) as accumulator:
             for ref in context.refs:
@@ -743,6 +848,13 @@ class Bob(BasicsMixin, SequenceMixin, AtoParserVisitor):  # type: ignore  # Over
 
         return out
 
+    def build_context(self, context: Context, ref: TypeRef) -> L.Node:
+        """
+        Build a Module from an indexed file and reference.
+        Imports aren't prefetched, see `prefetch_imports`.
+        """
+        return self._build(context, ref)
+
     def try_build_all_from_file(self, path: Path) -> dict[TypeRef, L.Node]:
         """
         Build each top-level block in a file.
@@ -956,6 +1068,38 @@ class Bob(BasicsMixin, SequenceMixin, AtoParserVisitor):  # type: ignore  # Over
         self._scopes[ast] = context
         return context
 
+    def forget(self, ast: ap.File_inputContext):
+        """
+        Drop everything kept about an AST that won't be built again,
+        eg. a superseded version of a document being edited.
+        """
+
+        def _in_ast(ctx: ParserRuleContext) -> bool:
+            while ctx.parentCtx is not None:
+                ctx = ctx.parentCtx
+            return ctx is ast
+
+        for cache in self._ast_caches():
+            for ctx in [ctx for ctx in cache if _in_ast(ctx)]:
+                del cache[ctx]
+
+    def clear_caches(self):
+        """
+        Drop everything kept about ASTs, eg. after imported files changed.
+        Contexts keep what their imports resolved to, so they all go.
+        """
+        for cache in self._ast_caches():
+            cache.clear()
+
+    def _ast_caches(self) -> list[FuncDict[ParserRuleContext, Any]]:
+        return [
+            self._scopes,
+            self._python_classes,
+            self._block_plans,
+            self._resolved,
+            self._referenced_classes,
+        ]  # type: ignore
+
     def index_file(self, file_path: Path) -> Context:
         ast = parser.get_ast_from_file(file_path)
         return self.index_ast(ast, file_path)
@@ -964,11 +1108,11 @@ class Bob(BasicsMixin, SequenceMixin, AtoParserVisitor):  # type: ignore  # Over
         ast = parser.get_ast_from_text(text, file_path)
         return self.index_ast(ast, file_path)
 
-    def _get_search_paths(self, context: Context) -> list[Path]:
+    def _get_search_paths(self, file_path: Path | None) -> list[Path]:
         search_paths = [Path(p) for p in self.search_paths]
 
-        if context.file_path is not None:
-            search_paths.insert(0, context.file_path.parent)
+        if file_path is not None:
+            search_paths.insert(0, file_path.parent)
 
         if config.has_project:
             search_paths += [config.project.paths.src, config.project.paths.modules]
@@ -978,22 +1122,62 @@ class Bob(BasicsMixin, SequenceMixin, AtoParserVisitor):  # type: ignore  # Over
 
         return search_paths
 
+    def _resolve_import_path(
+        self, file_path: Path | None, from_path: str
+    ) -> Path | None:
+        """Path of an import in the file at `file_path`, None if not found."""
+        for search_path in self._get_search_paths(file_path):
+            candidate_from_path = search_path / from_path
+            if candidate_from_path.exists():
+                return self._sanitise_path(candidate_from_path)
+        return None
+
+    def prefetch_imports(self, context: Context):
+        """
+        Parse the .ato files imported transitively from `context` ahead of
+        their use, in parallel where that pays off.
+
+        Imports are found by scanning the sources rather than surveying them,
+        so resolving them and reporting errors stays with `_import_item`.
+        Files parsed before aren't read again, nor are their imports followed.
+        """
+        sources: dict[Path, str] = {}
+        stats: dict[Path, tuple[int, int]] = {}
+        frontier = [
+            (context.file_path, from_path)
+            for from_path in _scan_ato_imports(
+                context.scope_ctx.start.getInputStream().strdata
+            )
+        ]
+        while frontier:
+            file_path, from_path = frontier.pop()
+            path = self._resolve_import_path(file_path, from_path)
+            if (
+                path is None
+                or path in sources
+                or str(path) in parser.cache
+                or not path.is_file()
+            ):
+                continue
+            try:
+                stats[path] = stat_source(path)
+                sources[path] = read_source(path)
+            except (OSError, UnicodeDecodeError):
+                continue
+            frontier += [(path, p) for p in _scan_ato_imports(sources[path])]
+
+        parser.prefetch(sources, stats)
+
     def _import_item(
         self, context: Context, item: Context.ImportPlaceholder
     ) -> Type[L.Node] | ap.BlockdefContext:
-        # Build up search paths to check for the import in
-        # Iterate though them, checking if any contains the thing we're looking for
-        search_paths = self._get_search_paths(context)
-        for search_path in search_paths:
-            candidate_from_path = search_path / item.from_path
-            if candidate_from_path.exists():
-                break
-        else:
+        # Check the search paths in order for the thing we're looking for
+        from_path = self._resolve_import_path(context.file_path, item.from_path)
+        if from_path is None:
             raise errors.UserFileNotFoundError.from_ctx(
                 item.original_ctx, f"Unable to resolve import `{item.from_path}`"
             )
 
-        from_path = self._sanitise_path(candidate_from_path)
         if from_path.suffix == ".py":
             try:
                 node = import_from_path(from_path)
@@ -1047,6 +1231,16 @@ class Bob(BasicsMixin, SequenceMixin, AtoParserVisitor):  # type: ignore  # Over
         based on Bob's current context. The contextual nature
         of this means that it's only useful during the build process.
         """
+        if not BLOCK_PLANS:
+            return self._resolve_referenced_class(ctx, ref)
+        refs = self._referenced_classes.setdefault(ctx, {})
+        if ref not in refs:
+            refs[ref] = self._resolve_referenced_class(ctx, ref)
+        return refs[ref]
+
+    def _resolve_referenced_class(
+        self, ctx: ParserRuleContext, ref: TypeRef
+    ) -> Type[L.Node] | ap.BlockdefContext:
         # No change in position from the current context
         # return self, eg the current parser context
         if ref == tuple():
@@ -2202,6 +2396,9 @@ class Bob(BasicsMixin, SequenceMixin, AtoParserVisitor):  # type: ignore  # Over
 
     def _get_unit_from_ctx(self, ctx: ParserRuleContext) -> UnitType:
         """Return a pint unit from a context."""
+        return self._pre_resolved(ctx, lambda: self._parse_unit(ctx))
+
+    def _parse_unit(self, ctx: ParserRuleContext) -> UnitType:
         unit_str = ctx.getText()
         try:
             return P.Unit(unit_str)
@@ -2216,6 +2413,11 @@ class Bob(BasicsMixin, SequenceMixin, AtoParserVisitor):  # type: ignore  # Over
         self, ctx: ap.Literal_physicalContext
     ) -> Quantity_Interval:
         """Yield a physical value from a physical context."""
+        return self._pre_resolved(ctx, lambda: self._interpret_literal_physical(ctx))
+
+    def _interpret_literal_physical(
+        self, ctx: ap.Literal_physicalContext
+    ) -> Quantity_Interval:
         if ctx.quantity():
             qty = self.visitQuantity(ctx.quantity())
             value = Single(qty)
@@ -2648,11 +2850,15 @@ class Bob(BasicsMixin, SequenceMixin, AtoParserVisitor):  # type: ignore  # Over
         if ctx is None:
             return {}
 
-        kwargs = {
-            k: v for k, v in (self.visitTemplate_arg(arg) for arg in ctx.template_arg())
-        }
+        kwargs = self._pre_resolved(
+            ctx,
+            lambda: {
+                k: v
+                for k, v in (self.visitTemplate_arg(arg) for arg in ctx.template_arg())
+            },
+        )
 
-        return kwargs
+        return dict(kwargs)
 
 
 bob = Bob()
@@ -0,0 +1,309 @@
+"""
+Diagnostics of .ato documents for the language server.
+
+Documents are built again on every edit, so results are kept between builds:
+ASTs and contexts of imported files stay with the front-end while the files
+are unchanged on disk, and the diagnostics of each top-level block of a
+document are reused while neither the block nor any block of the document it
+depends on changed.
+"""
+
+import bisect
+import hashlib
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+
+import attrs
+import lsprotocol.types as lsp
+from antlr4 import ParserRuleContext
+
+from atopile import front_end
+from atopile.errors import UserException
+from atopile.parse import parser
+from atopile.parse_utils import get_src_info_from_token
+from atopile.parser.AtoParser import AtoParser as ap
+from faebryk.libs.exceptions import DowngradedExceptionCollector, iter_leaf_exceptions
+
+logger = logging.getLogger(__name__)
+
+SOURCE = "atopile"
+
+
+def convert_exc_to_diagnostic(
+    exc: UserException, severity: lsp.DiagnosticSeverity = lsp.DiagnosticSeverity.Error
+) -> tuple[Path | None, lsp.Diagnostic]:
+    # default to the start of the file
+    start_file_path = None
+    start_line, start_col = 0, 0
+    stop_line, stop_col = 0, 0
+
+    if exc.origin_start is not None:
+        start_file_path, start_line, start_col = get_src_info_from_token(
+            exc.origin_start
+        )
+
+        if exc.origin_stop is not None:
+            stop_file_path, stop_line, stop_col = get_src_info_from_token(
+                exc.origin_stop
+            )
+        else:
+            # just extend to the next line
+            stop_line, stop_col = start_line + 1, 0
+
+    # convert from 1-indexed (ANTLR) to 0-indexed (LSP)
+    start_line = max(start_line - 1, 0)
+    stop_line = max(stop_line - 1, 0)
+
+    return Path(start_file_path) if start_file_path else None, lsp.Diagnostic(
+        range=lsp.Range(
+            start=lsp.Position(line=start_line, character=start_col),
+            end=lsp.Position(line=stop_line, character=stop_col),
+        ),
+        message=exc.message,
+        severity=severity,
+        code=exc.code,
+        source=SOURCE,
+        # TODO: tags
+    )
+
+
+def paths_are_equivalent(path1: Path, path2: Path) -> bool:
+    return path1.resolve() == path2.resolve()
+
+
+def _collect(
+    build: Callable[[], object],
+) -> list[tuple[Path | None, lsp.Diagnostic]]:
+    """Errors and warnings raised by `build`."""
+    exc_diagnostics = []
+    with DowngradedExceptionCollector(UserException) as collector:
+        try:
+            build()
+        except* UserException as e:
+            exc_diagnostics = [
+                convert_exc_to_diagnostic(error) for error in iter_leaf_exceptions(e)
+            ]
+
+        warning_diagnostics = [
+            convert_exc_to_diagnostic(error, severity=lsp.DiagnosticSeverity.Warning)
+            for error, severity in collector
+            if severity == logging.WARNING
+        ]
+    return exc_diagnostics + warning_diagnostics
+
+
+def _shift(diagnostic: lsp.Diagnostic, lines: int) -> lsp.Diagnostic:
+    start, end = diagnostic.range.start, diagnostic.range.end
+    return attrs.evolve(
+        diagnostic,
+        range=lsp.Range(
+            start=lsp.Position(line=start.line + lines, character=start.character),
+            end=lsp.Position(line=end.line + lines, character=end.character),
+        ),
+    )
+
+
+@dataclass
+class _Statement:
+    """A top-level statement of a document."""
+
+    # block name, or position among the other statements
+    key: str
+    # 0-indexed, like LSP positions
+    line: int
+    text: str
+    blockdef: ap.BlockdefContext | None
+
+
+def _statements(tree: ap.File_inputContext) -> list[_Statement]:
+    src = tree.start.getInputStream()
+    out = []
+    for stmt in tree.stmt():
+        text = src.getText(stmt.start.start, stmt.stop.stop)
+        if (compound := stmt.compound_stmt()) and (blockdef := compound.blockdef()):
+            key = blockdef.name().getText()
+        else:
+            blockdef = None
+            key = f"#{sum(1 for s in out if s.blockdef is None)}"
+        out.append(_Statement(key, stmt.start.line - 1, text, blockdef))
+    return out
+
+
+def _referenced_names(ctx: ParserRuleContext) -> set[str]:
+    names = set()
+    stack = [ctx]
+    while stack:
+        ctx = stack.pop()
+        if isinstance(ctx, ap.Type_referenceContext):
+            names.add(ctx.getText().split(".")[0])
+        elif isinstance(ctx, ParserRuleContext):
+            stack.extend(ctx.children or [])
+    return names
+
+
+def _signatures(statements: list[_Statement]) -> dict[str, str]:
+    """
+    Per block, a hash of what its build depends on in the document: the other
+    top-level statements (imports, pragmas, ...), the block and the blocks it
+    references, directly or not.
+    """
+    blocks = {s.key: s for s in statements if s.blockdef is not None}
+    references = {
+        key: _referenced_names(s.blockdef) & blocks.keys()
+        for key, s in blocks.items()
+        if s.blockdef is not None
+    }
+    header = [s.text for s in statements if s.blockdef is None]
+
+    out = {}
+    for key in blocks:
+        dependencies = {key}
+        todo = [key]
+        while todo:
+            for name in references[todo.pop()] - dependencies:
+                dependencies.add(name)
+                todo.append(name)
+        h = hashlib.sha256()
+        for text in header + [blocks[name].text for name in sorted(dependencies)]:
+            h.update(text.encode())
+            h.update(b"\0")
+        out[key] = h.hexdigest()
+    return out
+
+
+class DocumentDiagnostics:
+    """
+    Builds documents for their diagnostics, reusing results of unchanged blocks.
+
+    Not thread-safe, like the front-end it drives.
+    """
+
+    @dataclass
+    class _BlockResult:
+        signature: str
+        # diagnostics in the document with lines relative to the statement
+        # they start in, None for diagnostics without a location
+        diagnostics: list[tuple[str | None, lsp.Diagnostic]]
+
+    def __init__(self):
+        self._trees: dict[Path, ap.File_inputContext] = {}
+        self._results: dict[Path, dict[str, DocumentDiagnostics._BlockResult]] = {}
+
+    def forget(self, file_path: Path):
+        """Drop everything kept about a document, eg. when it's closed."""
+        self._results.pop(file_path, None)
+        if (tree := self._trees.pop(file_path, None)) is not None:
+            front_end.bob.forget(tree)
+
+    def get(
+        self,
+        file_path: Path,
+        source: str,
+        cancelled: Callable[[], bool] = lambda: False,
+    ) -> list[lsp.Diagnostic] | None:
+        """
+        Diagnostics of the document at `file_path` with content `source`.
+
+        `cancelled` is checked between blocks, None is returned once it's True.
+        """
+        if changed := parser.changed_files():
+            logger.debug(f"Dropping all ASTs, changed on disk: {changed}")
+            parser.clear()
+            front_end.bob.clear_caches()
+            self._trees.clear()
+            self._results.clear()
+
+        results = self._results.setdefault(file_path, {})
+        bob = front_end.bob
+        trees: list[ap.File_inputContext] = []
+        contexts: list[front_end.Context] = []
+
+        def _index():
+            tree = parser.get_ast_from_text(source, file_path)
+            trees.append(tree)
+            contexts.append(bob.index_ast(tree, file_path))
+            bob.prefetch_imports(contexts[0])
+
+        diagnostics = _collect(_index)
+        if not contexts:
+            # keep the results of the last good version for when it's fixed
+            return self._in_document(file_path, diagnostics)
+
+        if (old := self._trees.get(file_path)) is not None:
+            bob.forget(old)
+        self._trees[file_path] = trees[0]
+        context = contexts[0]
+
+        statements = _statements(trees[0])
+        by_key = {s.key: s for s in statements}
+        blockdef_keys = {id(s.blockdef): s.key for s in statements if s.blockdef}
+        signatures = _signatures(statements)
+        starts = [s.line for s in statements]
+
+        for key in list(results):
+            if key not in signatures:
+                del results[key]
+
+        # building resolves imports in place, so iterate over the indexed refs
+        for ref, item in list(context.refs.items()):
+            if not isinstance(item, ap.BlockdefContext):
+                continue
+            # blocks imported from other documents
+            if (key := blockdef_keys.get(id(item))) is None:
+                continue
+            result = results.get(key)
+            if (
+                result is not None
+                and result.signature == signatures[key]
+                and all(k is None or k in by_key for k, _ in result.diagnostics)
+            ):
+                continue
+            if cancelled():
+                return None
+
+            stored = []
+            for path, diagnostic in _collect(partial(bob.build_context, context, ref)):
+                if path is None:
+                    stored.append((None, diagnostic))
+                elif paths_are_equivalent(file_path, path):
+                    line = diagnostic.range.start.line
+                    index = max(bisect.bisect_right(starts, line) - 1, 0)
+                    statement = statements[index]
+                    stored.append((statement.key, _shift(diagnostic, -statement.line)))
+            results[key] = self._BlockResult(signatures[key], stored)
+
+        out = self._in_document(file_path, diagnostics)
+        for result in results.values():
+            for key, diagnostic in result.diagnostics:
+                out.append(
+                    diagnostic if key is None else _shift(diagnostic, by_key[key].line)
+                )
+        # blocks building the same dependencies report the same problems
+        unique = {}
+        for diagnostic in out:
+            unique.setdefault(
+                (
+                    diagnostic.range.start.line,
+                    diagnostic.range.start.character,
+                    diagnostic.range.end.line,
+                    diagnostic.range.end.character,
+                    diagnostic.message,
+                    diagnostic.severity,
+                ),
+                diagnostic,
+            )
+        return list(unique.values())
+
+    @staticmethod
+    def _in_document(
+        file_path: Path, diagnostics: list[tuple[Path | None, lsp.Diagnostic]]
+    ) -> list[lsp.Diagnostic]:
+        return [
+            diagnostic
+            for diagnostic_file_path, diagnostic in diagnostics
+            if diagnostic_file_path is None
+            or paths_are_equivalent(file_path, diagnostic_file_path)
+        ]
@@ -6,20 +6,15 @@ from __future__ import annotations
 
 import copy
 import json
-import logging
 import os
 import pathlib
 import sys
+import threading
 import traceback
 from importlib.metadata import version as get_package_version
 from pathlib import Path
 from typing import Any, Optional, Protocol, Sequence
 
-from atopile import front_end
-from atopile.errors import UserException
-from atopile.parse_utils import get_src_info_from_token
-from faebryk.libs.exceptions import DowngradedExceptionCollector, iter_leaf_exceptions
-
 # **********************************************************
 # Utils for interacting with the atopile front-end
 # **********************************************************
@@ -59,6 +54,7 @@ from pygls import server, uris, workspace  # noqa: E402
 
 import atopile.lsp.lsp_jsonrpc as jsonrpc  # noqa: E402
 import atopile.lsp.lsp_utils as utils  # noqa: E402
+from atopile.lsp.lsp_worker import BuildWorker, Diagnostics  # noqa: E402
 
 WORKSPACE_SETTINGS = {}
 GLOBAL_SETTINGS = {}
@@ -66,6 +62,8 @@ RUNNER = pathlib.Path(__file__).parent / "lsp_runner.py"
 DISTRIBUTION_NAME = "atopile"
 
 MAX_WORKERS = 5
+# Time to wait for further changes of a document before building it [s]
+DEBOUNCE_DELAY = 0.3
 # TODO: Update the language server name and version.
 LSP_SERVER = server.LanguageServer(
     name=DISTRIBUTION_NAME,
@@ -120,80 +118,50 @@ def get_file_contents(uri: str) -> tuple[Path, str]:
 # Linting features start here
 # **********************************************************
 
+_PENDING_LOCK = threading.Lock()
+_PENDING_BUILDS: dict[str, threading.Timer] = {}
 
-def _convert_exc_to_diagnostic(
-    exc: UserException, severity: lsp.DiagnosticSeverity = lsp.DiagnosticSeverity.Error
-) -> tuple[Path | None, lsp.Diagnostic]:
-    # default to the start of the file
-    start_file_path = None
-    start_line, start_col = 0, 0
-    stop_line, stop_col = 0, 0
 
-    if exc.origin_start is not None:
-        start_file_path, start_line, start_col = get_src_info_from_token(
-            exc.origin_start
-        )
+def _document_version(uri: str) -> int | None:
+    return LSP_SERVER.workspace.get_text_document(uri).version
 
-        if exc.origin_stop is not None:
-            stop_file_path, stop_line, stop_col = get_src_info_from_token(
-                exc.origin_stop
-            )
-        else:
-            # just extend to the next line
-            stop_line, stop_col = start_line + 1, 0
-
-    # convert from 1-indexed (ANTLR) to 0-indexed (LSP)
-    start_line = max(start_line - 1, 0)
-    stop_line = max(stop_line - 1, 0)
-
-    return Path(start_file_path) if start_file_path else None, lsp.Diagnostic(
-        range=lsp.Range(
-            start=lsp.Position(line=start_line, character=start_col),
-            end=lsp.Position(line=stop_line, character=stop_col),
-        ),
-        message=exc.message,
-        severity=severity,
-        code=exc.code,
-        source=TOOL_DISPLAY,
-        # TODO: tags
-    )
 
+def _publish(result: Diagnostics) -> None:
+    # results of superseded versions are dropped, the new one is on its way
+    if _document_version(result.uri) == result.version:
+        LSP_SERVER.publish_diagnostics(result.uri, result.diagnostics, result.version)
 
-def _paths_are_equivalent(path1: Path, path2: Path) -> bool:
-    return path1.resolve() == path2.resolve()
 
+BUILD_WORKER = BuildWorker(
+    on_diagnostics=lambda result: LSP_SERVER.loop.call_soon_threadsafe(
+        _publish, result
+    ),
+    on_failure=lambda message: LSP_SERVER.loop.call_soon_threadsafe(log_error, message),
+)
 
-def _get_diagnostics(uri: str, identifier: str | None = None) -> list[lsp.Diagnostic]:
-    """
-    Get static diagnostics for a given URI and identifier.
-
-    TODO: caching
-    """
-    file_path, source_text = get_file_contents(uri)
-    exc_diagnostics = []
-
-    with DowngradedExceptionCollector(UserException) as collector:
-        try:
-            front_end.bob.try_build_all_from_text(source_text, file_path)
-        except* UserException as e:
-            exc_diagnostics = [
-                _convert_exc_to_diagnostic(error) for error in iter_leaf_exceptions(e)
-            ]
 
-        warning_diagnostics = [
-            _convert_exc_to_diagnostic(error, severity=lsp.DiagnosticSeverity.Warning)
-            for error, severity in collector
-            if severity == logging.WARNING
-        ]
+def _build(uri: str) -> None:
+    # read text and version together, so the diagnostics match the text built
+    document = LSP_SERVER.workspace.get_text_document(uri)
+    BUILD_WORKER.diagnose(uri, document.version, Path(document.path), document.source)
 
-    document_file_path = get_file(uri)
 
-    return [
-        diag
-        for diag_file_path, diag in exc_diagnostics + warning_diagnostics
-        if diag_file_path is None
-        or _paths_are_equivalent(document_file_path, diag_file_path)
-    ]
+def _schedule_diagnostics(uri: str, delay: float = 0) -> None:
+    """
+    Build the document for its diagnostics after `delay`, replacing a build
+    scheduled before that hasn't started yet.
+    Builds of earlier versions still running are abandoned by the worker.
+    """
+    with _PENDING_LOCK:
+        if (pending := _PENDING_BUILDS.pop(uri, None)) is not None:
+            pending.cancel()
+        if not delay:
+            _build(uri)
+            return
+        timer = threading.Timer(delay, _build, args=(uri,))
+        timer.daemon = True
+        _PENDING_BUILDS[uri] = timer
+        timer.start()
 
 
 @LSP_SERVER.feature(
@@ -206,34 +174,35 @@ def _get_diagnostics(uri: str, identifier: str | None = None) -> list[lsp.Diagno
 )
 def on_document_diagnostic(params: lsp.DocumentDiagnosticParams) -> None:
     """Handle document diagnostic request."""
-    LSP_SERVER.publish_diagnostics(
-        params.text_document.uri, _get_diagnostics(params.text_document.uri)
-    )
+    _schedule_diagnostics(params.text_document.uri)
 
 
 @LSP_SERVER.feature(lsp.TEXT_DOCUMENT_DID_OPEN)
 def on_document_did_open(params: lsp.DidOpenTextDocumentParams) -> None:
     """Handle document open request."""
-    LSP_SERVER.publish_diagnostics(
-        params.text_document.uri, _get_diagnostics(params.text_document.uri)
-    )
+    _schedule_diagnostics(params.text_document.uri)
 
 
 @LSP_SERVER.feature(lsp.TEXT_DOCUMENT_DID_CHANGE)
 def on_document_did_change(params: lsp.DidChangeTextDocumentParams) -> None:
     """Handle document change request."""
-    # TODO: debounce
-    LSP_SERVER.publish_diagnostics(
-        params.text_document.uri, _get_diagnostics(params.text_document.uri)
-    )
+    _schedule_diagnostics(params.text_document.uri, delay=DEBOUNCE_DELAY)
 
 
 @LSP_SERVER.feature(lsp.TEXT_DOCUMENT_DID_SAVE)
 def on_document_did_save(params: lsp.DidSaveTextDocumentParams) -> None:
     """Handle document save request."""
-    LSP_SERVER.publish_diagnostics(
-        params.text_document.uri, _get_diagnostics(params.text_document.uri)
-    )
+    _schedule_diagnostics(params.text_document.uri)
+
+
+@LSP_SERVER.feature(lsp.TEXT_DOCUMENT_DID_CLOSE)
+def on_document_did_close(params: lsp.DidCloseTextDocumentParams) -> None:
+    """Handle document close request."""
+    uri = params.text_document.uri
+    with _PENDING_LOCK:
+        if (pending := _PENDING_BUILDS.pop(uri, None)) is not None:
+            pending.cancel()
+    BUILD_WORKER.forget(Path(uris.to_fs_path(uri)))
 
 
 # TODO: if you want to handle setting specific severity for your linter
@@ -282,6 +251,7 @@ def initialize(params: lsp.InitializeParams) -> None:
 
     working_dir = Path(WORKSPACE_SETTINGS.get("workspaceFS", os.getcwd()))
     log_to_output(f"Initializing atopile config for `{working_dir}`")
+    BUILD_WORKER.initialize(working_dir)
     init_atopile_config(working_dir)
 
 
@@ -289,12 +259,14 @@ def initialize(params: lsp.InitializeParams) -> None:
 def on_exit(_params: Optional[Any] = None) -> None:
     """Handle clean up on exit."""
     jsonrpc.shutdown_json_rpc()
+    BUILD_WORKER.close()
 
 
 @LSP_SERVER.feature(lsp.SHUTDOWN)
 def on_shutdown(_params: Optional[Any] = None) -> None:
     """Handle clean up on shutdown."""
     jsonrpc.shutdown_json_rpc()
+    BUILD_WORKER.close()
 
 
 def _get_global_defaults():
@@ -0,0 +1,222 @@
+"""
+Builds for the language server, off the server thread.
+
+Builds are slow and hold the GIL, so by default they run in a long-lived
+worker process, which keeps the front-end's caches and the imported library
+warm between builds. Requests for a document supersede earlier ones: those
+not started yet are skipped, running ones are abandoned between blocks.
+"""
+
+import atexit
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import traceback
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from pathlib import Path
+
+import lsprotocol.types as lsp
+
+from faebryk.libs.util import ConfigFlag
+
+logger = logging.getLogger(__name__)
+
+LSP_BUILD_WORKER = ConfigFlag(
+    "LSP_BUILD_WORKER",
+    default=True,
+    descr="Build documents for the language server in a worker process",
+)
+
+
+@dataclass
+class Initialize:
+    working_dir: Path
+
+
+@dataclass
+class Diagnose:
+    uri: str
+    version: int | None
+    file_path: Path
+    source: str
+
+
+@dataclass
+class Forget:
+    file_path: Path
+
+
+@dataclass
+class Diagnostics:
+    uri: str
+    version: int | None
+    diagnostics: list[lsp.Diagnostic]
+
+
+@dataclass
+class Failed:
+    message: str
+
+
+def _serve(conn: Connection, in_process: bool = False):
+    """Handle requests from `conn` until it's closed."""
+    if not in_process:
+        # stdout carries the language server protocol
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+        sys.stdout = sys.stderr
+
+    import faebryk.library._F  # noqa: F401
+    from atopile.config import config
+    from atopile.lsp.lsp_diagnostics import DocumentDiagnostics
+
+    documents = DocumentDiagnostics()
+    pending: deque[Initialize | Diagnose | Forget] = deque()
+
+    def _receive():
+        while conn.poll():
+            pending.append(conn.recv())
+
+    def _superseded(request: Diagnose) -> bool:
+        _receive()
+        return any(
+            isinstance(r, Diagnose) and r.file_path == request.file_path
+            for r in pending
+        )
+
+    while True:
+        if not pending:
+            try:
+                pending.append(conn.recv())
+            except (EOFError, OSError):
+                return
+        request = pending.popleft()
+        try:
+            match request:
+                case Initialize(working_dir):
+                    config.apply_options(entry=None, working_dir=working_dir)
+                case Forget(file_path):
+                    documents.forget(file_path)
+                case Diagnose():
+                    if _superseded(request):
+                        continue
+                    diagnostics = documents.get(
+                        request.file_path,
+                        request.source,
+                        cancelled=lambda: _superseded(request),
+                    )
+                    if diagnostics is not None:
+                        conn.send(
+                            Diagnostics(request.uri, request.version, diagnostics)
+                        )
+        except (EOFError, OSError):
+            return
+        except Exception:
+            conn.send(Failed(traceback.format_exc(chain=True)))
+
+
+class BuildWorker:
+    """
+    Runs builds in a worker process, or a thread of this one.
+
+    The worker is started on first use and again if it died, replaying the
+    last `initialize`. Results are passed to the callbacks from a background
+    thread.
+    """
+
+    def __init__(
+        self,
+        on_diagnostics: Callable[[Diagnostics], None],
+        on_failure: Callable[[str], None],
+        in_process: bool | None = None,
+    ):
+        self.on_diagnostics = on_diagnostics
+        self.on_failure = on_failure
+        self.in_process = (not LSP_BUILD_WORKER) if in_process is None else in_process
+
+        self._lock = threading.Lock()
+        self._conn: Connection | None = None
+        self._worker: multiprocessing.Process | threading.Thread | None = None
+        self._initialize: Initialize | None = None
+        # before multiprocessing joins its non-daemonic children at exit
+        atexit.register(self.close)
+
+    def initialize(self, working_dir: Path):
+        self._initialize = Initialize(working_dir)
+        self._send(self._initialize)
+
+    def diagnose(
+        self, uri: str, version: int | None, file_path: Path, source: str
+    ) -> None:
+        self._send(Diagnose(uri, version, file_path, source))
+
+    def forget(self, file_path: Path):
+        self._send(Forget(file_path))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            if isinstance(self._worker, multiprocessing.Process):
+                self._worker.join(timeout=1)
+                if self._worker.is_alive():
+                    self._worker.terminate()
+            self._conn = self._worker = None
+
+    def _send(self, message: Initialize | Diagnose | Forget):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._start()
+                if message is self._initialize:
+                    return
+            assert self._conn is not None
+            try:
+                self._conn.send(message)
+            except OSError:
+                # died since checking, the next message starts it again
+                logger.debug("Build worker died", exc_info=True)
+
+    def _start(self):
+        if self._worker is not None:
+            self.on_failure("Build worker died, restarting it")
+        if self.in_process:
+            self._conn, child = multiprocessing.Pipe()
+            self._worker = threading.Thread(
+                target=_serve, args=(child, True), name="ato-lsp-build", daemon=True
+            )
+        else:
+            # not forked, the server has threads of its own
+            context = multiprocessing.get_context("spawn")
+            self._conn, child = context.Pipe()
+            # not daemonic, daemons can't start the parse pool
+            # stopped in `close`, which also runs at exit
+            self._worker = context.Process(
+                target=_serve, args=(child,), name="ato-lsp-build"
+            )
+        self._worker.start()
+        if isinstance(self._worker, multiprocessing.Process):
+            child.close()
+        if self._initialize is not None:
+            self._conn.send(self._initialize)
+        threading.Thread(
+            target=self._receive,
+            args=(self._conn,),
+            name="ato-lsp-results",
+            daemon=True,
+        ).start()
+
+    def _receive(self, conn: Connection):
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            match message:
+                case Diagnostics():
+                    self.on_diagnostics(message)
+                case Failed(text):
+                    self.on_failure(text)
@@ -1,4 +1,8 @@
 import logging
+import multiprocessing
+import os
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
 from os import PathLike
 from pathlib import Path
 
@@ -7,12 +11,27 @@ from antlr4.error.ErrorListener import ErrorListener
 
 from atopile.parser.AtoLexer import AtoLexer
 from atopile.parser.AtoParser import AtoParser
+from faebryk.libs.util import ConfigFlagInt
 
+from . import parse_cache
 from .errors import UserFileNotFoundError, UserSyntaxError
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 
+PARSE_WORKERS = ConfigFlagInt(
+    "PARSE_WORKERS",
+    default=min(os.process_cpu_count() or 1, 8),
+    descr="Max worker processes for parsing imported files ahead of use",
+)
+# Starting two workers takes ~0.4s (forkserver and spawn alike), parsing runs at
+# ~100KiB/s, so two workers only break even from about 90KiB of source
+_PARALLEL_MIN_SIZE = 128 * 1024
+# Not forked from the current process, which may be running other threads
+_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
 
 class ErrorListenerConverter(ErrorListener):
     """Converts an error into an AtoSyntaxError."""
@@ -96,11 +115,56 @@ def parse_file(
     return _parse_input(input, raise_multiple_errors=raise_multiple_errors)
 
 
+def parse_cached(
+    src_code: str,
+    src_path: None | str | Path = None,
+    raise_multiple_errors: bool = False,
+    store: bool = True,
+) -> AtoParser.File_inputContext:
+    """
+    Parse a string as a file input, using the on-disk parse tree cache.
+    Only successfully parsed trees are stored, and only if `store` is set.
+    """
+    input = InputStream(src_code)
+    input.name = str(src_path)
+
+    if (cache := parse_cache.get_parse_cache()) is None:
+        return _parse_input(input, raise_multiple_errors=raise_multiple_errors)
+
+    key = parse_cache.source_key(src_code)
+    if (data := cache.lookup(key)) is not None:
+        try:
+            return parse_cache.load_tree(data, input)
+        except Exception as e:
+            log.debug(f"Ignoring invalid cached parse tree of {src_path}: {e}")
+
+    tree = _parse_input(input, raise_multiple_errors=raise_multiple_errors)
+    if store:
+        cache.store(key, parse_cache.dump_tree(tree))
+    return tree
+
+
+def stat_source(path: Path) -> tuple[int, int]:
+    """(mtime, size) of a source file, to notice changes. Take it before reading."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return (-1, -1)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def read_source(path: Path) -> str:
+    # like FileStream, without newline translation
+    return path.read_bytes().decode("utf-8")
+
+
 class FileParser:
     """Parses a file."""
 
     def __init__(self) -> None:
         self.cache = {}
+        # (mtime, size) of parsed files, to notice changes
+        self._stats: dict[str, tuple[int, int]] = {}
 
     def get_ast_from_file(self, src_origin: PathLike) -> AtoParser.File_inputContext:
         """Get the AST from a file."""
@@ -111,16 +175,86 @@ class FileParser:
         if src_origin_str not in self.cache:
             if not src_origin_path.exists():
                 raise UserFileNotFoundError(src_origin_str)
-            self.cache[src_origin_str] = parse_file(src_origin_path)
+            self._stats[src_origin_str] = stat_source(src_origin_path)
+            self.cache[src_origin_str] = parse_cached(
+                read_source(src_origin_path),
+                src_origin_path,
+            )
 
         return self.cache[src_origin_str]
 
+    def prefetch(
+        self, sources: Mapping[Path, str], stats: Mapping[Path, tuple[int, int]]
+    ) -> None:
+        """
+        Parse files ahead of their use with `get_ast_from_file`, in parallel.
+        `stats` are the `stat_source` of the files, taken before reading them.
+
+        Files in the parse tree cache are cheap to load on use and skipped.
+        The rest is parsed in worker processes if there's enough of it.
+        Files with syntax errors are left to be parsed on use, where the errors
+        are reported.
+        """
+        cache = parse_cache.get_parse_cache()
+        missing = {
+            path: src
+            for path, src in sources.items()
+            if str(path) not in self.cache
+            and (cache is None or cache.lookup(parse_cache.source_key(src)) is None)
+        }
+        workers = min(int(PARSE_WORKERS), len(missing))
+        if workers < 2 or sum(map(len, missing.values())) < _PARALLEL_MIN_SIZE:
+            return
+
+        log.debug(f"Parsing {len(missing)} files in {workers} processes")
+        # largest first, so that no worker is left with a big one at the end
+        order = sorted(missing, key=lambda path: len(missing[path]), reverse=True)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(_START_METHOD),
+        ) as pool:
+            futures = [
+                pool.submit(parse_cache.parse_to_bytes, missing[path], str(path))
+                for path in order
+            ]
+            for path, future in zip(order, futures):
+                try:
+                    data = future.result()
+                except Exception as e:
+                    log.debug(f"Parsing {path} ahead of use failed: {e}")
+                    continue
+                if data is None:
+                    continue
+
+                src = missing[path]
+                if cache is not None:
+                    cache.store(parse_cache.source_key(src), data)
+                input = InputStream(src)
+                input.name = str(path)
+                self._stats[str(path)] = stats[path]
+                self.cache[str(path)] = parse_cache.load_tree(data, input)
+
+    def changed_files(self) -> list[str]:
+        """Files that changed on disk since they were parsed."""
+        return [
+            path
+            for path, stat in self._stats.items()
+            if path in self.cache and stat_source(Path(path)) != stat
+        ]
+
+    def clear(self) -> None:
+        self.cache.clear()
+        self._stats.clear()
+
     def get_ast_from_text(
         self, src_code: str, src_path: Path | None = None
     ) -> AtoParser.File_inputContext:
-        """Get the AST from a string."""
-        # TODO: caching
-        return parse_text_as_file(src_code, src_path, raise_multiple_errors=True)
+        """
+        Get the AST from a string.
+        Not stored in the parse tree cache, the text is usually an unsaved
+        editor buffer that changes with every keystroke.
+        """
+        return parse_cached(src_code, src_path, raise_multiple_errors=True, store=False)
 
 
 parser = FileParser()
@@ -0,0 +1,339 @@
+"""
+Persistent cache of .ato parse trees.
+
+Lexing and parsing through the ANTLR Python runtime is slow, so parse trees
+are stored on disk keyed by the hash of the source and the grammar. A stored
+tree is the token stream plus the shape of the tree, from which real
+`AtoParser` contexts are rebuilt without running the lexer or parser.
+"""
+
+import gc
+import hashlib
+import logging
+import marshal
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from contextlib import contextmanager
+from itertools import accumulate
+from pathlib import Path
+
+from antlr4 import CommonTokenStream, InputStream
+from antlr4.ListTokenSource import ListTokenSource
+from antlr4.ParserRuleContext import ParserRuleContext
+from antlr4.Token import CommonToken
+from antlr4.tree.Tree import TerminalNode
+
+from atopile.parser import AtoLexer as lexer_module
+from atopile.parser import AtoParser as parser_module
+from atopile.parser.AtoLexer import AtoLexer
+from atopile.parser.AtoParser import AtoParser
+from faebryk.libs.paths import get_cache_dir
+from faebryk.libs.util import ConfigFlag, ConfigFlagFloat, ConfigFlagString, once
+
+logger = logging.getLogger(__name__)
+
+AST_CACHE = ConfigFlag(
+    "AST_CACHE",
+    default=True,
+    descr="Keep parse trees of .ato files on disk",
+)
+AST_CACHE_PATH = ConfigFlagString(
+    "AST_CACHE_PATH",
+    default=str(get_cache_dir() / "ast.sqlite"),
+    descr="Location of the parse tree database",
+)
+AST_CACHE_MAX_AGE = ConfigFlagFloat(
+    "AST_CACHE_MAX_AGE",
+    default=30 * 24 * 3600.0,
+    descr="Time after which parse trees not looked up are dropped [s]",
+)
+# Looked up trees are marked as used at most this often, saving a write per lookup
+_REFRESH_AFTER = 24 * 3600.0
+
+# Bump when the stored layout changes
+_FORMAT_VERSION = 1
+# type, channel, start, stop, line, column
+_TOKEN_FIELDS = 6
+_NO_STOP = -(2**31)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trees (
+    key TEXT PRIMARY KEY,
+    stored REAL NOT NULL,
+    data BLOB NOT NULL
+);
+"""
+
+
+@once
+def grammar_version() -> str:
+    """Hash of the generated lexer and parser, and the storage format."""
+    h = hashlib.sha256(str(_FORMAT_VERSION).encode())
+    h.update(str(lexer_module.serializedATN()).encode())
+    h.update(str(parser_module.serializedATN()).encode())
+    return h.hexdigest()[:16]
+
+
+def source_key(src: str) -> str:
+    return f"{grammar_version()}:{hashlib.sha256(src.encode()).hexdigest()}"
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Trees are large numbers of small objects referencing each other, which
+    triggers useless collections while building them.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _encode(values: list[int]) -> bytes:
+    return array("i", values).tobytes()
+
+
+def _decode(data: bytes) -> array:
+    out = array("i")
+    out.frombytes(data)
+    return out
+
+
+def dump_tree(tree: ParserRuleContext) -> bytes:
+    """
+    Serialize a successfully parsed tree.
+
+    Everything is stored column-wise as integer arrays, which compress well.
+    Tokens are stored as their delta encoded positions. Their text is taken
+    from the source on load unless the lexer set it explicitly
+    (e.g. INDENT / DEDENT).
+    The tree is stored in pre-order as the class of each node (-1 for
+    terminals), with the invoking state, start and stop token and child count
+    of each rule context and the token of each terminal. Token indices are
+    delta encoded against the previous one.
+    """
+    tokens = tree.parser.getInputStream().tokens  # type: ignore
+    token_columns: list[list[int]] = [[] for _ in range(_TOKEN_FIELDS)]
+    previous = (0,) * _TOKEN_FIELDS
+    texts: dict[int, str] = {}
+    for token in tokens:
+        fields = (
+            token.type,
+            token.channel,
+            token.start,
+            token.stop,
+            token.line,
+            token.column,
+        )
+        for column, field, prev in zip(token_columns, fields, previous):
+            column.append(field - prev)
+        previous = fields
+        # only explicitly set texts, the rest are slices of the source
+        if token._text is not None:
+            texts[token.tokenIndex] = token._text
+
+    classes: dict[type, int] = {}
+    kinds, states, starts, spans, counts, terminals = [], [], [], [], [], []
+    cursor = 0
+    stack: list = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, TerminalNode):
+            kinds.append(-1)
+            terminals.append(node.symbol.tokenIndex - cursor)
+            cursor = node.symbol.tokenIndex
+            continue
+        children = node.children or []
+        start = node.start.tokenIndex
+        kinds.append(classes.setdefault(type(node), len(classes)))
+        states.append(node.invokingState)
+        starts.append(start - cursor)
+        spans.append(
+            node.stop.tokenIndex - start if node.stop is not None else _NO_STOP
+        )
+        counts.append(len(children))
+        cursor = start
+        stack.extend(reversed(children))
+
+    return zlib.compress(
+        marshal.dumps(
+            (
+                [_encode(column) for column in token_columns],
+                texts,
+                [cls.__name__ for cls in classes],
+                [
+                    _encode(column)
+                    for column in (kinds, states, starts, spans, counts, terminals)
+                ],
+            )
+        )
+    )
+
+
+def load_tree(data: bytes, input: InputStream) -> AtoParser.File_inputContext:
+    """
+    Rebuild a tree stored with `dump_tree` for the source in `input`.
+    """
+    token_columns, texts, class_names, node_columns = marshal.loads(
+        zlib.decompress(data)
+    )
+    with _gc_paused():
+        return _build_tree(token_columns, texts, class_names, node_columns, input)
+
+
+def _build_tree(
+    token_columns: list[bytes],
+    texts: dict[int, str],
+    class_names: list[str],
+    node_columns: list[bytes],
+    input: InputStream,
+) -> AtoParser.File_inputContext:
+    source = (None, input)
+    tokens: list[CommonToken] = []
+    for type_, channel, start, stop, line, column in zip(
+        *(accumulate(_decode(column)) for column in token_columns)
+    ):
+        token = CommonToken(source, type_, channel, start, stop)
+        token.line = line
+        token.column = column
+        tokens.append(token)
+    for index, text in texts.items():
+        tokens[index].text = text
+
+    stream = CommonTokenStream(ListTokenSource(tokens))
+    stream.fill()
+    parser = AtoParser(stream)
+
+    classes = [getattr(AtoParser, name) for name in class_names]
+    kinds, states, starts, spans, counts, terminals = (
+        iter(_decode(column)) for column in node_columns
+    )
+
+    root = None
+    cursor = 0
+    # contexts still missing children, with the number missing
+    open_: list[list] = []
+    for kind in kinds:
+        parent = open_[-1][0] if open_ else None
+        complete = True
+        if kind < 0:
+            cursor += next(terminals)
+            parent.addTokenNode(tokens[cursor])
+        else:
+            ctx = classes[kind](parser, parent, next(states))
+            cursor += next(starts)
+            span = next(spans)
+            ctx.start = tokens[cursor]
+            ctx.stop = tokens[cursor + span] if span != _NO_STOP else None
+            if parent is None:
+                root = ctx
+            else:
+                parent.addChild(ctx)
+            if child_count := next(counts):
+                open_.append([ctx, child_count])
+                complete = False
+        # completing the last child of a context completes the context
+        while complete and open_:
+            open_[-1][1] -= 1
+            if open_[-1][1]:
+                break
+            open_.pop()
+
+    assert isinstance(root, AtoParser.File_inputContext)
+    return root
+
+
+def parse_to_bytes(src: str, name: str) -> bytes | None:
+    """
+    Parse and serialize a source, for worker processes.
+
+    None if the source has syntax errors. Those are reported by parsing it again
+    on use, which keeps workers free of the error machinery.
+    """
+    input = InputStream(src)
+    input.name = name
+    lexer = AtoLexer(input)
+    lexer.removeErrorListeners()
+    parser = AtoParser(CommonTokenStream(lexer))
+    parser.removeErrorListeners()
+    tree = parser.file_input()
+    if parser.getNumberOfSyntaxErrors():
+        return None
+    return dump_tree(tree)
+
+
+class ParseCache:
+    """
+    SQLite store of serialized parse trees, keyed by `source_key`.
+    Usable from any thread, e.g. the language server's build threads.
+    """
+
+    def __init__(self, path: Path, max_age: float):
+        self.path = path
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        with self._db:
+            self._db.execute(
+                "DELETE FROM trees WHERE stored < ?", [time.time() - max_age]
+            )
+
+    def close(self):
+        self._db.close()
+
+    def lookup(self, key: str) -> bytes | None:
+        """
+        Stored tree of the source, None if there is none or the database fails.
+        Trees in use are kept from expiring.
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT stored, data FROM trees WHERE key = ?", [key]
+                ).fetchone()
+                if row is None:
+                    return None
+                stored, data = row
+                if now - stored > _REFRESH_AFTER:
+                    with self._db:
+                        self._db.execute(
+                            "UPDATE trees SET stored = ? WHERE key = ?", [now, key]
+                        )
+        except sqlite3.Error as e:
+            logger.debug(f"Parse tree cache lookup failed: {e}")
+            return None
+        return data
+
+    def store(self, key: str, data: bytes):
+        """Store a tree, a failing database is only logged."""
+        try:
+            with self._lock, self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO trees (key, stored, data)"
+                    " VALUES (?, ?, ?)",
+                    [key, time.time(), data],
+                )
+        except sqlite3.Error as e:
+            logger.debug(f"Parse tree cache store failed: {e}")
+
+
+@once
+def get_parse_cache() -> ParseCache | None:
+    if not AST_CACHE:
+        return None
+    try:
+        return ParseCache(Path(AST_CACHE_PATH.get()), max_age=float(AST_CACHE_MAX_AGE))
+    except sqlite3.Error as e:
+        logger.warning(f"Parse tree cache unavailable: {e}")
+        return None
@@ -47,6 +47,7 @@ class Graph:
     @property
     def edge_count(self) -> int: ...
     def node_projection(self) -> set[Node]: ...
+    def nodes_of_type(self, types: Sequence[type]) -> set[Node]: ...
     def nodes_by_names(self, arg: Set[str], /) -> list[tuple[Node, str]]: ...
     def bfs_visit(
         self,
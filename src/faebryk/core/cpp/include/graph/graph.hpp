@@ -81,6 +81,7 @@ class Node {
 
         bool is_subclass(nb::type_object type);
         bool is_subclass(std::vector<nb::type_object> types);
+        const std::unordered_set<uint64_t> &get_mro_ids() const;
     };
 
   private:
@@ -247,8 +248,12 @@ class Graph {
     Map<GI_ref_weak, Set<GI_ref_weak>> e_cache_simple = {};
     bool invalidated = false;
 
+    /** Nodes bucketed by the id of every python type in their mro */
+    Map<uint64_t, Set<Node_ref>> type_index = {};
+
   public:
     void hold(GI_ref gi);
+    void hold_node_type(Node_ref node);
     void merge(Graph &other);
     static void add_edge(Link_ref link);
     static void remove_edge(Link_ref link);
@@ -273,6 +278,7 @@ class Graph {
 
     // Algorithms
     std::unordered_set<Node_ref> node_projection();
+    std::unordered_set<Node_ref> nodes_of_type(std::vector<nb::type_object> types);
     std::vector<std::pair<Node_ref, std::string>>
     nodes_by_names(std::unordered_set<std::string> names);
     std::unordered_set<GI_ref_weak>
@@ -19,6 +19,13 @@ void Graph::hold(GI_ref gi) {
     this->v.insert(gi);
 }
 
+void Graph::hold_node_type(Node_ref node) {
+    auto type = node->get_type();
+    for (auto type_id : type.get_mro_ids()) {
+        this->type_index[type_id].insert(node);
+    }
+}
+
 Graph_ref Graph::merge_graphs(Graph_ref g1, Graph_ref g2) {
     if (g1 == g2) {
         return g1;
@@ -92,6 +99,10 @@ void Graph::merge(Graph &other) {
     this->e.insert(this->e.end(), other.e.begin(), other.e.end());
     this->e_cache.merge(other.e_cache);
     this->e_cache_simple.merge(other.e_cache_simple);
+
+    for (auto &[type_id, nodes] : other.type_index) {
+        this->type_index[type_id].merge(nodes);
+    }
 }
 
 std::unordered_set<GI_ref_weak> Graph::get_gif_edges(GI_ref_weak from) {
@@ -106,6 +117,13 @@ void Graph::remove_node(GI_ref node) {
     auto node_ptr = node.get();
     this->v.erase(node);
 
+    if (auto self_gif = dynamic_cast<GraphInterfaceSelf *>(node_ptr)) {
+        auto n = self_gif->get_node();
+        for (auto &[type_id, nodes] : this->type_index) {
+            nodes.erase(n);
+        }
+    }
+
     // TODO remove G ref from Gif
 
     for (auto &[from, tos] : this->e_cache_simple) {
@@ -126,6 +144,7 @@ void Graph::remove_node(GI_ref node) {
 void Graph::invalidate() {
     this->invalidated = true;
     this->v.clear();
+    this->type_index.clear();
 }
 
 int Graph::node_count() {
@@ -157,6 +176,26 @@ std::unordered_set<Node_ref> Graph::node_projection() {
     return nodes;
 }
 
+std::unordered_set<Node_ref> Graph::nodes_of_type(std::vector<nb::type_object> types) {
+    // Every node is an instance of the C++ base, which is not in any mro_ids
+    auto type_h = nb::type<Node>();
+    for (auto &type : types) {
+        if (type.ptr() == type_h.ptr()) {
+            return this->node_projection();
+        }
+    }
+
+    std::unordered_set<Node_ref> nodes;
+    for (auto &type : types) {
+        auto bucket = this->type_index.find((uint64_t)type.ptr());
+        if (bucket == this->type_index.end()) {
+            continue;
+        }
+        nodes.insert(bucket->second.begin(), bucket->second.end());
+    }
+    return nodes;
+}
+
 std::vector<std::pair<Node_ref, std::string>>
 Graph::nodes_by_names(std::unordered_set<std::string> names) {
     std::vector<std::pair<Node_ref, std::string>> nodes;
@@ -29,6 +29,7 @@ Node_ref Node::transfer_ownership(Node_ref node) {
 
     auto other = nb::find(node);
     node->set_py_handle(other);
+    node->get_graph()->hold_node_type(node);
 
     return node;
 }
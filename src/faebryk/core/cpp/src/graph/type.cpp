@@ -35,6 +35,10 @@ bool Node::Type::is_subclass(std::vector<nb::type_object> types) {
     });
 }
 
+const std::unordered_set<uint64_t> &Node::Type::get_mro_ids() const {
+    return this->mro_ids;
+}
+
 bool Node::Type::operator==(const Type &other) const {
     return this->type.ptr() == other.type.ptr();
 }
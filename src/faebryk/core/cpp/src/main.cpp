@@ -102,6 +102,7 @@ PYMOD(m) {
         .def_prop_ro("node_count", &Graph::node_count)
         .def_prop_ro("edge_count", &Graph::edge_count)
         .def("node_projection", &Graph::node_projection)
+        .def("nodes_of_type", &Graph::nodes_of_type, "types"_a)
         .def("nodes_by_names", &Graph::nodes_by_names)
         .def("bfs_visit", &Graph::bfs_visit, "filter"_a, "start"_a,
              nb::rv_policy::reference)
@@ -3,7 +3,7 @@
 
 import logging
 from types import UnionType
-from typing import TYPE_CHECKING, overload
+from typing import TYPE_CHECKING, get_args, overload
 
 from faebryk.core.cpp import Graph
 from faebryk.core.node import Node
@@ -26,10 +26,27 @@ class GraphFunctions:
     def node_projection(self) -> list["Node"]:
         return list(self.nodes_of_type(Node))
 
+    def _nodes_with_trait_impl(self, trait: type["Trait"]) -> set["Node"]:
+        """
+        Parents of all trait impls of the given trait type in the graph.
+        Uses the graph type index, so only bound impls are visited.
+        """
+        from faebryk.core.trait import TraitImpl
+
+        if TraitImpl.is_traitimpl_type(trait):
+            trait = trait.__trait__
+
+        return {
+            p[0]
+            for g in self.graph
+            for impl in g.nodes_of_type([trait])
+            if (p := impl.get_parent()) is not None
+        }
+
     def nodes_with_trait[T: "Trait"](self, trait: type[T]) -> list[tuple["Node", T]]:
         return [
             (n, n.get_trait(trait))
-            for n in self.node_projection()
+            for n in self._nodes_with_trait_impl(trait)
             if n.has_trait(trait)
         ]
 
@@ -37,14 +54,19 @@ class GraphFunctions:
     def nodes_with_traits[*Ts](
         self, traits: tuple[*Ts]
     ):  # -> list[tuple[Node, tuple[*Ts]]]:
+        if not traits:
+            return [(n, ()) for n in self.node_projection()]
+        candidates = set.intersection(
+            *(self._nodes_with_trait_impl(trait) for trait in traits)  # type: ignore
+        )
         return [
             (n, tuple(n.get_trait(trait) for trait in traits))  # type: ignore
-            for n in self.node_projection()
+            for n in candidates
             if all(n.has_trait(trait) for trait in traits)  # type: ignore
         ]
 
     def nodes_of_type[T: "Node"](self, t: type[T]) -> set[T]:
-        return {n for g in self.graph for n in g.node_projection() if isinstance(n, t)}
+        return {n for g in self.graph for n in g.nodes_of_type([t])}  # type: ignore
 
     @overload
     def nodes_of_types(self, t: tuple[type["Node"], ...]) -> set["Node"]: ...
@@ -52,4 +74,5 @@ class GraphFunctions:
     def nodes_of_types(self, t: UnionType) -> set["Node"]: ...
 
     def nodes_of_types(self, t):  # type: ignore TODO
-        return {n for g in self.graph for n in g.node_projection() if isinstance(n, t)}
+        types = list(get_args(t) if isinstance(t, UnionType) else t)
+        return {n for g in self.graph for n in g.nodes_of_type(types)}
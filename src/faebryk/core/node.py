@@ -499,6 +499,8 @@ class Node(CNode):
         CNode.transfer_ownership(self)
         assert not hasattr(self, "_called_init")
         self._called_init = True
+        # trait type (and its trait bases) -> attached impls
+        self._trait_impls: dict[type["Trait"], list["TraitImpl"]] = {}
 
     def __preinit__(self, *args, **kwargs) -> None: ...
 
@@ -549,11 +551,29 @@ class Node(CNode):
                     raise Node._Skipped()
 
         node.parent.connect(self.children, LinkNamedParent(name))
+        if TraitImpl.is_traitimpl(node):
+            for trait in Node._trait_index_keys(node):
+                self._trait_impls.setdefault(trait, []).append(node)
         node._handle_added_to_parent()
 
     def _remove_child(self, node: "Node"):
         node.parent.disconnect_parent()
 
+        from faebryk.core.trait import TraitImpl
+
+        if TraitImpl.is_traitimpl(node):
+            for trait in Node._trait_index_keys(node):
+                impls = self._trait_impls[trait]
+                impls.remove(node)
+                if not impls:
+                    del self._trait_impls[trait]
+
+    @staticmethod
+    def _trait_index_keys(impl: "TraitImpl") -> list[type["Trait"]]:
+        from faebryk.core.trait import Trait
+
+        return [t for t in impl.__trait__.__mro__ if issubclass(t, Trait)]
+
     def _handle_added_to_parent(self): ...
 
     def builder(self, op: Callable[[Self], Any]) -> Self:
@@ -617,12 +637,11 @@ class Node(CNode):
                 )
             trait = trait.__trait__
 
-        out = self.get_children(
-            direct_only=True,
-            types=Trait,
-            f_filter=lambda impl: trait.is_traitimpl(impl)
-            and (cast(TraitImpl, impl).is_implemented() or not only_implemented),
-        )
+        out = [
+            impl
+            for impl in self._trait_impls.get(trait, ())
+            if not only_implemented or impl.is_implemented()
+        ]
 
         if len(out) > 1:
             raise KeyErrorAmbiguous(duplicates=list(out))
@@ -4,12 +4,17 @@
 
 from dataclasses import dataclass
 from functools import wraps
+from types import UnionType
 from typing import TYPE_CHECKING, Callable
 
 if TYPE_CHECKING:
+    from faebryk.core.parameter import ParameterOperatable
     from faebryk.core.solver.mutator import Mutator
 
 type SolverAlgorithmFunc = "Callable[[Mutator], None]"
+type SolverAlgorithmTriggers = (
+    "tuple[type[ParameterOperatable], ...] | type[ParameterOperatable] | UnionType"
+)
 
 
 @dataclass(frozen=True)
@@ -18,6 +23,7 @@ class SolverAlgorithm:
     func: SolverAlgorithmFunc
     single: bool
     terminal: bool
+    triggers: SolverAlgorithmTriggers | None = None
 
     def __call__(self, *args, **kwargs):
         return self.func(*args, **kwargs)
@@ -30,6 +36,7 @@ def algorithm(
     name: str,
     single: bool = False,
     terminal: bool = True,
+    triggers: SolverAlgorithmTriggers | None = None,
 ) -> Callable[[SolverAlgorithmFunc], SolverAlgorithm]:
     """
     Decorator to wrap an algorithm function
@@ -38,6 +45,9 @@ def algorithm(
     - single: if True, the algorithm is only applied once in the beginning.
         All other algorithms assume this one ran before
     - terminal: Results are invalid if graph is mutated after solver is run
+    - triggers: types of operables the algorithm reacts to.
+        It is only rerun if an operable of one of these types changed since its
+        last run. None means any change.
     """
 
     if not hasattr(algorithm, "_registered_algorithms"):
@@ -53,6 +63,7 @@ def algorithm(
             func=wrapped,
             single=single,
             terminal=terminal,
+            triggers=triggers,
         )
         algorithm._registered_algorithms.append(out)
 
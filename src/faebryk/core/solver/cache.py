@@ -0,0 +1,362 @@
+# This file is part of the faebryk project
+# SPDX-License-Identifier: MIT
+
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from faebryk.core.graph import Graph, GraphFunctions
+from faebryk.core.parameter import (
+    Boolean,
+    Commutative,
+    ConstrainableExpression,
+    Expression,
+    HasSideEffects,
+    Is,
+    IsSubset,
+    Numbers,
+    Parameter,
+    ParameterOperatable,
+)
+from faebryk.core.solver.algorithm import SolverAlgorithm
+from faebryk.core.solver.mutator import MutationMap, Mutator
+from faebryk.core.solver.utils import S_LOG, SolverLiteral
+from faebryk.libs.sets.sets import BoolSet, P_Set, as_lit
+from faebryk.libs.util import once
+
+logger = logging.getLogger(__name__)
+
+if S_LOG:
+    logger.setLevel(logging.DEBUG)
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+@once
+def _solver_version() -> str:
+    """
+    Installed package version and hash of the sources solver results depend on:
+    the solver, parameters and expressions, sets and units.
+    """
+    h = hashlib.sha256()
+    try:
+        h.update(importlib.metadata.version("atopile").encode())
+    except importlib.metadata.PackageNotFoundError:
+        pass
+    faebryk_dir = Path(__file__).parents[2]
+    paths = [
+        *(faebryk_dir / "core" / "solver").rglob("*.py"),
+        *(faebryk_dir / "libs" / "sets").rglob("*.py"),
+        faebryk_dir / "core" / "parameter.py",
+        faebryk_dir / "libs" / "units.py",
+    ]
+    for path in sorted(paths):
+        h.update(path.relative_to(faebryk_dir).as_posix().encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def _literal_label(lit: Any) -> str:
+    try:
+        return json.dumps(as_lit(lit).serialize(), sort_keys=True)
+    except Exception:
+        return repr(lit)
+
+
+def _param_name(param: Parameter) -> str | None:
+    """
+    Name of a parameter in the design, independent of object ids.
+    None for parameters without parent.
+    """
+    hierarchy = param.get_hierarchy()
+    if len(hierarchy) < 2:
+        return None
+    root = hierarchy[0][0]
+    return ".".join([type(root).__qualname__, *(name for _, name in hierarchy[1:])])
+
+
+class SolverCache:
+    """
+    Persistent cache of terminal solver results.
+
+    Every output graph of the canonicalization (pre-algorithms) is hashed
+    structurally: parameters by their name in the design and attributes,
+    expressions by type, constraint state and operands.
+    After solving, the final literal of every parameter and expression of a graph
+    is stored on disk under that hash.
+    On a later run, graphs with a known hash are not solved again, but replaced by
+    operables constrained to the stored literals.
+    Only the literals survive this, so it is only suitable for terminal solving
+    of which just the literals are used.
+    Results are invalidated by changes to the solver sources or the installed
+    package version.
+    """
+
+    VERSION = 1
+
+    @dataclass
+    class Result:
+        literal: SolverLiteral
+        alias: bool
+
+        def serialize(self) -> dict:
+            return {"literal": self.literal.serialize(), "alias": self.alias}
+
+        @classmethod
+        def deserialize(cls, data: dict) -> "SolverCache.Result":
+            return cls(literal=P_Set.deserialize(data["literal"]), alias=data["alias"])
+
+    @dataclass
+    class Key:
+        digest: str
+        labels: dict[ParameterOperatable, str]
+
+    @dataclass
+    class Lookup:
+        keys: dict[Graph, "SolverCache.Key"]
+        hits: dict[Graph, dict[str, "SolverCache.Result"]]
+
+        def results(
+            self,
+        ) -> dict[Graph, dict[ParameterOperatable, "SolverCache.Result"]]:
+            """Stored results of the cached graphs per operable."""
+            return {
+                g: {
+                    op: hits[label]
+                    for op, label in self.keys[g].labels.items()
+                    if label in hits
+                }
+                for g, hits in self.hits.items()
+            }
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def _salt(self, algorithms: list[SolverAlgorithm]) -> str:
+        return _digest(
+            str(self.VERSION), _solver_version(), *(a.name for a in algorithms)
+        )
+
+    def _file(self, digest: str) -> Path:
+        return self.path / f"{digest}.json"
+
+    @staticmethod
+    def _graph_key(
+        graph: Graph, mutation_map: MutationMap, salt: str
+    ) -> "SolverCache.Key | None":
+        """
+        Structural hash of a canonical graph.
+        None if the graph can't be cached.
+        """
+        gf = GraphFunctions(graph)
+        params = gf.nodes_of_type(Parameter)
+        exprs = ParameterOperatable.sort_by_depth(
+            gf.nodes_of_type(Expression), ascending=True
+        )
+        if not exprs or any(isinstance(e, HasSideEffects) for e in exprs):
+            return None
+
+        labels: dict[ParameterOperatable, str] = {}
+        anonymous: set[Parameter] = set()
+        for p in params:
+            names = sorted(
+                name
+                for origin in mutation_map.map_backward(p)
+                if isinstance(origin, Parameter)
+                and (name := _param_name(origin)) is not None
+            )
+            if not names:
+                anonymous.add(p)
+            labels[p] = _digest(
+                *names,
+                type(p.domain).__qualname__,
+                repr(sorted(vars(p.domain).items())),
+                *(
+                    _literal_label(v) if v is not None else ""
+                    for v in (p.within, p.soft_set)
+                ),
+                repr(p.guess),
+                repr(p.tolerance_guess),
+                repr(p.likely_constrained),
+            )
+
+        def _label_exprs():
+            for e in exprs:
+                operands = [
+                    labels[op]
+                    if isinstance(op, ParameterOperatable)
+                    else _literal_label(op)
+                    for op in e.operands
+                ]
+                if isinstance(e, Commutative):
+                    operands.sort()
+                labels[e] = _digest(
+                    type(e).__qualname__,
+                    repr(isinstance(e, ConstrainableExpression) and e.constrained),
+                    *operands,
+                )
+
+        # anonymous parameters are told apart by the expressions they are used in
+        _label_exprs()
+        uses: dict[Parameter, list[str]] = defaultdict(list)
+        for e in exprs:
+            for i, op in enumerate(e.operands):
+                if op in anonymous:
+                    pos = "*" if isinstance(e, Commutative) else str(i)
+                    uses[op].append(f"{labels[e]}:{pos}")
+        for p in anonymous:
+            labels[p] = _digest(labels[p], *sorted(uses[p]))
+        _label_exprs()
+
+        return SolverCache.Key(
+            digest=_digest(salt, *sorted(labels.values())),
+            labels=labels,
+        )
+
+    def lookup(
+        self, mutation_map: MutationMap, algorithms: list[SolverAlgorithm]
+    ) -> "SolverCache.Lookup":
+        """
+        Hash all output graphs of the (canonical) mutation map and load the results
+        of the ones solved before.
+        """
+        salt = self._salt(algorithms)
+        out = SolverCache.Lookup(keys={}, hits={})
+        for g in mutation_map.output_graphs:
+            key = self._graph_key(g, mutation_map, salt)
+            if key is None:
+                continue
+            out.keys[g] = key
+
+            file = self._file(key.digest)
+            if not file.exists():
+                continue
+            try:
+                data = json.loads(file.read_text())
+                out.hits[g] = {
+                    label: SolverCache.Result.deserialize(result)
+                    for label, result in data["results"].items()
+                }
+            except Exception as e:
+                logger.warning(f"Ignoring corrupt solver cache entry {file}: {e}")
+
+        logger.debug(f"Solver cache: {len(out.hits)}/{len(out.keys)} graphs cached")
+        return out
+
+    @staticmethod
+    def restore(
+        mutation_map: MutationMap,
+        results: dict[Graph, dict[ParameterOperatable, "SolverCache.Result"]],
+        iteration: int,
+    ) -> MutationMap:
+        """
+        Replace every graph with results with its parameters (and for expressions,
+        new parameters) constrained to their literals.
+        The other graphs are passed through untouched.
+        """
+        hit_graphs = list(results)
+
+        def _restore(mutator: Mutator):
+            for g in hit_graphs:
+                graph_results = results[g]
+                for op in GraphFunctions(g).nodes_of_type(ParameterOperatable):
+                    result = graph_results.get(op)
+                    if isinstance(op, Parameter):
+                        new_op = mutator.mutate_parameter(op)
+                    elif result is not None:
+                        # expression is only kept as a carrier of its literal
+                        new_op = mutator.register_created_parameter(
+                            Parameter(
+                                domain=Boolean()
+                                if isinstance(result.literal, BoolSet)
+                                else Numbers()
+                            ),
+                            from_ops=[op],
+                        )
+                        mutator._mutate(op, new_op)
+                    else:
+                        mutator.remove(op)
+                        continue
+                    if result is None:
+                        continue
+                    pred = mutator.create_expression(
+                        Is if result.alias else IsSubset,
+                        new_op,
+                        result.literal,
+                        from_ops=[op],
+                        check_exists=False,
+                        _relay=False,
+                    )
+                    assert isinstance(pred, ConstrainableExpression)
+                    mutator.constrain(pred, terminate=True)
+                    mutator.predicate_terminate(pred)
+
+        mutator = Mutator(
+            mutation_map,
+            algo=SolverAlgorithm(
+                name="restore results", func=_restore, single=False, terminal=True
+            ),
+            iteration=iteration,
+            terminal=True,
+            graphs=hit_graphs,
+        )
+        mutator._run()
+        return mutation_map.extend(mutator.close().mutation_stage)
+
+    def store(
+        self,
+        lookup: "SolverCache.Lookup",
+        mutation_map: MutationMap,
+    ):
+        """
+        Store the results of the solved (not cached) graphs.
+
+        Args:
+        - mutation_map: maps the canonical graphs to the solved ones
+        """
+        for g, key in lookup.keys.items():
+            if g in lookup.hits:
+                continue
+
+            results: dict[str, SolverCache.Result | None] = {}
+            for op, label in key.labels.items():
+                result = self._get_result(mutation_map, op)
+                # structurally indistinguishable operables with different results
+                if label in results and results[label] != result:
+                    break
+                results[label] = result
+            else:
+                self._write(
+                    key.digest, {k: v for k, v in results.items() if v is not None}
+                )
+
+    @staticmethod
+    def _get_result(
+        mutation_map: MutationMap, op: ParameterOperatable
+    ) -> "SolverCache.Result | None":
+        lit = mutation_map.try_get_literal(op, allow_subset=False)
+        if lit is not None:
+            return SolverCache.Result(literal=lit, alias=True)
+        lit = mutation_map.try_get_literal(op, allow_subset=True)
+        if lit is not None:
+            return SolverCache.Result(literal=lit, alias=False)
+        return None
+
+    def _write(self, digest: str, results: dict[str, "SolverCache.Result"]):
+        data = {
+            "version": self.VERSION,
+            "results": {label: r.serialize() for label, r in results.items()},
+        }
+        self.path.mkdir(parents=True, exist_ok=True)
+        file = self._file(digest)
+        tmp = file.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data))
+        tmp.replace(file)
@@ -19,12 +19,14 @@ from faebryk.core.parameter import (
     Predicate,
 )
 from faebryk.core.solver.algorithm import SolverAlgorithm
+from faebryk.core.solver.cache import SolverCache
 from faebryk.core.solver.mutator import (
     MutationMap,
     MutationStage,
     Mutator,
     Transformations,
 )
+from faebryk.core.solver.parallel import solve_parallel
 from faebryk.core.solver.solver import LOG_PICK_SOLVE, NotDeducibleException, Solver
 from faebryk.core.solver.symbolic import (
     canonical,
@@ -33,12 +35,16 @@ from faebryk.core.solver.symbolic import (
     pure_literal,
     structural,
 )
+from faebryk.core.solver.trace import SolverTrace
 from faebryk.core.solver.utils import (
     ALLOW_PARTIAL_STATE,
+    INCREMENTAL,
     MAX_ITERATIONS_HEURISTIC,
+    PARALLEL,
     PRINT_START,
     S_LOG,
     TIMEOUT,
+    TRIGGERS,
     get_graphs,
 )
 from faebryk.libs.logging import NET_LINE_WIDTH
@@ -57,7 +63,6 @@ if S_LOG:
 class DefaultSolver(Solver):
     algorithms = SimpleNamespace(
         # TODO: get order from topo sort
-        # and types from decorator
         pre=[
             canonical.convert_to_canonical_literals,
             canonical.convert_to_canonical_operations,
@@ -95,6 +100,7 @@ class DefaultSolver(Solver):
     @dataclass
     class IterationData:
         mutation_map: MutationMap
+        trace: SolverTrace | None = None
 
     @dataclass
     class IterationState:
@@ -109,6 +115,9 @@ class DefaultSolver(Solver):
 
         self.state: DefaultSolver.SolverState | None = None
         self.reusable_state: DefaultSolver.SolverState | None = None
+        self.cache: SolverCache | None = None
+        self.workers = int(PARALLEL)
+        self.trace: SolverTrace | None = None
 
     @classmethod
     def _run_iteration(
@@ -124,17 +133,32 @@ class DefaultSolver(Solver):
         for phase_name, algo in enumerate(algos):
             timings.add("_")
 
+            graphs = None
+            if INCREMENTAL:
+                graphs = data.mutation_map.get_dirty_graphs(algo)
+                # nothing changed since last run of algo, skip
+                if not graphs:
+                    timings.add(f"{algo.name} skipped")
+                    continue
+
+            # nothing the algorithm reacts to changed since its last run, skip
+            if TRIGGERS and not data.mutation_map.is_triggered(algo):
+                timings.add(f"{algo.name} not triggered")
+                continue
+
             if PRINT_START:
                 logger.debug(
                     f"START Iteration {iterno} Phase 2.{phase_name}: {algo.name}"
                     f" G:{len(data.mutation_map.output_graphs)}"
                 )
 
+            trace_start = data.trace.now() if data.trace is not None else 0
             mutator = Mutator(
                 data.mutation_map,
                 algo=algo,
                 terminal=terminal,
                 iteration=iterno,
+                graphs=graphs,
             )
 
             timings.add("setup")
@@ -166,8 +190,105 @@ class DefaultSolver(Solver):
             )
             timings._add(new_name, run_time)
 
+            if data.trace is not None:
+                data.trace.record(
+                    iteration=iterno,
+                    algorithm=algo,
+                    terminal=terminal,
+                    start=trace_start,
+                    result=algo_result,
+                )
+
         return iteration_state
 
+    @classmethod
+    def _run_iterations(
+        cls,
+        data: IterationData,
+        pre_algos: list[SolverAlgorithm],
+        it_algos: list[SolverAlgorithm],
+        terminal: bool,
+        start_iteration: int = 0,
+    ) -> int:
+        """
+        Run algorithms until fixpoint.
+        Pre-algorithms run in iteration 0, iterative ones in all others.
+        Returns last iteration number.
+        """
+        for iterno in count(start_iteration):
+            first_iter = iterno == 0
+
+            if iterno > MAX_ITERATIONS_HEURISTIC:
+                raise TimeoutError(
+                    "Solver Bug: Too many iterations, likely stuck in a loop"
+                )
+            logger.debug(
+                (f"Iteration {iterno} {data.mutation_map}").ljust(NET_LINE_WIDTH, "-")
+            )
+
+            try:
+                iteration_state = cls._run_iteration(
+                    iterno=iterno,
+                    data=data,
+                    terminal=terminal,
+                    algos=pre_algos if first_iter else it_algos,
+                )
+            except:
+                if S_LOG:
+                    data.mutation_map.last_stage.print_graph_contents()
+                raise
+
+            if not iteration_state.dirty:
+                break
+
+            if not len(data.mutation_map.output_graphs):
+                break
+
+            if S_LOG:
+                data.mutation_map.last_stage.print_graph_contents()
+
+        return iterno
+
+    @classmethod
+    def _run_restored(
+        cls,
+        data: IterationData,
+        it_algos: list[SolverAlgorithm],
+        terminal: bool,
+        cache: SolverCache | None,
+        cache_algos: list[SolverAlgorithm],
+        workers: int,
+    ) -> int:
+        """
+        Run iterative algorithms to fixpoint on the canonical output graphs.
+        Graphs found in the cache or solved in worker processes are restored
+        instead of solved here, newly solved graphs are stored in the cache.
+        Returns last iteration number.
+        """
+        base = data.mutation_map
+        lookup = cache.lookup(base, cache_algos) if cache is not None else None
+        results = lookup.results() if lookup is not None else {}
+        if workers > 1:
+            results |= solve_parallel(
+                [g for g in base.output_graphs if g not in results], workers
+            )
+        if results:
+            data.mutation_map = SolverCache.restore(base, results, iteration=1)
+
+        iterno = cls._run_iterations(
+            data,
+            pre_algos=[],
+            it_algos=it_algos,
+            terminal=terminal,
+            start_iteration=1,
+        )
+
+        if cache is not None and lookup is not None:
+            cache.store(
+                lookup, data.mutation_map.submap(start=len(base.mutation_stages))
+            )
+        return iterno
+
     def _create_or_resume_state(
         self, print_context: ParameterOperatable.ReprContext | None, *gs: Graph | Node
     ):
@@ -260,11 +381,14 @@ class DefaultSolver(Solver):
         *gs: Graph | Node,
         print_context: ParameterOperatable.ReprContext | None = None,
         terminal: bool = True,
+        use_cache: bool = True,
     ) -> SolverState:
         """
         Args:
         - terminal: if True, result of simplication can't be reused, but simplification
             is more powerful
+        - use_cache: reuse and store results of unchanged graphs in the solver cache
+            (terminal only)
         """
         timings = Times(name="simplify")
 
@@ -284,39 +408,34 @@ class DefaultSolver(Solver):
             pre_algos = [a for a in pre_algos if not a.terminal]
             it_algos = [a for a in it_algos if not a.terminal]
 
-        for iterno in count():
-            first_iter = iterno == 0
-
-            if iterno > MAX_ITERATIONS_HEURISTIC:
-                raise TimeoutError(
-                    "Solver Bug: Too many iterations, likely stuck in a loop"
-                )
-            logger.debug(
-                (f"Iteration {iterno} {self.state.data.mutation_map}").ljust(
-                    NET_LINE_WIDTH, "-"
-                )
-            )
-
-            try:
+        data = self.state.data
+        data.trace = self.trace
+        if self.trace is not None:
+            self.trace.start_solve()
+        cache = self.cache if terminal and use_cache else None
+        workers = self.workers if terminal else 0
+        try:
+            if cache is not None or workers > 1:
+                iterno = 0
                 iteration_state = DefaultSolver._run_iteration(
-                    iterno=iterno,
-                    data=self.state.data,
-                    terminal=terminal,
-                    algos=pre_algos if first_iter else it_algos,
+                    iterno=iterno, data=data, algos=pre_algos, terminal=terminal
                 )
-            except:
-                if S_LOG:
-                    self.state.data.mutation_map.last_stage.print_graph_contents()
-                raise
-
-            if not iteration_state.dirty:
-                break
-
-            if not len(self.state.data.mutation_map.output_graphs):
-                break
-
-            if S_LOG:
-                self.state.data.mutation_map.last_stage.print_graph_contents()
+                if iteration_state.dirty and data.mutation_map.output_graphs:
+                    iterno = DefaultSolver._run_restored(
+                        data,
+                        it_algos=it_algos,
+                        terminal=terminal,
+                        cache=cache,
+                        cache_algos=[*pre_algos, *it_algos],
+                        workers=workers,
+                    )
+            else:
+                iterno = DefaultSolver._run_iterations(
+                    data, pre_algos=pre_algos, it_algos=it_algos, terminal=terminal
+                )
+        finally:
+            if self.trace is not None:
+                self.trace.end_solve(terminal)
 
         if LOG_PICK_SOLVE:
             logger.info(
@@ -349,7 +468,10 @@ class DefaultSolver(Solver):
         pred.constrained = True
 
         try:
-            solver_result = self.simplify_symbolically(pred.get_graph(), terminal=True)
+            # the cache does not keep track of the predicate
+            solver_result = self.simplify_symbolically(
+                pred.get_graph(), terminal=True, use_cache=False
+            )
         except TimeoutError:
             if not allow_unknown:
                 raise
@@ -26,6 +26,7 @@ from faebryk.core.parameter import (
 )
 from faebryk.core.solver.algorithm import SolverAlgorithm
 from faebryk.core.solver.utils import (
+    IN_PLACE,
     S_LOG,
     SHOW_SS_IS,
     VERBOSE_TABLE,
@@ -53,6 +54,7 @@ from faebryk.libs.util import (
     groupby,
     indented_container,
     invert_dict,
+    not_none,
     once,
     unique_ref,
 )
@@ -371,14 +373,23 @@ class MutationStage:
         iteration: int,
         print_context: ParameterOperatable.ReprContext,
         transformations: Transformations,
+        input_operables: set[ParameterOperatable] | None = None,
     ):
+        """
+        Args:
+        - input_operables: snapshot of the operables of the input graphs,
+            if the stage extended them in place
+        """
         self.algorithm = algorithm
         self.iteration = iteration
         self.transformations = transformations
         self.input_print_context = print_context
-        self.input_operables = GraphFunctions(*self.input_graphs).nodes_of_type(
-            ParameterOperatable
-        )
+        if input_operables is None:
+            input_operables = GraphFunctions(*self.input_graphs).nodes_of_type(
+                ParameterOperatable
+            )
+        self.input_operables = input_operables
+        self._output_operables: set[ParameterOperatable] | None = None
 
     @property
     def output_graphs(self) -> list[Graph]:
@@ -398,8 +409,82 @@ class MutationStage:
 
     @property
     @once
+    def dirty_graphs(self) -> set[Graph]:
+        """
+        Output graphs that were created or modified in-place by this stage.
+        Graphs that were passed through untouched are not dirty.
+        """
+        if self.is_identity:
+            return set()
+        return set(
+            get_graphs(
+                chain(
+                    self.transformations.created,
+                    (v for k, v in self.transformations.mutated.items() if k is not v),
+                    self.transformations.terminated,
+                )
+            )
+        )
+
+    @property
+    @once
+    def changed_types(self) -> set[type[ParameterOperatable]]:
+        """
+        Types of the operables that changed in this stage and of all expressions
+        (transitively) operating on them.
+        Copies only count as changed if their constraint changed.
+        """
+        if self.is_identity:
+            return set()
+
+        t = self.transformations
+        changed: list[ParameterOperatable] = list(t.created)
+        for k, v in t.mutated.items():
+            if k is v:
+                continue
+            if k not in t.copied or (
+                isinstance(k, ConstrainableExpression)
+                and isinstance(v, ConstrainableExpression)
+                and k.constrained != v.constrained
+            ):
+                changed.append(v)
+        for po in chain(t.terminated, t.soft_replaced):
+            changed.append(t.mutated.get(po, po))
+
+        types = {type(po) for po in t.removed}
+        # operands of removed expressions lose an operation
+        for po in t.removed:
+            if isinstance(po, Expression):
+                changed.extend(
+                    t.mutated[op] for op in po.operatable_operands if op in t.mutated
+                )
+
+        seen = set[ParameterOperatable]()
+        while changed:
+            po = changed.pop()
+            if po in seen:
+                continue
+            seen.add(po)
+            changed.extend(po.get_operations())
+        types.update(type(po) for po in seen)
+        return types
+
+    @property
     def output_operables(self) -> set[ParameterOperatable]:
-        return GraphFunctions(*self.output_graphs).nodes_of_type(ParameterOperatable)
+        if self._output_operables is None:
+            return self.snapshot_output_operables()
+        return self._output_operables
+
+    def snapshot_output_operables(self) -> set[ParameterOperatable]:
+        """
+        Fix the output operables to the current contents of the output graphs.
+        Needed before a later stage extends the output graphs in place.
+        """
+        if self._output_operables is None:
+            self._output_operables = GraphFunctions(*self.output_graphs).nodes_of_type(
+                ParameterOperatable
+            )
+        return self._output_operables
 
     @staticmethod
     def identity(
@@ -663,6 +748,57 @@ class MutationStage:
         )
 
 
+def _same_compact_repr(a: ParameterOperatable, b: ParameterOperatable) -> bool:
+    """
+    Whether `a.compact_repr() == b.compact_repr()`, without building the strings.
+    Parameters are numbered by first occurrence, so they have to correspond
+    one-to-one between both sides.
+    """
+    params: dict[Parameter, Parameter] = {}
+    params_back: dict[Parameter, Parameter] = {}
+    # subexpression pairs already found equal
+    same: set[tuple[int, int]] = set()
+
+    def _same(a: ParameterOperatable.All, b: ParameterOperatable.All) -> bool:
+        if not isinstance(a, ParameterOperatable) or not isinstance(
+            b, ParameterOperatable
+        ):
+            return (
+                not isinstance(a, ParameterOperatable)
+                and not isinstance(b, ParameterOperatable)
+                and str(a) == str(b)
+            )
+        if type(a) is not type(b) or a._get_lit_suffix() != b._get_lit_suffix():
+            return False
+
+        if isinstance(a, Parameter):
+            assert isinstance(b, Parameter)
+            if (
+                params.setdefault(a, b) is not b
+                or params_back.setdefault(b, a) is not a
+            ):
+                return False
+            return a.units == b.units
+
+        assert isinstance(a, Expression) and isinstance(b, Expression)
+        if (id(a), id(b)) in same:
+            return True
+        if isinstance(a, ConstrainableExpression):
+            assert isinstance(b, ConstrainableExpression)
+            if a.constrained != b.constrained or (
+                a.constrained and a._solver_terminated != b._solver_terminated
+            ):
+                return False
+        if len(a.operands) != len(b.operands) or not all(
+            _same(x, y) for x, y in zip(a.operands, b.operands)
+        ):
+            return False
+        same.add((id(a), id(b)))
+        return True
+
+    return _same(a, b)
+
+
 class MutationMap:
     @dataclass
     class LookupResult:
@@ -870,8 +1006,8 @@ class MutationMap:
     def input_print_context(self) -> ParameterOperatable.ReprContext:
         return self.first_stage.input_print_context
 
-    def get_iteration_mutation(self, algo: SolverAlgorithm) -> "MutationMap | None":
-        last = first(
+    def _get_last_stage_index(self, algo: SolverAlgorithm) -> int | None:
+        return first(
             (
                 i
                 for i, m in reversed(list(enumerate(self.mutation_stages)))
@@ -879,10 +1015,45 @@ class MutationMap:
             ),
             None,
         )
+
+    def get_iteration_mutation(self, algo: SolverAlgorithm) -> "MutationMap | None":
+        last = self._get_last_stage_index(algo)
         if last is None:
             return None
         return self.submap(start=last)
 
+    def get_dirty_graphs(self, algo: SolverAlgorithm) -> set[Graph]:
+        """
+        Output graphs that changed since the last run of the algorithm
+        (including changes made by that run itself).
+        All output graphs if the algorithm did not run yet.
+        """
+        output_graphs = set(self.output_graphs)
+        last = self._get_last_stage_index(algo)
+        if last is None:
+            return output_graphs
+        changed = set[Graph]().union(
+            *(m.dirty_graphs for m in self.mutation_stages[last:])
+        )
+        return output_graphs & changed
+
+    def is_triggered(self, algo: SolverAlgorithm) -> bool:
+        """
+        Whether operables of the types the algorithm reacts to changed since its
+        last run (including changes made by that run itself).
+        Always true if the algorithm did not run yet or reacts to any change.
+        """
+        if algo.triggers is None:
+            return True
+        last = self._get_last_stage_index(algo)
+        if last is None:
+            return True
+        return any(
+            issubclass(t, algo.triggers)
+            for m in self.mutation_stages[last:]
+            for t in m.changed_types
+        )
+
     def submap(self, start: int = 0) -> "MutationMap":
         return MutationMap(*self.mutation_stages[start:])
 
@@ -930,8 +1101,7 @@ class MutationMap:
     @property
     @once
     def non_trivial_mutated_expressions(self) -> set[CanonicalExpression]:
-        # TODO make faster, compact repr is a pretty bad one
-        # consider congruence instead, but be careful since not in same graph space
+        # structural comparison, since not in same graph space
         out = {
             v
             for v, ks in self.compressed_mapping_backwards.items()
@@ -940,7 +1110,7 @@ class MutationMap:
             and all(
                 isinstance(k, Expression)
                 and k is not v
-                and k.compact_repr() != v.compact_repr()
+                and not _same_compact_repr(k, v)
                 for k in ks
             )
         }
@@ -1545,7 +1715,14 @@ class Mutator:
         algo: SolverAlgorithm,
         iteration: int,
         terminal: bool,
+        graphs: Iterable[Graph] | None = None,
     ) -> None:
+        """
+        Args:
+        - graphs: subset of the output graphs of the mutation map to run the
+            algorithm on, all other graphs are passed through untouched.
+            Defaults to all output graphs.
+        """
         self.algo = algo
         self.terminal = terminal
         self.mutation_map = mutation_map
@@ -1553,7 +1730,10 @@ class Mutator:
 
         self.utils = MutatorUtils(self)
 
-        self._G: set[Graph] = set(mutation_map.output_graphs)
+        output_graphs = set(mutation_map.output_graphs)
+        self._G: set[Graph] = output_graphs if graphs is None else set(graphs)
+        assert self._G.issubset(output_graphs)
+        self._passthrough_graphs = output_graphs - self._G
         self.print_context = mutation_map.output_print_context
         self._mutations_since_last_iteration = mutation_map.get_iteration_mutation(algo)
 
@@ -1569,7 +1749,9 @@ class Mutator:
             _last_run_operables = set(
                 self._mutations_since_last_iteration.compressed_mapping_forwards_complete.values()
             )
-        assert _last_run_operables.issubset(self._starting_operables)
+        # operables of passed through graphs are not part of this mutator
+        if not self._passthrough_graphs:
+            assert _last_run_operables.issubset(self._starting_operables)
         return self._starting_operables - _last_run_operables
 
     @property
@@ -1605,10 +1787,127 @@ class Mutator:
 
         # optimization: if just new_ops, no need to copy
         # pass through untouched graphs
-        untouched_graphs = self.G - _touched_graphs
+        untouched_graphs = (self.G - _touched_graphs) | self._passthrough_graphs
         for p in GraphFunctions(*untouched_graphs).nodes_of_type(ParameterOperatable):
             self.transformations.mutated[p] = p
 
+    def _can_extend_in_place(self) -> bool:
+        """
+        Whether the algorithm only added expressions (and terminated predicates).
+        Then there is no need to copy the touched graphs, the new expressions can
+        be attached to the original operables instead of their copies.
+        """
+        if not IN_PLACE:
+            return False
+        t = self.transformations
+        if t.removed or t.soft_replaced:
+            return False
+        for k, v in t.mutated.items():
+            if k is v:
+                continue
+            if k not in t.copied:
+                return False
+            # copy changed after copying
+            if isinstance(k, ConstrainableExpression) and (
+                k.constrained != cast_assert(ConstrainableExpression, v).constrained
+                or k._solver_terminated
+                != cast_assert(ConstrainableExpression, v)._solver_terminated
+            ):
+                return False
+        if any(not isinstance(c, Expression) for c in t.created):
+            return False
+        return self._in_place_stages is not None
+
+    @property
+    @once
+    def _in_place_stages(self) -> list[MutationStage] | None:
+        """
+        Stages outputting the operables the new expressions would be attached to,
+        starting with the one that created them.
+        None if extending them in place is not safe, that is if they were not
+        created in this iteration (e.g. inputs of the solver, resumed state or
+        earlier iterations), or if new expressions would merge their graphs.
+        """
+        t = self.transformations
+        originals = {v: k for k, v in t.mutated.items()}
+        attached = set[ParameterOperatable]()
+        expr_graphs: dict[ParameterOperatable, set[Graph]] = {}
+        for expr in ParameterOperatable.sort_by_depth(t.created, ascending=True):
+            graphs = set[Graph]()
+            for op in cast_assert(Expression, expr).operatable_operands:
+                if op in expr_graphs:
+                    graphs |= expr_graphs[op]
+                    continue
+                original = originals.get(op, op)
+                attached.add(original)
+                graphs.add(original.get_graph())
+            if len(graphs) > 1:
+                return None
+            expr_graphs[expr] = graphs
+
+        stages = []
+        for stage in reversed(self.mutation_map.mutation_stages):
+            if stage.iteration != self.iteration or stage.algorithm == "resume_state":
+                return None
+            stages.append(stage)
+            attached = {po for po in attached if po in stage.input_operables}
+            if not attached:
+                return stages[::-1]
+        # operables of the graphs passed into the solver
+        return None
+
+    def _extend_in_place(self) -> MutationStage:
+        t = self.transformations
+        input_operables = self._starting_operables | GraphFunctions(
+            *self._passthrough_graphs
+        ).nodes_of_type(ParameterOperatable)
+        # keep the outputs of the previous stages from seeing the new expressions
+        for stage in not_none(self._in_place_stages):
+            stage.snapshot_output_operables()
+        assert self.mutation_map.last_stage.output_operables == input_operables
+
+        originals: dict[ParameterOperatable, ParameterOperatable] = {
+            v: k for k, v in t.mutated.items()
+        }
+
+        def _rebase(op: ParameterOperatable.All) -> ParameterOperatable.All:
+            if not isinstance(op, ParameterOperatable):
+                return op
+            return originals.get(op, op)
+
+        created: dict[ParameterOperatable, list[ParameterOperatable]] = {}
+        for expr in ParameterOperatable.sort_by_depth(t.created, ascending=True):
+            assert isinstance(expr, Expression)
+            operands = [_rebase(op) for op in expr.operands]
+            if expr.non_operands is not None:
+                new_expr = type(expr)(*operands, non_operands=expr.non_operands)  # type: ignore
+            else:
+                new_expr = type(expr)(*operands)
+            if isinstance(expr, ConstrainableExpression):
+                new_expr = cast_assert(ConstrainableExpression, new_expr)
+                new_expr.constrained = expr.constrained
+                new_expr._solver_terminated = expr._solver_terminated
+            originals[expr] = new_expr
+            created[new_expr] = [
+                cast_assert(ParameterOperatable, _rebase(o)) for o in t.created[expr]
+            ]
+
+        transformations = Transformations(
+            input_print_context=self.print_context,
+            mutated={p: p for p in input_operables},
+            created=created,
+            terminated={
+                cast_assert(ConstrainableExpression, _rebase(e)) for e in t.terminated
+            },
+        )
+        return MutationStage(
+            algorithm=self.algo,
+            iteration=self.iteration,
+            transformations=transformations,
+            print_context=self.print_context,
+            input_operables=input_operables,
+        )
+
     def check_no_illegal_mutations(self):
         # TODO should only run during dev
 
@@ -1666,6 +1965,8 @@ class Mutator:
 
         touched_pre_copy = self.transformations.touched_graphs
         self.check_no_illegal_mutations()
+        if self._can_extend_in_place():
+            return AlgoResult(mutation_stage=self._extend_in_place(), dirty=True)
         self._copy_unmutated()
         stage = MutationStage(
             algorithm=self.algo,
@@ -0,0 +1,237 @@
+# This file is part of the faebryk project
+# SPDX-License-Identifier: MIT
+
+import importlib
+import logging
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from faebryk.core.graph import Graph, GraphFunctions
+from faebryk.core.parameter import (
+    ConstrainableExpression,
+    Expression,
+    HasSideEffects,
+    Parameter,
+    ParameterOperatable,
+)
+from faebryk.core.solver.cache import SolverCache
+from faebryk.core.solver.mutator import MutationMap
+from faebryk.core.solver.utils import S_LOG, get_graphs
+from faebryk.libs.sets.sets import P_Set, as_lit
+from faebryk.libs.units import dimensionless, quantity
+
+logger = logging.getLogger(__name__)
+
+if S_LOG:
+    logger.setLevel(logging.DEBUG)
+
+# Graphs are sent to workers as a description of their operables and solved there
+# from scratch. Encoding and restoring a graph costs a few percent of solving it,
+# but every worker pays ~2s to start and import faebryk. Around 64 expressions a
+# graph takes about as long to solve, below that the pool doesn't pay off.
+_PARALLEL_MIN_EXPRESSIONS = 64
+# Not forked from the current process, which may be running other threads
+_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+@dataclass
+class _EncodedParameter:
+    domain: bytes
+    within: dict | None
+    soft_set: dict | None
+    guess: float | None
+    tolerance_guess: float | None
+    likely_constrained: bool
+
+
+@dataclass
+class _EncodedExpression:
+    module: str
+    qualname: str
+    # index of an operable before this one, or a serialized literal
+    operands: list[int | dict]
+    constrained: bool
+    terminated: bool
+
+
+type _Encoded = _EncodedParameter | _EncodedExpression
+
+
+def _encode(
+    graph: Graph,
+) -> tuple[list[ParameterOperatable], list[_Encoded]] | None:
+    """
+    Picklable description of the operables of a canonical graph, in an order in
+    which they can be rebuilt.
+    None if the graph can't be described.
+    """
+    ops = ParameterOperatable.sort_by_depth(
+        GraphFunctions(graph).nodes_of_type(ParameterOperatable), ascending=True
+    )
+    index = {op: i for i, op in enumerate(ops)}
+
+    out: list[_Encoded] = []
+    try:
+        for op in ops:
+            if isinstance(op, Parameter):
+                if op.units != dimensionless:
+                    return None
+                out.append(
+                    _EncodedParameter(
+                        domain=pickle.dumps(op.domain),
+                        within=None
+                        if op.within is None
+                        else as_lit(op.within).serialize(),
+                        soft_set=None
+                        if op.soft_set is None
+                        else as_lit(op.soft_set).serialize(),
+                        guess=None
+                        if op.guess is None
+                        else float(quantity(op.guess, dimensionless).m),
+                        tolerance_guess=op.tolerance_guess,
+                        likely_constrained=op.likely_constrained,
+                    )
+                )
+                continue
+
+            assert isinstance(op, Expression)
+            if isinstance(op, HasSideEffects) or op.non_operands is not None:
+                return None
+            out.append(
+                _EncodedExpression(
+                    module=type(op).__module__,
+                    qualname=type(op).__qualname__,
+                    operands=[
+                        index[o]
+                        if isinstance(o, ParameterOperatable)
+                        else as_lit(o).serialize()
+                        for o in op.operands
+                    ],
+                    constrained=isinstance(op, ConstrainableExpression)
+                    and op.constrained,
+                    terminated=isinstance(op, ConstrainableExpression)
+                    and op._solver_terminated,
+                )
+            )
+    except Exception as e:
+        logger.debug(f"Can't send graph to a solver worker: {e}")
+        return None
+
+    return ops, out
+
+
+def _decode(encoded: list[_Encoded]) -> list[ParameterOperatable]:
+    ops: list[ParameterOperatable] = []
+    for e in encoded:
+        if isinstance(e, _EncodedParameter):
+            ops.append(
+                Parameter(
+                    domain=pickle.loads(e.domain),
+                    within=None if e.within is None else P_Set.deserialize(e.within),
+                    soft_set=None
+                    if e.soft_set is None
+                    else P_Set.deserialize(e.soft_set),
+                    guess=None if e.guess is None else quantity(e.guess, dimensionless),
+                    tolerance_guess=e.tolerance_guess,
+                    likely_constrained=e.likely_constrained,
+                )
+            )
+            continue
+
+        expr_type: Any = importlib.import_module(e.module)
+        for name in e.qualname.split("."):
+            expr_type = getattr(expr_type, name)
+        expr = expr_type(
+            *(
+                ops[o] if isinstance(o, int) else P_Set.deserialize(o)
+                for o in e.operands
+            )
+        )
+        if e.constrained:
+            assert isinstance(expr, ConstrainableExpression)
+            expr.constrained = True
+            expr._solver_terminated = e.terminated
+        ops.append(expr)
+    return ops
+
+
+def _solve(encoded: list[_Encoded]) -> list[dict | None] | None:
+    """
+    Worker: rebuild a canonical graph, run the iterative algorithms on it to
+    fixpoint and return the serialized result of every operable.
+    None if solving failed, the graph is then solved again in the main process
+    to raise the error there.
+    """
+    from faebryk.core.solver.defaultsolver import DefaultSolver
+
+    try:
+        ops = _decode(encoded)
+        data = DefaultSolver.IterationData(
+            mutation_map=MutationMap.identity(*get_graphs(ops))
+        )
+        DefaultSolver._run_iterations(
+            data,
+            pre_algos=[],
+            it_algos=DefaultSolver.algorithms.iterative,
+            terminal=True,
+            start_iteration=1,
+        )
+    except Exception as e:
+        logger.debug(f"Solving in worker failed: {e!r}")
+        return None
+
+    out = []
+    for op in ops:
+        result = SolverCache._get_result(data.mutation_map, op)
+        out.append(None if result is None else result.serialize())
+    return out
+
+
+def solve_parallel(
+    graphs: list[Graph], workers: int
+) -> dict[Graph, dict[ParameterOperatable, SolverCache.Result]]:
+    """
+    Terminally solve independent canonical graphs in worker processes.
+    Returns the literals of the operables of every graph solved, to be restored
+    with `SolverCache.restore`.
+    Graphs that are too small, can't be sent to a worker or fail to solve there are
+    left out.
+    """
+    encoded = {
+        g: enc
+        for g in graphs
+        if len(GraphFunctions(g).nodes_of_type(Expression)) >= _PARALLEL_MIN_EXPRESSIONS
+        and (enc := _encode(g)) is not None
+    }
+    workers = min(workers, len(encoded))
+    if workers < 2:
+        return {}
+
+    logger.debug(f"Solving {len(encoded)} graphs in {workers} processes")
+    # largest first, so that no worker is left with a big one at the end
+    order = sorted(encoded, key=lambda g: len(encoded[g][1]), reverse=True)
+    out: dict[Graph, dict[ParameterOperatable, SolverCache.Result]] = {}
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(_START_METHOD),
+    ) as pool:
+        futures = [pool.submit(_solve, encoded[g][1]) for g in order]
+        for g, future in zip(order, futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.debug(f"Solving in worker failed: {e!r}")
+                continue
+            if results is None:
+                continue
+            out[g] = {
+                op: SolverCache.Result.deserialize(result)
+                for op, result in zip(encoded[g][0], results)
+                if result is not None
+            }
+    return out
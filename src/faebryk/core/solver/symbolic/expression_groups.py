@@ -25,7 +25,7 @@ from faebryk.libs.util import (
 logger = logging.getLogger(__name__)
 
 
-@algorithm("Reflexive predicates", terminal=False)
+@algorithm("Reflexive predicates", terminal=False, triggers=Reflexive)
 def reflexive_predicates(mutator: Mutator):
     """
     A not lit (done by literal_folding)
@@ -47,7 +47,7 @@ def reflexive_predicates(mutator: Mutator):
         mutator.utils.alias_is_literal_and_check_predicate_eval(pred, True)
 
 
-@algorithm("Idempotent deduplicate", terminal=False)
+@algorithm("Idempotent deduplicate", terminal=False, triggers=IdempotentOperands)
 def idempotent_deduplicate(mutator: Mutator):
     """
     Or(A, A, B) -> Or(A, B)
@@ -63,7 +63,7 @@ def idempotent_deduplicate(mutator: Mutator):
             mutator.mutate_expression(expr, operands=unique_operands)
 
 
-@algorithm("Idempotent unpack", terminal=False)
+@algorithm("Idempotent unpack", terminal=False, triggers=IdempotentExpression)
 def idempotent_unpack(mutator: Mutator):
     """
     Abs(Abs(A)) -> Abs(A)
@@ -79,7 +79,7 @@ def idempotent_unpack(mutator: Mutator):
         mutator.mutate_unpack_expression(expr)
 
 
-@algorithm("Unary identity unpack", terminal=False)
+@algorithm("Unary identity unpack", terminal=False, triggers=UnaryIdentity)
 def unary_identity_unpack(mutator: Mutator):
     """
     E(A), A not lit -> A
@@ -99,7 +99,7 @@ def unary_identity_unpack(mutator: Mutator):
             mutator.mutate_unpack_expression(expr)
 
 
-@algorithm("Involutory fold", terminal=False)
+@algorithm("Involutory fold", terminal=False, triggers=Involutory)
 def involutory_fold(mutator: Mutator):
     """
     Not(Not(A)) -> A
@@ -121,7 +121,7 @@ def involutory_fold(mutator: Mutator):
             mutator.mutator_neutralize_expressions(expr)
 
 
-@algorithm("Associative expressions", terminal=False)
+@algorithm("Associative expressions", terminal=False, triggers=FullyAssociative)
 def associative_flatten(mutator: Mutator):
     """
     Makes
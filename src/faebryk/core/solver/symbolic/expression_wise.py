@@ -113,7 +113,7 @@ def expression_wise_algorithm[T: CanonicalExpression](expr_type: type[T]):
             return expression_wise
         else:
 
-            @algorithm(f"Fold {expr_type.__name__}", terminal=False)
+            @algorithm(f"Fold {expr_type.__name__}", terminal=False, triggers=expr_type)
             def wrapped(mutator: Mutator):
                 fold_literals(mutator, expr_type, func)
 
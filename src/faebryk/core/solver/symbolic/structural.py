@@ -4,7 +4,6 @@
 
 import logging
 import math
-from itertools import combinations
 from typing import cast
 
 from faebryk.core.parameter import (
@@ -25,6 +24,7 @@ from faebryk.core.parameter import (
 from faebryk.core.solver.algorithm import algorithm
 from faebryk.core.solver.mutator import Mutator
 from faebryk.core.solver.utils import (
+    CongruenceTable,
     Contradiction,
     ContradictionByLiteral,
     SolverLiteral,
@@ -38,7 +38,6 @@ from faebryk.libs.sets.sets import BoolSet, P_Set
 from faebryk.libs.util import (
     EquivalenceClasses,
     cast_assert,
-    groupby,
 )
 
 logger = logging.getLogger(__name__)
@@ -47,7 +46,7 @@ logger = logging.getLogger(__name__)
 # TODO: mark terminal=False where applicable
 
 
-@algorithm("Check literal contradiction", terminal=False)
+@algorithm("Check literal contradiction", terminal=False, triggers=(Is, IsSubset))
 def check_literal_contradiction(mutator: Mutator):
     """
     Check if a literal is contradictory
@@ -56,7 +55,11 @@ def check_literal_contradiction(mutator: Mutator):
     mutator.get_literal_mappings(new_only=False, allow_subset=True)
 
 
-@algorithm("Convert inequality with literal to subset", terminal=False)
+@algorithm(
+    "Convert inequality with literal to subset",
+    terminal=False,
+    triggers=GreaterOrEqual,
+)
 def convert_inequality_with_literal_to_subset(mutator: Mutator):
     # TODO if not! A <= x it can be replaced by A intersect [-inf, a] is {}
     """
@@ -162,24 +165,12 @@ def remove_congruent_expressions(mutator: Mutator):
             isinstance(e, (Is, IsSubset)) and e.constrained and e.get_operand_literals()
         )
     ]
-    exprs_by_type = groupby(
-        all_exprs,
-        lambda e: (
-            type(e),
-            len(e.operands),
-            None if not isinstance(e, ConstrainableExpression) else e.constrained,
-        ),
-    )
     full_eq = EquivalenceClasses[Expression](all_exprs)
+    table = CongruenceTable[Expression]()
 
-    for exprs in exprs_by_type.values():
-        if len(exprs) <= 1:
-            continue
-        # TODO use hash to speed up comparisons
-        for e1, e2 in combinations(exprs, 2):
-            # no need for recursive, since subexpr already merged if congruent
-            if not full_eq.is_eq(e1, e2) and e1.is_congruent_to(e2, recursive=False):
-                full_eq.add_eq(e1, e2)
+    for expr in all_exprs:
+        for congruent in table.insert(expr):
+            full_eq.add_eq(expr, congruent)
 
     repres = {}
     for expr in all_exprs:
@@ -315,7 +306,7 @@ def resolve_alias_classes(mutator: Mutator):
             mutator.utils.alias_to(e, representative, from_ops=list(eq_class))
 
 
-@algorithm("Merge intersecting subsets", terminal=False)
+@algorithm("Merge intersecting subsets", terminal=False, triggers=(Is, IsSubset))
 def merge_intersect_subsets(mutator: Mutator):
     """
     A subset L1
@@ -374,7 +365,7 @@ def merge_intersect_subsets(mutator: Mutator):
             mutator._mutate(old_ss, mutator.get_copy(target))
 
 
-@algorithm("Empty set", terminal=False)
+@algorithm("Empty set", terminal=False, triggers=Is)
 def empty_set(mutator: Mutator):
     """
     A is {} -> False
@@ -393,7 +384,7 @@ def empty_set(mutator: Mutator):
     # Converted by literal_folding
 
 
-@algorithm("Transitive subset", terminal=False)
+@algorithm("Transitive subset", terminal=False, triggers=(Is, IsSubset))
 def transitive_subset(mutator: Mutator):
     """
     ```
@@ -421,7 +412,7 @@ def transitive_subset(mutator: Mutator):
             mutator.utils.subset_to(A, X, from_ops=[ss_op, B])
 
 
-@algorithm("Predicate flat terminate", terminal=False)
+@algorithm("Predicate flat terminate", terminal=False, triggers=ConstrainableExpression)
 def predicate_flat_terminate(mutator: Mutator):
     """
     ```
@@ -446,7 +437,7 @@ def predicate_flat_terminate(mutator: Mutator):
         mutator.predicate_terminate(p)
 
 
-@algorithm("Predicate is!! True", terminal=False)
+@algorithm("Predicate is!! True", terminal=False, triggers=Is)
 def predicate_terminated_is_true(mutator: Mutator):
     """
     P!! is! True -> P!! is!! True
@@ -508,7 +499,7 @@ def convert_operable_aliased_to_single_into_literal(mutator: Mutator):
         mutator.mutate_expression(e, operands=ops)
 
 
-@algorithm("Isolate lone parameters", terminal=False)
+@algorithm("Isolate lone parameters", terminal=False, triggers=Is)
 def isolate_lone_params(mutator: Mutator):
     """
     If an expression is aliased to a literal, and only one parameter in the expression
@@ -661,7 +652,11 @@ def isolate_lone_params(mutator: Mutator):
         mutator.mutate_expression(expr, operands=result)
 
 
-@algorithm("Distribute literals across alias classes", terminal=False)
+@algorithm(
+    "Distribute literals across alias classes",
+    terminal=False,
+    triggers=(Is, IsSubset),
+)
 def distribute_literals_across_alias_classes(mutator: Mutator):
     """
     Distribute literals across alias classes
@@ -0,0 +1,212 @@
+# This file is part of the faebryk project
+# SPDX-License-Identifier: MIT
+
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Iterable
+
+from faebryk.core.solver.algorithm import SolverAlgorithm
+from faebryk.core.solver.mutator import AlgoResult
+
+logger = logging.getLogger(__name__)
+
+
+class SolverTrace:
+    """
+    Trace of every algorithm run of the solver.
+
+    Each simplify call is a solve, each algorithm run in it a record with
+    timing, dirty flag, transformation counts and output graph sizes.
+    Records are appended as JSON lines to `solver.jsonl` and as complete events
+    to `solver.trace.json` in Chrome trace-event format (JSON array format,
+    unterminated so it can be appended to), which opens in Perfetto or
+    chrome://tracing.
+    """
+
+    JSONL = "solver.jsonl"
+    CHROME = "solver.trace.json"
+
+    @dataclass
+    class Record:
+        solve: int
+        iteration: int
+        algorithm: str
+        terminal: bool
+        # seconds since start of the trace
+        start: float
+        duration: float
+        dirty: bool
+        created: int
+        mutated: int
+        removed: int
+        graphs: int
+        operables: int
+
+    @dataclass
+    class AlgorithmStats:
+        algorithm: str
+        runs: int = 0
+        dirty: int = 0
+        total: float = 0
+        max: float = 0
+
+        @property
+        def dirty_rate(self) -> float:
+            return self.dirty / self.runs if self.runs else 0
+
+        @property
+        def mean(self) -> float:
+            return self.total / self.runs if self.runs else 0
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._t0 = time.perf_counter()
+        self._solves = 0
+        self._solve_start: float | None = None
+        self._records: list[SolverTrace.Record] = []
+
+    def now(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def start_solve(self):
+        self._solve_start = self.now()
+        self._records.clear()
+
+    def record(
+        self,
+        iteration: int,
+        algorithm: SolverAlgorithm,
+        terminal: bool,
+        start: float,
+        result: AlgoResult,
+    ):
+        """
+        Args:
+        - start: `now()` before the algorithm ran
+        """
+        if self._solve_start is None:
+            return
+        stage = result.mutation_stage
+        transformations = stage.transformations
+        self._records.append(
+            SolverTrace.Record(
+                solve=self._solves,
+                iteration=iteration,
+                algorithm=algorithm.name,
+                terminal=terminal,
+                start=start,
+                duration=self.now() - start,
+                dirty=result.dirty,
+                created=len(transformations.created),
+                mutated=sum(
+                    1
+                    for k, v in transformations.mutated.items()
+                    if k is not v and k not in transformations.copied
+                ),
+                removed=len(transformations.removed),
+                graphs=len(stage.output_graphs),
+                operables=len(stage.output_operables),
+            )
+        )
+
+    def end_solve(self, terminal: bool):
+        """
+        Write the records of the current solve.
+        """
+        if self._solve_start is None:
+            return
+        start, self._solve_start = self._solve_start, None
+        solve = self._solves
+        self._solves += 1
+
+        pid = os.getpid()
+        events = [
+            {
+                "name": f"simplify {'terminal' if terminal else 'non-terminal'}",
+                "cat": "solve",
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": (self.now() - start) * 1e6,
+                "pid": pid,
+                "tid": solve,
+            }
+        ]
+        for r in self._records:
+            events.append(
+                {
+                    "name": r.algorithm,
+                    "cat": "dirty" if r.dirty else "clean",
+                    "ph": "X",
+                    "ts": r.start * 1e6,
+                    "dur": r.duration * 1e6,
+                    "pid": pid,
+                    "tid": solve,
+                    "args": asdict(r),
+                }
+            )
+
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with (self.path / self.JSONL).open("a", encoding="utf-8") as f:
+                for r in self._records:
+                    f.write(json.dumps(asdict(r)) + "\n")
+            chrome = self.path / self.CHROME
+            with chrome.open("a", encoding="utf-8") as f:
+                if f.tell() == 0:
+                    f.write("[\n")
+                for event in events:
+                    f.write(json.dumps(event) + ",\n")
+        except OSError as e:
+            logger.warning(f"Failed to write solver trace to {self.path}: {e}")
+
+        self._records.clear()
+
+    @classmethod
+    def load(cls, *paths: Path) -> list["SolverTrace.Record"]:
+        """
+        Records of the given trace files or all trace files below directories.
+        """
+        names = {f.name for f in fields(cls.Record)}
+        files = [
+            file
+            for path in paths
+            for file in (sorted(path.rglob(cls.JSONL)) if path.is_dir() else [path])
+            if file.is_file()
+        ]
+        out = []
+        for file in dict.fromkeys(f.resolve() for f in files):
+            for line in file.read_text(encoding="utf-8").splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                    out.append(
+                        cls.Record(**{k: v for k, v in data.items() if k in names})
+                    )
+                except (json.JSONDecodeError, TypeError) as e:
+                    logger.warning(f"Skipping invalid record in {file}: {e}")
+        return out
+
+    @classmethod
+    def summarize(
+        cls, records: Iterable["SolverTrace.Record"]
+    ) -> list["SolverTrace.AlgorithmStats"]:
+        """
+        Per algorithm statistics, most expensive first.
+        """
+        stats: dict[str, SolverTrace.AlgorithmStats] = defaultdict(
+            lambda: SolverTrace.AlgorithmStats(algorithm="")
+        )
+        for r in records:
+            s = stats[r.algorithm]
+            s.algorithm = r.algorithm
+            s.runs += 1
+            s.dirty += r.dirty
+            s.total += r.duration
+            s.max = max(s.max, r.duration)
+        return sorted(stats.values(), key=lambda s: s.total, reverse=True)
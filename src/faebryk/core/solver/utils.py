@@ -7,7 +7,6 @@ from collections import defaultdict
 from dataclasses import dataclass
 from itertools import combinations
 from statistics import median
-from types import NoneType
 from typing import (
     TYPE_CHECKING,
     Callable,
@@ -50,6 +49,7 @@ from faebryk.libs.util import (
     ConfigFlagInt,
     KeyErrorAmbiguous,
     groupby,
+    once,
     partition,
     unique,
     unique_ref,
@@ -74,6 +74,39 @@ MAX_ITERATIONS_HEURISTIC = int(
 )
 TIMEOUT = ConfigFlagFloat("STIMEOUT", default=150, descr="Solver timeout").get()
 ALLOW_PARTIAL_STATE = ConfigFlag("SPARTIAL", default=True, descr="Allow partial state")
+INCREMENTAL = ConfigFlag(
+    "SINCREMENTAL",
+    default=True,
+    descr="Only run algorithms on graphs that changed since their last run",
+)
+IN_PLACE = ConfigFlag(
+    "SIN_PLACE",
+    default=True,
+    descr="Extend graphs in place instead of copying them if an algorithm only"
+    " adds expressions",
+)
+TRIGGERS = ConfigFlag(
+    "STRIGGERS",
+    default=True,
+    descr="Only run algorithms if operables of the types they react to changed"
+    " since their last run",
+)
+PROFILE = ConfigFlag(
+    "SPROFILE",
+    default=False,
+    descr="Write a trace of all solver algorithm runs to the build logs",
+)
+CACHE = ConfigFlag(
+    "SCACHE",
+    default=False,
+    descr="Reuse solver results of unchanged graphs across builds",
+)
+PARALLEL = ConfigFlagInt(
+    "SPARALLEL",
+    default=0,
+    descr="Max worker processes for solving independent graphs in parallel"
+    " (terminal only, 0 or 1 to solve in this process)",
+)
 # --------------------------------------------------------------------------------------
 
 if S_LOG:
@@ -165,10 +198,135 @@ def get_graphs(values: Iterable) -> list[Graph]:
 make_lit = as_lit
 
 
+class CongruenceTable[T: Expression]:
+    """
+    Hash-cons table of expressions, finds congruent ones in linear time.
+
+    Expressions are keyed by type, constrained flag and operands.
+    Operatables go into the key by identity, literals only by type, since their
+    equality is tolerance based and can't be hashed.
+    Expressions sharing a key are confirmed with `is_congruent_to`.
+    Literal equality is not transitive, so an expression is compared with every
+    expression sharing its key, not only with one representative.
+    """
+
+    def __init__(self):
+        self._buckets: dict[tuple, list[T]] = defaultdict(list)
+
+    @staticmethod
+    def key(expr: Expression) -> tuple:
+        constrained = (
+            expr.constrained if isinstance(expr, ConstrainableExpression) else None
+        )
+        if isinstance(expr, Commutative):
+            operatables, literals = partition(
+                lambda op: not isinstance(op, ParameterOperatable), expr.operands
+            )
+            operands = (
+                tuple(sorted(map(id, operatables))),
+                tuple(sorted(type(op).__qualname__ for op in literals)),
+            )
+        else:
+            operands = tuple(
+                id(op) if isinstance(op, ParameterOperatable) else type(op)
+                for op in expr.operands
+            )
+        return type(expr), constrained, len(expr.operands), operands
+
+    def insert(self, expr: T) -> list[T]:
+        """
+        Adds expr to the table and returns the expressions in it congruent to expr.
+        """
+        # never congruent to anything
+        if expr.non_operands:
+            return []
+        bucket = self._buckets[self.key(expr)]
+        # no need for recursive, since subexpr already merged if congruent
+        congruent = [e for e in bucket if expr.is_congruent_to(e, recursive=False)]
+        bucket.append(expr)
+        return congruent
+
+
+class PredicateIndex:
+    """
+    Is and IsSubset expressions by the operables they operate on.
+
+    Memoizes the graph queries of the literal, alias and subset lookups.
+    Only valid while no predicates are added to or removed from the graphs,
+    which holds for the input graphs of a mutator.
+    Constraints can still change and are checked on lookup.
+    """
+
+    def __init__(self):
+        self._operations: dict[type, dict[ParameterOperatable, list]] = {
+            Is: {},
+            IsSubset: {},
+        }
+
+    def get_operations[T: Is | IsSubset](
+        self, po: ParameterOperatable, t: type[T]
+    ) -> list[T]:
+        operations = self._operations[t]
+        ops = operations.get(po)
+        if ops is None:
+            ops = operations[po] = list(po.get_operations(t))
+        return [e for e in ops if e.constrained]
+
+    def get_literal(
+        self, po: ParameterOperatable, t: type[Is] | type[IsSubset]
+    ) -> SolverLiteral | None:
+        """
+        Same as `po.try_get_literal(t)`
+        """
+        lits = [
+            lit
+            for e in self.get_operations(po, t)
+            for i, lit in e.get_operand_literals().items()
+            if t is Is or i > 0
+        ]
+        if not lits:
+            return None
+        if len(lits) == 1:
+            return lits[0]
+        if t is IsSubset:
+            return P_Set.intersect_all(*lits)
+        if len(unique(lits, key=as_lit)) != 1:
+            raise KeyErrorAmbiguous(lits)
+        return lits[0]
+
+    def try_extract_literal(
+        self, po: ParameterOperatable, allow_subset: bool = False
+    ) -> SolverLiteral | None:
+        """
+        Same as `ParameterOperatable.try_extract_literal`
+        """
+        is_lit = self.get_literal(po, Is)
+        if not allow_subset:
+            return is_lit
+        ss_lit = self.get_literal(po, IsSubset)
+        if is_lit is None or ss_lit is None:
+            return ss_lit if is_lit is None else is_lit
+        if not P_Set.from_value(is_lit).is_subset_of(P_Set.from_value(ss_lit)):
+            raise KeyErrorAmbiguous([is_lit, ss_lit])
+        return is_lit
+
+
 class MutatorUtils:
     def __init__(self, mutator: "Mutator"):
         self.mutator = mutator
 
+    @property
+    @once
+    def predicate_index(self) -> PredicateIndex:
+        """
+        Index of the predicates in the input graphs of the mutator.
+        """
+        return PredicateIndex()
+
+    def _is_indexed(self, po: ParameterOperatable) -> bool:
+        # new operables live in the output graphs
+        return po in self.mutator._starting_operables
+
     # TODO should be part of mutator
     def try_extract_literal(
         self,
@@ -189,9 +347,16 @@ class MutatorUtils:
         lits = set()
         try:
             for po in pos:
-                lit = ParameterOperatable.try_extract_literal(
-                    po, allow_subset=allow_subset
-                )
+                if ParameterOperatable.is_literal(po):
+                    lit = po
+                elif self._is_indexed(po):
+                    lit = self.predicate_index.try_extract_literal(
+                        po, allow_subset=allow_subset
+                    )
+                else:
+                    lit = ParameterOperatable.try_extract_literal(
+                        po, allow_subset=allow_subset
+                    )
                 if lit is not None:
                     lits.add(lit)
         except KeyErrorAmbiguous as e:
@@ -209,7 +374,7 @@ class MutatorUtils:
                 mutator=self.mutator,
             )
         lit = next(iter(lits), None)
-        assert isinstance(lit, (CanonicalNumber, BoolSet, P_Set, NoneType))
+        assert lit is None or isinstance(lit, (CanonicalNumber, BoolSet, P_Set))
         return lit
 
     def try_extract_literal_info(
@@ -956,25 +1121,26 @@ class MutatorUtils:
             return False
         return op.is_single_element() or op.is_empty()
 
-    @staticmethod
     def get_supersets(
+        self,
         op: ParameterOperatable,
     ) -> Mapping[ParameterOperatable | SolverLiteral, list[IsSubset]]:
-        ss = [
-            e
-            for e in op.get_operations(IsSubset, constrained_only=True)
-            if e.operands[0] is op
-        ]
+        if self._is_indexed(op):
+            ops = self.predicate_index.get_operations(op, IsSubset)
+        else:
+            ops = op.get_operations(IsSubset, constrained_only=True)
+        ss = [e for e in ops if e.operands[0] is op]
         return groupby(ss, key=lambda e: e.operands[1])
 
-    @staticmethod
     def get_aliases(
+        self,
         op: ParameterOperatable,
     ) -> dict[ParameterOperatable | SolverLiteral, Is]:
-        return {
-            e.get_other_operand(op): e
-            for e in op.get_operations(Is, constrained_only=True)
-        }
+        if self._is_indexed(op):
+            ops = self.predicate_index.get_operations(op, Is)
+        else:
+            ops = op.get_operations(Is, constrained_only=True)
+        return {e.get_other_operand(op): e for e in ops}
 
     @staticmethod
     def merge_parameters(params: Iterable[Parameter]) -> Parameter:
@@ -1,13 +1,21 @@
 # This file is part of the faebryk project
 # SPDX-License-Identifier: MIT
 
+import codecs
 import json
 import logging
+import re
 import sys
-from dataclasses import dataclass
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from importlib.metadata import version as get_package_version
+from typing import Any, Callable, Iterable, Iterator
 
+import more_itertools
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
 
 from atopile.config import config
 from faebryk.libs.picker.api.models import (
@@ -16,13 +24,35 @@ from faebryk.libs.picker.api.models import (
     LCSCParams,
     ManufacturerPartParams,
 )
-from faebryk.libs.util import ConfigFlag, once
+from faebryk.libs.util import (
+    ConfigFlag,
+    ConfigFlagFloat,
+    ConfigFlagInt,
+    cast_assert,
+    once,
+)
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_API_TIMEOUT_SECONDS = 30
 
 API_LOG = ConfigFlag("API_LOG", descr="Log API calls (very verbose)", default=False)
+API_BATCH_SIZE = ConfigFlagInt(
+    "API_BATCH_SIZE", default=50, descr="Max queries per API request"
+)
+API_MAX_INFLIGHT = ConfigFlagInt(
+    "API_MAX_INFLIGHT", default=4, descr="Max concurrent API requests"
+)
+API_RETRIES = ConfigFlagInt(
+    "API_RETRIES", default=3, descr="Retries of failed or throttled API requests"
+)
+API_RETRY_BACKOFF = ConfigFlagFloat(
+    "API_RETRY_BACKOFF", default=0.5, descr="Initial delay between API retries [s]"
+)
+
+# throttled or temporarily unavailable
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+STREAM_CHUNK_SIZE = 64 * 1024
 
 
 class ApiError(Exception): ...
@@ -35,23 +65,181 @@ class ApiHTTPError(ApiError):
     def __init__(self, error: requests.exceptions.HTTPError):
         super().__init__()
         self.response = error.response
+        # read while the streamed response is still open
+        self.body = self.response.content
+
+    def json(self) -> Any:
+        return json.loads(self.body)
 
     def __str__(self) -> str:
         status_code = self.response.status_code
         try:
-            detail = self.response.json()["detail"]
+            detail = self.json()["detail"]
         except Exception:
-            detail = self.response.text
+            detail = self.body.decode(errors="replace")
         return f"{super().__str__()}: {status_code} {detail}"
 
 
+class ApiQueryError(ApiError):
+    """
+    The API rejected one or more queries of a multi-query request.
+    `errors` is aligned with the queries, None for the accepted ones.
+    """
+
+    def __init__(self, errors: list[dict | None]):
+        super().__init__(f"{sum(e is not None for e in errors)} queries failed")
+        self.errors = errors
+
+
+class _JsonStream:
+    """
+    Pull decoder for a JSON document arriving in chunks.
+
+    Containers are walked with `iter_object` and `iter_array`, which stop at
+    every member and leave decoding it to the caller (via `value` or another
+    iteration). This way large arrays are decoded item by item while the
+    response is still being received.
+    """
+
+    _WS = re.compile(r"[ \t\n\r]*")
+    _NUMBER_TAIL = re.compile(r"[0-9.eE+\-]*")
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._done = False
+
+    def _fill(self) -> bool:
+        if self._done:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._done = True
+        self._buf = self._buf[self._pos :] + self._utf8.decode(
+            chunk or b"", final=self._done
+        )
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            match = self._WS.match(self._buf, self._pos)
+            assert match
+            self._pos = match.end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ApiError("Malformed API response: unexpected end")
+
+    def _expect(self, char: str):
+        if (found := self._peek()) != char:
+            raise ApiError(f"Malformed API response: expected '{char}', got '{found}'")
+        self._pos += 1
+
+    def value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                if not self._fill():
+                    raise ApiError(f"Malformed API response: {e}") from e
+                continue
+            # a number at the end of the buffer might continue in the next chunk
+            if self._NUMBER_TAIL.fullmatch(self._buf, end) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        Yields the keys of an object, the caller has to consume each value.
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = cast_assert(str, self.value())
+            self._expect(":")
+            yield key
+            if self._peek() == "}":
+                self._pos += 1
+                return
+            self._expect(",")
+
+    def iter_array(self) -> Iterator[None]:
+        """
+        Stops at every item of an array, the caller has to consume each item.
+        """
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield
+            if self._peek() == "]":
+                self._pos += 1
+                return
+            self._expect(",")
+
+    def field[T](self, key: str, decode: Callable[["_JsonStream"], T]) -> T:
+        """
+        Decodes `key` of an object with `decode` and skips all other members.
+        """
+        found = False
+        out = None
+        for k in self.iter_object():
+            if k == key:
+                out = decode(self)
+                found = True
+            else:
+                self.value()
+        if not found:
+            raise ApiError(f"Malformed API response: missing '{key}'")
+        return out  # type: ignore
+
+
+def _decode_components(stream: _JsonStream) -> list[Component]:
+    return [
+        Component.from_dict(stream.value())  # type: ignore
+        for _ in stream.iter_array()
+    ]
+
+
+def _decode_components_field(stream: _JsonStream) -> list[Component]:
+    return stream.field("components", _decode_components)
+
+
+def _decode_component_results(stream: _JsonStream) -> list[list[Component]]:
+    return [_decode_components_field(stream) for _ in stream.iter_array()]
+
+
+def _is_body_read_timeout(error: requests.exceptions.RequestException) -> bool:
+    """
+    Whether reading the body timed out, which requests reports as a connection
+    error.
+    """
+    return isinstance(error, requests.exceptions.ConnectionError) and any(
+        isinstance(arg, ReadTimeoutError) for arg in error.args
+    )
+
+
 class ApiClient:
     @dataclass
     class ApiConfig:
         api_url: str = config.project.services.components.url
         api_key: str | None = None
+        batch_size: int = field(default_factory=lambda: int(API_BATCH_SIZE))
+        max_inflight: int = field(default_factory=lambda: int(API_MAX_INFLIGHT))
+        retries: int = field(default_factory=lambda: int(API_RETRIES))
+        retry_backoff: float = field(default_factory=lambda: float(API_RETRY_BACKOFF))
 
-    def __init__(self):
+    def __init__(self, cfg: ApiConfig | None = None):
+        self._cfg = cfg or self.ApiConfig()
         self._client = requests.Session()
         self._client.headers.update(
             {
@@ -62,101 +250,195 @@ class ApiClient:
                 ),
             }
         )
-
-    @property
-    @once
-    def _cfg(self) -> ApiConfig:
-        return self.ApiConfig()
+        # one pooled connection per in-flight request
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=max(self._cfg.max_inflight, 1)
+        )
+        self._client.mount("http://", adapter)
+        self._client.mount("https://", adapter)
 
     @property
     @once
     def _headers(self) -> dict[str, str]:
         return {"Authorization": f"Bearer {self._cfg.api_key}"}
 
-    def _get(self, url: str, timeout: float = 10) -> requests.Response:
-        try:
-            response = self._client.get(
-                f"{self._cfg.api_url}{url}", timeout=timeout, headers=self._headers
-            )
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            raise ApiHTTPError(e) from e
-
-        if API_LOG:
+    def _retry_delay(self, attempt: int, response: requests.Response | None) -> float:
+        if response is not None:
+            try:
+                return float(response.headers["Retry-After"])
+            except (KeyError, ValueError):
+                pass
+        return self._cfg.retry_backoff * 2**attempt
+
+    def _request[T](
+        self,
+        method: str,
+        url: str,
+        decode: Callable[[_JsonStream], T],
+        **kwargs,
+    ) -> T:
+        """
+        Request and decode the streamed response body.
+        Retries on connection errors, throttling and interrupted bodies.
+        """
+        retries = self._cfg.retries
+        for attempt in range(retries + 1):
+            response = None
+            try:
+                response = self._client.request(
+                    method,
+                    f"{self._cfg.api_url}{url}",
+                    headers=self._headers,
+                    stream=True,
+                    **kwargs,
+                )
+                if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                    response.raise_for_status()
+                    return decode(self._stream(response))
+            except requests.exceptions.HTTPError as e:
+                raise ApiHTTPError(e) from e
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout,
+            ) as e:
+                if attempt == retries:
+                    if _is_body_read_timeout(e):
+                        raise requests.exceptions.ReadTimeout(
+                            *e.args, request=e.request, response=e.response
+                        ) from e
+                    raise
+                logger.debug("%s %s%s failed: %s", method, self._cfg.api_url, url, e)
+            finally:
+                if response is not None:
+                    response.close()
+
+            delay = self._retry_delay(attempt, response)
             logger.debug(
-                "GET %s%s\n->\n%s",
+                "Retrying %s %s%s in %.2fs (%d/%d)",
+                method,
                 self._cfg.api_url,
                 url,
-                json.dumps(response.json(), indent=2),
+                delay,
+                attempt + 1,
+                retries,
             )
-        else:
-            logger.debug("GET %s%s", self._cfg.api_url, url)
-
-        return response
+            time.sleep(delay)
 
-    def _post(
-        self, url: str, data: dict, timeout: float = DEFAULT_API_TIMEOUT_SECONDS
-    ) -> requests.Response:
-        try:
-            response = self._client.post(
-                f"{self._cfg.api_url}{url}",
-                json=data,
-                timeout=timeout,
-                headers=self._headers,
-            )
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            raise ApiHTTPError(e) from e
+        assert False, "unreachable"
 
+    def _stream(self, response: requests.Response) -> _JsonStream:
         if API_LOG:
             logger.debug(
-                "POST %s%s\n%s\n->\n%s",
-                self._cfg.api_url,
-                url,
-                json.dumps(data, indent=2),
+                "%s %s\n->\n%s",
+                response.request.method,
+                response.url,
                 json.dumps(response.json(), indent=2),
             )
-        else:
-            logger.debug(
-                "POST %s%s\n%s", self._cfg.api_url, url, json.dumps(data, indent=2)
-            )
-
-        return response
+            return _JsonStream([response.content])
+        return _JsonStream(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+
+    def _get[T](
+        self, url: str, decode: Callable[[_JsonStream], T], timeout: float = 10
+    ) -> T:
+        logger.debug("GET %s%s", self._cfg.api_url, url)
+        return self._request("GET", url, decode, timeout=timeout)
+
+    def _post[T](
+        self,
+        url: str,
+        data: dict,
+        decode: Callable[[_JsonStream], T],
+        timeout: float = DEFAULT_API_TIMEOUT_SECONDS,
+    ) -> T:
+        logger.debug(
+            "POST %s%s\n%s", self._cfg.api_url, url, json.dumps(data, indent=2)
+        )
+        return self._request("POST", url, decode, json=data, timeout=timeout)
 
     @once
     def fetch_part_by_lcsc(self, lcsc: int) -> list["Component"]:
-        response = self._get(f"/v0/component/lcsc/{lcsc}")
-        return [Component.from_dict(part) for part in response.json()["components"]]  # type: ignore
+        return self._get(f"/v0/component/lcsc/{lcsc}", _decode_components_field)
 
     @once
     def fetch_part_by_mfr(self, mfr: str, mfr_pn: str) -> list["Component"]:
-        response = self._get(f"/v0/component/mfr/{mfr}/{mfr_pn}")
-        return [Component.from_dict(part) for part in response.json()["components"]]  # type: ignore
+        return self._get(f"/v0/component/mfr/{mfr}/{mfr_pn}", _decode_components_field)
 
     def query_parts(self, method: str, params: BaseParams) -> list["Component"]:
-        response = self._post(f"/v0/query/{method}", params.serialize())
-        return [Component.from_dict(part) for part in response.json()["components"]]  # type: ignore
+        return self._post(
+            f"/v0/query/{method}", params.serialize(), _decode_components_field
+        )
 
     @once
     def fetch_parts(self, params: BaseParams) -> list["Component"]:
         assert params.endpoint
         return self.query_parts(params.endpoint, params)
 
-    def fetch_parts_multiple(
+    def _fetch_batch(
         self, params: list[BaseParams | LCSCParams | ManufacturerPartParams]
     ) -> list[list["Component"]]:
-        # TODO: batch queries
-        response = self._post("/v0/query", {"queries": [p.serialize() for p in params]})
-        results = [
-            [Component.from_dict(part) for part in result["components"]]  # type: ignore
-            for result in response.json()["results"]
-        ]
+        results = self._post(
+            "/v0/query",
+            {"queries": [p.serialize() for p in params]},
+            lambda stream: stream.field("results", _decode_component_results),
+        )
 
         if len(results) != len(params):
             raise ApiError(f"Expected {len(params)} results, got {len(results)}")
 
         return results
 
+    def fetch_parts_multiple(
+        self, params: list[BaseParams | LCSCParams | ManufacturerPartParams]
+    ) -> list[list["Component"]]:
+        """
+        Runs the queries in batches of `batch_size`, with up to `max_inflight`
+        requests at once.
+
+        Raises:
+            ApiQueryError: if the API rejected some of the queries
+        """
+        batches = list(more_itertools.chunked(params, max(self._cfg.batch_size, 1)))
+        if not batches:
+            return []
+
+        with ThreadPoolExecutor(
+            max_workers=max(min(self._cfg.max_inflight, len(batches)), 1)
+        ) as pool:
+            futures = [pool.submit(self._fetch_batch, batch) for batch in batches]
+
+            results: list[list[Component]] = []
+            errors: list[dict | None] = []
+            query_error: ApiHTTPError | None = None
+            for batch, future in zip(batches, futures):
+                try:
+                    batch_results = future.result()
+                except ApiHTTPError as e:
+                    batch_errors = self._get_query_errors(e)
+                    if batch_errors is None or len(batch_errors) != len(batch):
+                        for f in futures:
+                            f.cancel()
+                        raise
+                    query_error = query_error or e
+                    errors.extend(batch_errors)
+                    continue
+                results.extend(batch_results)
+                errors.extend([None] * len(batch))
+
+        if query_error is not None:
+            raise ApiQueryError(errors) from query_error
+
+        return results
+
+    @staticmethod
+    def _get_query_errors(error: ApiHTTPError) -> list[dict | None] | None:
+        if error.response.status_code != 400:
+            return None
+        try:
+            return error.json()["detail"]["errors"]
+        except Exception:
+            return None
+
 
 @once
 def get_api_client() -> ApiClient:
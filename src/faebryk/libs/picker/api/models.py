@@ -5,7 +5,7 @@ import functools
 import logging
 from dataclasses import asdict, dataclass, field, make_dataclass
 from textwrap import indent
-from typing import Any, Iterable
+from typing import Any, ClassVar, Iterable
 
 from dataclasses_json import config as dataclass_json_config
 from dataclasses_json import dataclass_json
@@ -64,6 +64,8 @@ class BaseParams(Serializable):
     package: ApiParamT = SerializableField()
     qty: int
     endpoint: str | None = None
+    # designator prefix of the module type, which its package names start with
+    package_prefix: ClassVar[str] = ""
 
     def serialize(self) -> dict:
         return self.to_dict()  # type: ignore
@@ -88,6 +90,7 @@ def _make_params_for_type(module_type: type[Module], endpoint: str) -> type:
         f"{module_type.__name__}Params",
         fields,
         bases=(BaseParams,),
+        namespace={"package_prefix": m.get_trait(F.has_designator_prefix).get_prefix()},
         frozen=True,
         kw_only=True,
     )
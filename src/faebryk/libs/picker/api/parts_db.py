@@ -0,0 +1,366 @@
+# This file is part of the faebryk project
+# SPDX-License-Identifier: MIT
+
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from dataclasses import fields
+from pathlib import Path
+from typing import Iterable
+
+from faebryk.libs.paths import get_cache_dir
+from faebryk.libs.picker.api.models import (
+    BaseParams,
+    Component,
+    LCSCParams,
+    ManufacturerPartParams,
+)
+from faebryk.libs.sets.quantity_sets import Quantity_Interval_Disjoint
+from faebryk.libs.sets.sets import EnumSet, P_Set
+from faebryk.libs.util import (
+    ConfigFlag,
+    ConfigFlagFloat,
+    ConfigFlagInt,
+    ConfigFlagString,
+    once,
+)
+
+logger = logging.getLogger(__name__)
+
+PARTS_DB = ConfigFlag("PARTS_DB", default=False, descr="Use the local parts database")
+PARTS_DB_PATH = ConfigFlagString(
+    "PARTS_DB_PATH",
+    default=str(get_cache_dir() / "parts.sqlite"),
+    descr="Location of the local parts database",
+)
+PARTS_DB_OFFLINE = ConfigFlag(
+    "PARTS_DB_OFFLINE",
+    default=False,
+    descr="Answer part queries from the local parts database only",
+)
+PARTS_DB_MAX_RESULTS = ConfigFlagInt(
+    "PARTS_DB_MAX_RESULTS",
+    default=50,
+    descr="Max components answered locally per type query, like the API",
+)
+PARTS_DB_MAX_AGE = ConfigFlagFloat(
+    "PARTS_DB_MAX_AGE",
+    default=24 * 3600.0,
+    descr="Max age of remote query results in the local parts database [s]",
+)
+
+type Query = BaseParams | LCSCParams | ManufacturerPartParams
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS components (
+    lcsc INTEGER PRIMARY KEY,
+    endpoint TEXT,
+    manufacturer_name TEXT NOT NULL,
+    part_number TEXT NOT NULL,
+    package TEXT NOT NULL,
+    fetched REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS components_package ON components (endpoint, package);
+CREATE INDEX IF NOT EXISTS components_mfr
+    ON components (manufacturer_name, part_number);
+
+CREATE TABLE IF NOT EXISTS attributes (
+    lcsc INTEGER NOT NULL REFERENCES components (lcsc) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    PRIMARY KEY (lcsc, name)
+);
+CREATE INDEX IF NOT EXISTS attributes_range ON attributes (name, min, max);
+
+CREATE TABLE IF NOT EXISTS queries (
+    key TEXT PRIMARY KEY,
+    lcscs TEXT NOT NULL,
+    fetched REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS complete_endpoints (
+    endpoint TEXT PRIMARY KEY
+);
+"""
+
+_NON_ATTRIBUTE_FIELDS = {f.name for f in fields(BaseParams)}
+
+
+def _query_key(query: Query) -> str:
+    data = json.dumps(
+        {"type": type(query).__name__, "query": query.serialize()}, sort_keys=True
+    )
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _query_attributes(query: BaseParams) -> dict[str, P_Set]:
+    return {
+        f.name: value
+        for f in fields(query)
+        if f.name not in _NON_ATTRIBUTE_FIELDS
+        and (value := getattr(query, f.name)) is not None
+    }
+
+
+def _bounds(literal: P_Set | None) -> tuple[float, float] | None:
+    """
+    Hull of a numeric literal in base units
+    """
+    if not isinstance(literal, Quantity_Interval_Disjoint) or literal.is_empty():
+        return None
+    return float(literal._intervals.min_elem), float(literal._intervals.max_elem)
+
+
+def _package_names(query: BaseParams) -> list[str] | None:
+    """
+    Component package names matching the package literal of a type query.
+    Packages of a module type are its designator prefix and the package name of
+    the components, e.g. R0402 for resistors in package 0402.
+    """
+    if not isinstance(query.package, EnumSet):
+        return None
+    prefix = query.package_prefix
+    return [
+        name.removeprefix(prefix)
+        for e in query.package.elements
+        if (name := str(e.value)).startswith(prefix)
+    ]
+
+
+class PartsDB:
+    """
+    Local SQLite store of components, seeded from the responses of the
+    components API or a bulk dump.
+
+    A query is answered locally if
+    - the same query was answered remotely within `max_age`
+    - the part (LCSC or manufacturer part number) is known and recent enough
+    - it is a type query of an endpoint imported completely from a dump
+    - or in offline mode, from whatever parts are stored.
+
+    Type queries are answered with range lookups on the numeric attribute
+    hulls and the package, and then checked exactly against the query literals.
+    Like the API, at most `max_results` of the best ranked parts are returned.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_age: float,
+        offline: bool = False,
+        max_results: int = 50,
+    ):
+        self.path = path
+        self.max_age = max_age
+        self.offline = offline
+        self.max_results = max_results
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def _is_fresh(self, fetched: float) -> bool:
+        return self.offline or time.time() - fetched <= self.max_age
+
+    def _get_components(self, lcscs: list[int]) -> list[Component] | None:
+        """
+        Components in the given order, None if any is missing
+        """
+        rows = {
+            lcsc: data
+            for lcsc, data in self._db.execute(
+                "SELECT lcsc, data FROM components"
+                f" WHERE lcsc IN ({','.join('?' * len(lcscs))})",
+                lcscs,
+            )
+        }
+        if len(rows) != len(set(lcscs)):
+            return None
+        return [Component.from_dict(json.loads(rows[lcsc])) for lcsc in lcscs]  # type: ignore
+
+    def _find_by_type(self, query: BaseParams) -> list[Component]:
+        assert query.endpoint
+        sql = ["SELECT data FROM components WHERE endpoint = ?"]
+        args: list = [query.endpoint]
+
+        if (packages := _package_names(query)) is not None:
+            sql.append(f"AND package IN ({','.join('?' * len(packages))})")
+            args.extend(packages)
+
+        attributes = _query_attributes(query)
+        for name, literal in attributes.items():
+            bounds = _bounds(literal)
+            if bounds is None:
+                continue
+            sql.append(
+                "AND lcsc IN (SELECT lcsc FROM attributes"
+                " WHERE name = ? AND min >= ? AND max <= ?)"
+            )
+            args.extend([name, *bounds])
+
+        candidates = [
+            Component.from_dict(json.loads(data))  # type: ignore
+            for (data,) in self._db.execute(" ".join(sql), args)
+        ]
+
+        def _matches(c: Component) -> bool:
+            for name, literal in attributes.items():
+                c_literal = c.attribute_literals.get(name)
+                if c_literal is None or not literal.is_superset_of(c_literal):
+                    return False
+            return True
+
+        return sorted(
+            filter(_matches, candidates),
+            key=lambda c: (
+                not c.is_basic,
+                not c.is_preferred,
+                c.get_price(query.qty),
+                c.lcsc,
+            ),
+        )[: self.max_results]
+
+    def lookup(self, query: Query) -> list[Component] | None:
+        """
+        Local answer of the query, None if it has to be asked remotely.
+        """
+        row = self._db.execute(
+            "SELECT lcscs, fetched FROM queries WHERE key = ?", [_query_key(query)]
+        ).fetchone()
+        if row is not None and self._is_fresh(row[1]):
+            if (out := self._get_components(json.loads(row[0]))) is not None:
+                return out
+
+        match query:
+            case LCSCParams():
+                rows = self._db.execute(
+                    "SELECT data, fetched FROM components WHERE lcsc = ?",
+                    [query.lcsc],
+                ).fetchall()
+            case ManufacturerPartParams():
+                rows = self._db.execute(
+                    "SELECT data, fetched FROM components"
+                    " WHERE manufacturer_name = ? AND part_number = ?",
+                    [query.manufacturer_name, query.part_number],
+                ).fetchall()
+            case BaseParams():
+                complete = self._db.execute(
+                    "SELECT 1 FROM complete_endpoints WHERE endpoint = ?",
+                    [query.endpoint],
+                ).fetchone()
+                if complete is None and not self.offline:
+                    return None
+                return self._find_by_type(query)
+
+        if rows and all(self._is_fresh(fetched) for _, fetched in rows):
+            return [Component.from_dict(json.loads(data)) for data, _ in rows]  # type: ignore
+        if self.offline:
+            return []
+        return None
+
+    def _insert_components(
+        self, components: Iterable[Component], endpoint: str | None, fetched: float
+    ):
+        for c in components:
+            self._db.execute(
+                "INSERT INTO components"
+                " (lcsc, endpoint, manufacturer_name, part_number, package, fetched,"
+                " data) VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (lcsc) DO UPDATE SET"
+                " endpoint = coalesce(excluded.endpoint, endpoint),"
+                " manufacturer_name = excluded.manufacturer_name,"
+                " part_number = excluded.part_number,"
+                " package = excluded.package,"
+                " fetched = excluded.fetched,"
+                " data = excluded.data",
+                [
+                    c.lcsc,
+                    endpoint,
+                    c.manufacturer_name,
+                    c.part_number,
+                    c.package,
+                    fetched,
+                    json.dumps(c.to_dict()),  # type: ignore
+                ],
+            )
+            self._db.execute("DELETE FROM attributes WHERE lcsc = ?", [c.lcsc])
+            self._db.executemany(
+                "INSERT INTO attributes (lcsc, name, min, max) VALUES (?, ?, ?, ?)",
+                [
+                    (c.lcsc, name, *bounds)
+                    for name, literal in c.attribute_literals.items()
+                    if (bounds := _bounds(literal)) is not None
+                ],
+            )
+
+    def store(self, queries: list[Query], results: list[list[Component]]):
+        """
+        Store the remote results of the queries
+        """
+        now = time.time()
+        with self._db:
+            for query, components in zip(queries, results, strict=True):
+                endpoint = query.endpoint if isinstance(query, BaseParams) else None
+                self._insert_components(components, endpoint, now)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO queries (key, lcscs, fetched)"
+                    " VALUES (?, ?, ?)",
+                    [_query_key(query), json.dumps([c.lcsc for c in components]), now],
+                )
+
+    def import_components(
+        self, endpoint: str, components: Iterable[Component], complete: bool = True
+    ):
+        """
+        Seed the database with the components of an endpoint.
+
+        Args:
+        - complete: the components are all parts of the endpoint, so type queries
+            can be answered locally
+        """
+        with self._db:
+            self._insert_components(components, endpoint, time.time())
+            if complete:
+                self._db.execute(
+                    "INSERT OR IGNORE INTO complete_endpoints (endpoint) VALUES (?)",
+                    [endpoint],
+                )
+
+    def import_dump(self, path: Path):
+        """
+        Import a bulk dump: JSON lines of `{"endpoint": ..., "components": [...]}`
+        """
+        with path.open() as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                self.import_components(
+                    data["endpoint"],
+                    [Component.from_dict(c) for c in data["components"]],  # type: ignore
+                )
+
+
+@once
+def get_parts_db() -> PartsDB | None:
+    if not PARTS_DB:
+        return None
+    try:
+        return PartsDB(
+            Path(PARTS_DB_PATH.get()),
+            max_age=float(PARTS_DB_MAX_AGE),
+            offline=bool(PARTS_DB_OFFLINE),
+            max_results=int(PARTS_DB_MAX_RESULTS),
+        )
+    except sqlite3.Error as e:
+        logger.warning(f"Local parts database unavailable: {e}")
+        return None
@@ -5,6 +5,7 @@ import logging
 import re
 from dataclasses import fields
 from socket import gaierror
+from typing import Hashable, Iterable, cast
 
 import more_itertools
 from requests.exceptions import ConnectionError, ReadTimeout
@@ -12,10 +13,18 @@ from requests.exceptions import ConnectionError, ReadTimeout
 import faebryk.library._F as F
 from atopile.errors import UserInfraError
 from faebryk.core.module import Module
-from faebryk.core.parameter import And, Is, Parameter, ParameterOperatable
+from faebryk.core.parameter import (
+    And,
+    ConstrainableExpression,
+    Expression,
+    Is,
+    Parameter,
+    ParameterOperatable,
+)
+from faebryk.core.solver.defaultsolver import DefaultSolver
 from faebryk.core.solver.solver import LOG_PICK_SOLVE, Solver
 from faebryk.libs.exceptions import UserException, downgrade
-from faebryk.libs.picker.api.api import ApiHTTPError, get_api_client
+from faebryk.libs.picker.api.api import ApiQueryError, get_api_client
 from faebryk.libs.picker.api.models import (
     BaseParams,
     CapacitorParams,
@@ -30,12 +39,14 @@ from faebryk.libs.picker.api.models import (
     ResistorParams,
     # TVSParams,
 )
+from faebryk.libs.picker.api.parts_db import get_parts_db
 from faebryk.libs.picker.lcsc import (
     LCSC_NoDataException,
     LCSC_PinmapException,
     attach,
     check_attachable,
     get_raw,
+    prefetch_raw,
 )
 from faebryk.libs.picker.picker import (
     NotCompatibleException,
@@ -48,7 +59,6 @@ from faebryk.libs.util import (
     Tree,
     cast_assert,
     groupby,
-    not_none,
 )
 
 logger = logging.getLogger(__name__)
@@ -159,9 +169,57 @@ def _process_candidates(module: Module, candidates: list[Component]) -> list[Com
     return filtered_candidates
 
 
+def _fetch_parts(
+    queries: list[BaseParams | LCSCParams | ManufacturerPartParams],
+) -> list[list[Component]]:
+    """
+    Answer queries from the local parts database where possible,
+    and only ask the API for the rest.
+    """
+    db = get_parts_db()
+    if db is None:
+        return client.fetch_parts_multiple(queries)
+
+    local = [db.lookup(q) for q in queries]
+    misses = [q for q, r in zip(queries, local) if r is None]
+    if not misses:
+        return cast(list[list[Component]], local)
+
+    try:
+        remote = client.fetch_parts_multiple(misses)
+    except ApiQueryError as e:
+        errors = iter(e.errors)
+        raise ApiQueryError(
+            [None if r is not None else next(errors) for r in local]
+        ) from e
+    db.store(misses, remote)
+
+    remote_it = iter(remote)
+    return [r if r is not None else next(remote_it) for r in local]
+
+
+def _candidate_fingerprint(module: Module) -> Hashable:
+    """
+    Modules with the same query and fingerprint accept the same candidates.
+    (see `attach(..., check_only=True)`)
+    Modules without a footprint or a way to attach to one are checked against
+    their pin association heuristic, which depends on the instance (mapping and
+    needed optional interfaces), so they only match themselves.
+    """
+    has_footprint = module.has_trait(F.has_footprint)
+    can_attach = module.has_trait(F.can_attach_to_footprint)
+    if not has_footprint and not can_attach:
+        return module
+    return (has_footprint, can_attach)
+
+
 def _find_modules(
     modules: Tree[Module], solver: Solver
 ) -> dict[Module, list[Component]]:
+    """
+    Modules with identical queries (same pick type and known parameter
+    supersets) are queried and filtered only once.
+    """
     timings = Times(name="find_modules")
 
     params = {m: _prepare_query(m, solver) for m in modules}
@@ -169,13 +227,15 @@ def _find_modules(
 
     grouped = groupby(params.items(), lambda p: p[1])
     queries = list(grouped.keys())
+    if LOG_PICK_SOLVE and len(queries) < len(params):
+        logger.info(f"Deduplicated {len(params)} pick queries to {len(queries)}")
 
     def _map_response[T](results: list[T]) -> dict[Module, T]:
         assert len(results) == len(queries)
         return {m: r for ms, r in zip(grouped.values(), results) for m, _ in ms}
 
     try:
-        results = client.fetch_parts_multiple(queries)
+        results = _fetch_parts(queries)
         timings.add("fetch parts")
     except ConnectionError as e:
         cause = e.args[0]
@@ -194,31 +254,33 @@ def _find_modules(
             "Fetching component data failed to complete in time. "
             "Please try again later."
         ) from e
-    except ApiHTTPError as e:
-        if e.response.status_code == 400:
-            response = cast_assert(dict, e.response.json())
-            if errors := response.get("detail", {}).get("errors", None):
-                raise ExceptionGroup(
-                    "Failed to fetch one or more parts",
-                    [
-                        PickError(
-                            f"{error['message']} for {module.get_full_name()}"
-                            f"\n{query.pretty_str()}",
-                            module,
-                        )
-                        for module, (query, error) in _map_response(
-                            list(zip(queries, errors))
-                        ).items()
-                        if error is not None
-                    ],
-                ) from e
-            else:
-                raise
-        raise e
+    except ApiQueryError as e:
+        raise ExceptionGroup(
+            "Failed to fetch one or more parts",
+            [
+                PickError(
+                    f"{error['message']} for {module.get_full_name()}"
+                    f"\n{query.pretty_str()}",
+                    module,
+                )
+                for module, (query, error) in _map_response(
+                    list(zip(queries, e.errors))
+                ).items()
+                if error is not None
+            ],
+        ) from e
 
-    out = {m: _process_candidates(m, r) for m, r in _map_response(results).items()}
+    # usually the first candidate of each query is attachable
+    prefetch_raw(r[0].lcsc_display for r in results if r)
+    timings.add("prefetch raw data")
+
+    out = {}
+    for (_, ms), r in zip(grouped.items(), results):
+        for same in groupby((m for m, _ in ms), _candidate_fingerprint).values():
+            processed = _process_candidates(same[0], r)
+            out.update({m: list(processed) for m in same})
     timings.add("process candidates")
-    return out
+    return {m: out[m] for m in params}
 
 
 def _attach(module: Module, c: Component):
@@ -260,9 +322,8 @@ def _get_compatible_parameters(
         raise NotCompatibleException(module, c) from e
 
     design_params = module.get_trait(F.is_pickable_by_type).get_parameters()
-    component_params = c.attribute_literals
 
-    if no_attr := component_params.keys() - design_params.keys():
+    if no_attr := c.attribute_literals.keys() - design_params.keys():
         with downgrade(UserException):
             no_attr_str = "\n".join(f"- `{a}`" for a in no_attr)
             raise UserException(
@@ -272,21 +333,11 @@ def _get_compatible_parameters(
                 " module/component in your design."
             )
 
-    def _map_param(name: str, param: Parameter) -> tuple[Parameter, P_Set]:
-        c_range = component_params.get(name)
-        if c_range is None:
-            c_range = param.domain.unbounded(param)
-        return param, c_range
-
-    param_mapping = [
-        _map_param(name, param)
-        for name, param in design_params.items()
-        if not param.has_trait(does_not_require_picker_check)
-    ]
+    param_mapping = _map_parameters(module, c)
 
     # check for any param that has few supersets whether the component's range
     # is compatible already instead of waiting for the solver
-    for m_param, c_range in param_mapping:
+    for m_param, c_range in param_mapping.items():
         # TODO other loglevel
         # logger.warning(f"Checking obvious incompatibility for param {m_param}")
         known_superset = solver.inspect_get_known_supersets(m_param)
@@ -298,7 +349,161 @@ def _get_compatible_parameters(
                 )
             raise NotCompatibleException(module, c, m_param, c_range)
 
-    return {p: c_range for p, c_range in param_mapping}
+    return param_mapping
+
+
+def _map_parameters(module: Module, c: "Component") -> dict[Parameter, P_Set]:
+    """
+    Ranges of the component for the parameters of the module that need checking
+    """
+    component_params = c.attribute_literals
+    out = {}
+    for name, param in module.get_trait(F.is_pickable_by_type).get_parameters().items():
+        if param.has_trait(does_not_require_picker_check):
+            continue
+        c_range = component_params.get(name)
+        if c_range is None:
+            c_range = param.domain.unbounded(param)
+        out[param] = c_range
+    return out
+
+
+def _get_compatible_parameters_grouped(
+    module_candidates: list[tuple[Module, "Component"]], solver: Solver
+) -> dict[
+    Module, dict[Parameter, ParameterOperatable.Literal] | NotCompatibleException
+]:
+    """
+    `_get_compatible_parameters` for many modules.
+    Modules with the same candidate and known parameter supersets get the same
+    verdict, so it's checked once per group and fanned out to the others.
+    """
+
+    def _key(module: Module, c: "Component") -> Hashable:
+        if not module.has_trait(F.is_pickable_by_type):
+            return module
+        return (
+            c.lcsc,
+            tuple(
+                (
+                    name,
+                    None
+                    if param.has_trait(does_not_require_picker_check)
+                    else solver.inspect_get_known_supersets(param),
+                )
+                for name, param in module.get_trait(F.is_pickable_by_type)
+                .get_parameters()
+                .items()
+            ),
+        )
+
+    out = {}
+    for group in groupby(module_candidates, lambda mc: _key(*mc)).values():
+        (module, c), *others = group
+        try:
+            out[module] = _get_compatible_parameters(module, c, solver)
+        except NotCompatibleException as e:
+            out[module] = e
+            for m, _ in others:
+                param = (
+                    None
+                    if e.param is None
+                    else m.get_trait(F.is_pickable_by_type).get_parameters()[
+                        e.param.get_name()
+                    ]
+                )
+                out[m] = NotCompatibleException(m, c, param, e.c_range)
+            continue
+        out.update({m: _map_parameters(m, c) for m, _ in others})
+
+    return out
+
+
+def _copy_operables(
+    operables: Iterable[ParameterOperatable],
+) -> dict[ParameterOperatable, ParameterOperatable]:
+    """
+    Copy the given operables and all parameters and expressions constraining them
+    into new graphs, returns the copy of each of them.
+    Only what is reachable through operations and operands is copied, the rest of
+    the design can't affect the given operables.
+    """
+    reachable: set[ParameterOperatable] = set(operables)
+    to_visit = list(reachable)
+    while to_visit:
+        po = to_visit.pop()
+        neighbours: set[ParameterOperatable] = set(po.get_operations())
+        if isinstance(po, Expression):
+            neighbours.update(po.operatable_operands)
+        neighbours.difference_update(reachable)
+        reachable.update(neighbours)
+        to_visit.extend(neighbours)
+
+    copies: dict[ParameterOperatable, ParameterOperatable] = {}
+
+    def _copy(op: ParameterOperatable.All) -> ParameterOperatable.All:
+        if not isinstance(op, ParameterOperatable):
+            return op
+        return copies[op]
+
+    for po in ParameterOperatable.sort_by_depth(reachable, ascending=True):
+        if isinstance(po, Parameter):
+            copies[po] = Parameter(
+                units=po.units,
+                within=po.within,
+                domain=po.domain,
+                soft_set=po.soft_set,
+                guess=po.guess,
+                tolerance_guess=po.tolerance_guess,
+                likely_constrained=po.likely_constrained,
+            )
+            continue
+
+        expr = cast_assert(Expression, po)
+        operands = [_copy(op) for op in expr.operands]
+        if expr.non_operands is not None:
+            new_expr = type(expr)(*operands, non_operands=expr.non_operands)  # type: ignore
+        else:
+            new_expr = type(expr)(*operands)
+        if isinstance(expr, ConstrainableExpression):
+            assert isinstance(new_expr, ConstrainableExpression)
+            new_expr.constrained = expr.constrained
+        copies[expr] = new_expr
+
+    return copies
+
+
+def _check_parameters_compatible(
+    mappings: list[dict[Parameter, ParameterOperatable.Literal]],
+    solver: Solver,
+    allow_not_deducible: bool = False,
+):
+    """
+    Check if all parameters can take the ranges of their components at once.
+    The predicates are built on a copy of the parameter graph, so a failed check
+    leaves the design untouched. The solver keeps its state of the design.
+    """
+
+    params = [m_param for mapping in mappings for m_param in mapping]
+    if not params:
+        return
+
+    copies = _copy_operables(params)
+    predicates = (
+        Is(copies[m_param], c_range)
+        for mapping in mappings
+        for m_param, c_range in mapping.items()
+    )
+
+    state = solver.state if isinstance(solver, DefaultSolver) else None
+    try:
+        solver.try_fulfill(
+            And(*predicates), lock=False, allow_unknown=allow_not_deducible
+        )
+    finally:
+        # solving the copy replaced the state
+        if isinstance(solver, DefaultSolver):
+            solver.state = state
 
 
 def _check_candidates_compatible(
@@ -314,18 +519,18 @@ def _check_candidates_compatible(
     if not module_candidates:
         return
 
-    mappings = [_get_compatible_parameters(m, c, solver) for m, c in module_candidates]
+    mappings = []
+    for mapping in _get_compatible_parameters_grouped(
+        module_candidates, solver
+    ).values():
+        if isinstance(mapping, NotCompatibleException):
+            raise mapping
+        mappings.append(mapping)
 
     if LOG_PICK_SOLVE:
         logger.info(f"Solving for modules: {[m for m, _ in module_candidates]}")
 
-    predicates = (
-        Is(m_param, c_range)
-        for param_mapping in mappings
-        for m_param, c_range in not_none(param_mapping).items()
-    )
-
-    solver.try_fulfill(And(*predicates), lock=False, allow_unknown=allow_not_deducible)
+    _check_parameters_compatible(mappings, solver, allow_not_deducible)
 
 
 # public -------------------------------------------------------------------------------
@@ -363,8 +568,7 @@ def get_candidates(
     empty = set()
 
     while candidates:
-        # TODO deduplicate parts with same literals
-        new_parts = _find_modules(modules, solver)
+        new_parts = _find_modules(candidates, solver)
 
         parts.update({m: p for m, p in new_parts.items() if p})
         empty = {m for m, p in new_parts.items() if not p}
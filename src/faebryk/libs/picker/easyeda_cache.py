@@ -0,0 +1,193 @@
+# This file is part of the faebryk project
+# SPDX-License-Identifier: MIT
+
+import json
+import logging
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable
+
+import requests
+
+from faebryk.libs.paths import get_cache_dir
+from faebryk.libs.util import (
+    ConfigFlag,
+    ConfigFlagFloat,
+    ConfigFlagInt,
+    ConfigFlagString,
+    once,
+)
+
+logger = logging.getLogger(__name__)
+
+EASYEDA_CACHE = ConfigFlag(
+    "EASYEDA_CACHE",
+    default=True,
+    descr="Keep EasyEDA part data in a local database shared between projects",
+)
+EASYEDA_CACHE_PATH = ConfigFlagString(
+    "EASYEDA_CACHE_PATH",
+    default=str(get_cache_dir() / "easyeda.sqlite"),
+    descr="Location of the EasyEDA part data database",
+)
+EASYEDA_NO_DATA_MAX_AGE = ConfigFlagFloat(
+    "EASYEDA_NO_DATA_MAX_AGE",
+    default=7 * 24 * 3600.0,
+    descr="Time after which parts without EasyEDA data are asked for again [s]",
+)
+EASYEDA_WORKERS = ConfigFlagInt(
+    "EASYEDA_WORKERS",
+    default=8,
+    descr="Max concurrent EasyEDA downloads when prefetching",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw (
+    lcsc TEXT PRIMARY KEY,
+    fetched REAL NOT NULL,
+    data BLOB
+);
+"""
+
+
+def _download(lcsc_id: str) -> dict | None:
+    """
+    Data of the part, `{}` if EasyEDA does not know the part and None if the
+    request failed without a definitive answer.
+    """
+    from easyeda2kicad.easyeda import easyeda_api
+
+    # EasyedaApi.get_cad_data_of_component answers every failure with `{}`,
+    # so do the same request but keep the response
+    api = easyeda_api.EasyedaApi()
+    r = requests.get(
+        easyeda_api.API_ENDPOINT.format(lcsc_id=lcsc_id),
+        headers=api.headers,
+        timeout=10,
+    )
+    if r.status_code == 404:
+        return {}
+    if not r.ok:
+        logger.debug(f"EasyEDA request for {lcsc_id} failed: {r.status_code}")
+        return None
+
+    response = r.json()
+    if not isinstance(response, dict):
+        return None
+    if response.get("success") is False:
+        if response.get("code") == 404:
+            return {}
+        logger.debug(f"EasyEDA request for {lcsc_id} failed: {response}")
+        return None
+    return response.get("result") or None
+
+
+class EasyedaCache:
+    """
+    Local SQLite store of raw EasyEDA part data, zlib compressed.
+
+    Parts EasyEDA reports as unknown are stored as such and only asked for again
+    after `no_data_max_age`. Failed requests are not stored. Part data itself
+    does not expire.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        no_data_max_age: float,
+        workers: int = 8,
+    ):
+        self.path = path
+        self.no_data_max_age = no_data_max_age
+        self.workers = workers
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def lookup(self, lcsc_id: str) -> dict | None:
+        """
+        Cached data of the part, `{}` if EasyEDA has none, None if not cached.
+        """
+        row = self._db.execute(
+            "SELECT fetched, data FROM raw WHERE lcsc = ?", [lcsc_id]
+        ).fetchone()
+        if row is None:
+            return None
+        fetched, data = row
+        if data is None:
+            if time.time() - fetched > self.no_data_max_age:
+                return None
+            return {}
+        return json.loads(zlib.decompress(data))
+
+    def store(self, lcsc_id: str, data: dict):
+        blob = zlib.compress(json.dumps(data).encode()) if data else None
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO raw (lcsc, fetched, data) VALUES (?, ?, ?)",
+                [lcsc_id, time.time(), blob],
+            )
+
+    def get(self, lcsc_id: str) -> dict:
+        """
+        Data of the part, downloaded if not cached.
+        `{}` if EasyEDA has none or the download failed.
+        """
+        data = self.lookup(lcsc_id)
+        if data is None:
+            logger.debug(f"Did not find component {lcsc_id} in cache, downloading...")
+            data = _download(lcsc_id)
+            if data is None:
+                return {}
+            self.store(lcsc_id, data)
+        return data
+
+    def prefetch(self, lcsc_ids: Iterable[str]):
+        """
+        Download all parts that are not cached yet concurrently.
+        Failed downloads are skipped, `get` will try them again.
+        """
+        missing = [
+            lcsc_id
+            for lcsc_id in dict.fromkeys(lcsc_ids)
+            if self.lookup(lcsc_id) is None
+        ]
+        if not missing:
+            return
+
+        logger.debug(f"Prefetching {len(missing)} components from EasyEDA")
+        with ThreadPoolExecutor(
+            max_workers=max(min(self.workers, len(missing)), 1)
+        ) as pool:
+            futures = [pool.submit(_download, lcsc_id) for lcsc_id in missing]
+            for lcsc_id, future in zip(missing, futures):
+                try:
+                    data = future.result()
+                except Exception as e:
+                    logger.debug(f"Prefetching {lcsc_id} failed: {e}")
+                    continue
+                if data is not None:
+                    self.store(lcsc_id, data)
+
+
+@once
+def get_easyeda_cache() -> EasyedaCache | None:
+    if not EASYEDA_CACHE:
+        return None
+    try:
+        return EasyedaCache(
+            Path(EASYEDA_CACHE_PATH.get()),
+            no_data_max_age=float(EASYEDA_NO_DATA_MAX_AGE),
+            workers=int(EASYEDA_WORKERS),
+        )
+    except sqlite3.Error as e:
+        logger.warning(f"Local EasyEDA cache unavailable: {e}")
+        return None
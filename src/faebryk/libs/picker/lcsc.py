@@ -4,6 +4,7 @@
 import json
 import logging
 from pathlib import Path
+from typing import Iterable
 
 from easyeda2kicad.easyeda.easyeda_api import EasyedaApi
 from easyeda2kicad.easyeda.easyeda_importer import (
@@ -19,6 +20,7 @@ from easyeda2kicad.kicad.export_kicad_symbol import ExporterSymbolKicad, KicadVe
 import faebryk.library._F as F
 from atopile.config import config
 from faebryk.core.module import Module
+from faebryk.libs.picker.easyeda_cache import get_easyeda_cache
 from faebryk.libs.picker.localpick import PickerOption
 from faebryk.libs.picker.picker import (
     Part,
@@ -82,7 +84,7 @@ class LCSC_NoDataException(LCSCException): ...
 class LCSC_PinmapException(LCSCException): ...
 
 
-def get_raw(lcsc_id: str):
+def _get_raw_from_files(lcsc_id: str) -> dict:
     api = EasyedaApi()
 
     cache_base = config.project.paths.build / EASYEDA_CACHE_FOLDER
@@ -95,7 +97,14 @@ def get_raw(lcsc_id: str):
         serialized = json.dumps(cad_data)
         comp_path.write_text(serialized, encoding="utf-8")
 
-    data = json.loads(comp_path.read_text(encoding="utf-8"))
+    return json.loads(comp_path.read_text(encoding="utf-8"))
+
+
+def get_raw(lcsc_id: str):
+    if (cache := get_easyeda_cache()) is not None:
+        data = cache.get(lcsc_id)
+    else:
+        data = _get_raw_from_files(lcsc_id)
 
     # API returned no data
     if not data:
@@ -106,6 +115,15 @@ def get_raw(lcsc_id: str):
     return data
 
 
+def prefetch_raw(lcsc_ids: Iterable[str]):
+    """
+    Download the data of all given parts concurrently, so later `get_raw`s are
+    answered from the cache.
+    """
+    if (cache := get_easyeda_cache()) is not None:
+        cache.prefetch(lcsc_ids)
+
+
 def download_easyeda_info(lcsc_id: str, get_model: bool = True):
     # easyeda api access & caching --------------------------------------------
     data = get_raw(lcsc_id)
@@ -20,7 +20,7 @@ from faebryk.core.parameter import (
     Parameter,
     ParameterOperatable,
 )
-from faebryk.core.solver.solver import LOG_PICK_SOLVE, Solver
+from faebryk.core.solver.solver import LOG_PICK_SOLVE, NotDeducibleException, Solver
 from faebryk.core.solver.utils import Contradiction, ContradictionByLiteral, get_graphs
 from faebryk.libs.sets.sets import P_Set
 from faebryk.libs.test.times import Times
@@ -43,6 +43,12 @@ if TYPE_CHECKING:
 
 
 NO_PROGRESS_BAR = ConfigFlag("NO_PROGRESS_BAR", default=False)
+PICK_BATCH = ConfigFlag(
+    "PICK_BATCH",
+    default=False,
+    descr="Pick all modules of a dependent group per solver round, "
+    "bisecting on contradiction",
+)
 
 logger = logging.getLogger(__name__)
 
@@ -306,6 +312,59 @@ def _list_to_hack_tree(modules: Iterable[Module]) -> Tree[Module]:
     return Tree({m: Tree() for m in modules})
 
 
+def _pick_batch(
+    batch: list[tuple[Module, "Component"]], solver: Solver
+) -> list[tuple[Module, "Component"]]:
+    """
+    Pick as many of the batch as are compatible with each other.
+    Checks the whole batch at once and bisects it on contradiction, so a batch
+    with few conflicts needs O(log n) solver runs.
+    """
+    import faebryk.libs.picker.api.picker_lib as picker_lib
+
+    # known supersets don't change between checks, collect them once
+    mappings = {}
+    for m, mapping in picker_lib._get_compatible_parameters_grouped(
+        batch, solver
+    ).items():
+        if isinstance(mapping, NotCompatibleException):
+            if LOG_PICK_SOLVE:
+                logger.info(f"Pick incompatible: {mapping}")
+            continue
+        mappings[m] = mapping
+
+    def _extend(
+        accepted: list[tuple[Module, "Component"]],
+        picks: list[tuple[Module, "Component"]],
+    ) -> list[tuple[Module, "Component"]]:
+        if not picks:
+            return accepted
+
+        try:
+            picker_lib._check_parameters_compatible(
+                [mappings[m] for m, _ in accepted + picks],
+                solver,
+                allow_not_deducible=False,
+            )
+            return accepted + picks
+        except TimeoutError:
+            # bisecting would time out again, pick the rest one by one
+            if LOG_PICK_SOLVE:
+                logger.info(f"Batch of {len(picks)} picks timed out")
+            return accepted
+        except (Contradiction, NotDeducibleException) as e:
+            if LOG_PICK_SOLVE:
+                logger.info(f"Batch of {len(picks)} picks not compatible: {e}")
+            if len(picks) == 1:
+                return accepted
+
+        mid = len(picks) // 2
+        accepted = _extend(accepted, picks[:mid])
+        return _extend(accepted, picks[mid:])
+
+    return _extend([], [(m, part) for m, part in batch if m in mappings])
+
+
 def pick_topologically(
     tree: Tree[Module], solver: Solver, progress: Advancable | None = None
 ):
@@ -375,16 +434,21 @@ def pick_topologically(
                     *[],
                 )
             groups = find_independent_groups(candidates.keys(), solver)
-            # pick module with least candidates first
-            picked = [
-                (
-                    m := min(group, key=lambda _m: len(candidates[_m])),
-                    candidates[m][0],
-                )
-                for group in groups
-            ]
+            picked = []
+            for group in groups:
+                # pick module with least candidates first
+                ordered = sorted(group, key=lambda _m: len(candidates[_m]))
+                if PICK_BATCH and len(ordered) > 1:
+                    with timings.as_global("batch check"):
+                        batch = _pick_batch(
+                            [(m, candidates[m][0]) for m in ordered], solver
+                        )
+                    if batch:
+                        picked.extend(batch)
+                        continue
+                picked.append((ordered[0], candidates[ordered[0]][0]))
             logger.info(
-                f"Picking {len(groups)} independent groups: "
+                f"Picking {len(picked)} modules in {len(groups)} independent groups: "
                 f"{indented_container([m for m, _ in picked])}"
             )
             for m, part in picked:
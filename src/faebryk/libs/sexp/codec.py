@@ -0,0 +1,224 @@
+# This file is part of the faebryk project
+# SPDX-License-Identifier: MIT
+
+"""
+Single-pass s-expression reader and writer for KiCad files.
+
+Drop-in for `sexpdata.loads` and `prettify_sexp_string(sexpdata.dumps(...))`:
+both produce exactly the same results. Inputs using sexpdata features that
+KiCad files don't (quotes, brackets, escaped symbols, unusual whitespace in
+atoms) are handed to the reference implementation.
+"""
+
+import logging
+import re
+from typing import Any
+
+import sexpdata
+from sexpdata import String, Symbol
+
+from faebryk.libs.sexp.util import prettify_sexp_string
+
+logger = logging.getLogger(__name__)
+
+# Tokens are parens, strings, comments and atoms.
+# The trailing \S catches everything sexpdata handles specially, everything else
+# skipped by findall is sexpdata whitespace.
+_TOKEN = re.compile(
+    r'[()]|"(?:[^"\\]|\\.)*"|;[^\n]*|[^ \t\n\r\x0b\x0c()"\\;\[\]]+|\S', re.DOTALL
+)
+_STRING_ESCAPE = re.compile(r"\\(.)", re.DOTALL)
+_STRING_UNESCAPE = {
+    "\\\\": "\\",
+    '\\"': '"',
+    "\\b": "\b",
+    "\\f": "\f",
+    "\\n": "\n",
+    "\\r": "\r",
+    "\\t": "\t",
+}
+
+# symbols that sexpdata writes unescaped
+_PLAIN_SYMBOL = re.compile(r"[^\s()\[\]\"\\'`,?;#]+")
+# line breaks for str.splitlines that sexpdata does not escape in strings
+_LINE_BREAK = re.compile("[\x0b\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
+class _Unsupported(Exception): ...
+
+
+def _unescape(match: re.Match) -> str:
+    return _STRING_UNESCAPE.get(match.group(0), match.group(0))
+
+
+def _parse(text: str) -> Any:
+    top: list = []
+    current = top
+    stack: list[list] = []
+    atoms: dict[str, Any] = {}
+
+    for token in _TOKEN.findall(text):
+        c = token[0]
+        if c == "(":
+            node: list = []
+            current.append(node)
+            stack.append(current)
+            current = node
+        elif c == ")":
+            if not stack:
+                raise _Unsupported()
+            current = stack.pop()
+        elif c == '"':
+            if len(token) == 1:
+                raise _Unsupported()
+            s = token[1:-1]
+            if "\\" in s:
+                s = _STRING_ESCAPE.sub(_unescape, s)
+            current.append(s)
+        elif c == ";":
+            continue
+        elif c in "[]\\'":
+            raise _Unsupported()
+        elif token == "nil":
+            current.append([])
+        else:
+            atom = atoms.get(token)
+            if atom is None:
+                if token == "t":
+                    atom = True
+                else:
+                    try:
+                        atom = int(token)
+                    except ValueError:
+                        try:
+                            atom = float(token)
+                        except ValueError:
+                            atom = Symbol(token)
+                atoms[token] = atom
+            current.append(atom)
+
+    if stack or len(top) != 1:
+        raise _Unsupported()
+    return top[0]
+
+
+def loads(text: str) -> Any:
+    """
+    Parse a single s-expression, same as `sexpdata.loads`.
+    """
+    try:
+        return _parse(text)
+    except _Unsupported:
+        return sexpdata.loads(text)
+
+
+class _Writer:
+    """
+    sexpdata.dumps and prettify_sexp_string in one pass.
+
+    Mirrors the state machine of prettify_sexp_string, but advances it by
+    whole atoms where their characters can't change its state.
+    Only unusual atoms (e.g. strings containing quotes) are fed char by char.
+    """
+
+    def __init__(self):
+        self.out: list[str] = []
+        self.level = 0
+        self.in_quotes = False
+        self.in_leaf_expr = True
+        # output needs the line post-processing of prettify_sexp_string
+        self.dirty = False
+
+    def char(self, c: str):
+        out = self.out
+        if c == '"':
+            self.in_quotes = not self.in_quotes
+        if self.in_quotes:
+            ...
+        elif c == "\n":
+            return
+        elif c == " " and out[-1] == " ":
+            return
+        elif c == "(":
+            self.in_leaf_expr = True
+            if self.level != 0:
+                if out[-1] == " ":
+                    out.pop()
+                out.append("\n" + " " * 4 * self.level)
+            self.level += 1
+        elif c == ")":
+            if out[-1] == " ":
+                out.pop()
+            self.level -= 1
+            if not self.in_leaf_expr:
+                out.append("\n" + " " * 4 * self.level)
+            self.in_leaf_expr = False
+        out.append(c)
+
+    def chars(self, s: str):
+        self.dirty = True
+        for c in s:
+            self.char(c)
+
+    def atom(self, obj: Any):
+        t = type(obj)
+        if t is int or t is float:
+            self.out.append(str(obj))
+        elif t is Symbol:
+            if _PLAIN_SYMBOL.fullmatch(obj):
+                self.out.append(str.__str__(obj))
+            else:
+                self.chars(Symbol.quote(obj))
+        elif obj is True:
+            self.out.append("t")
+        elif obj is None or obj is False:
+            self.node(())
+        elif isinstance(obj, str) and not isinstance(obj, Symbol):
+            quoted = String.quote(obj)
+            if self.in_quotes or '"' in quoted:
+                self.chars('"' + quoted + '"')
+                return
+            if _LINE_BREAK.search(quoted):
+                self.dirty = True
+            self.out.append('"' + quoted + '"')
+        elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+            self.out.append(str(obj))
+        else:
+            raise _Unsupported()
+
+    def node(self, node: list | tuple):
+        self.char("(")
+        first = True
+        for item in node:
+            if not first:
+                self.char(" ")
+            first = False
+            if isinstance(item, list) or type(item) is tuple:
+                self.node(item)
+            else:
+                self.atom(item)
+        self.char(")")
+
+    def result(self) -> str:
+        text = "".join(self.out)
+        if not self.dirty:
+            return text
+        # if i > 0 no strip is a kicad bug(?) workaround
+        return "\n".join(
+            x.rstrip() if i > 0 else x for i, x in enumerate(text.splitlines())
+        )
+
+
+def dumps(sexp: Any) -> str:
+    """
+    Formatted s-expression, same as
+    `prettify_sexp_string(sexpdata.dumps(sexp))`.
+    """
+    if isinstance(sexp, list):
+        writer = _Writer()
+        try:
+            writer.node(sexp)
+            return writer.result()
+        except _Unsupported:
+            pass
+    return prettify_sexp_string(sexpdata.dumps(sexp))
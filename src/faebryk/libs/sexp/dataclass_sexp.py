@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import Field, dataclass, fields, is_dataclass
 from enum import Enum, IntEnum, StrEnum
 from os import PathLike
@@ -8,13 +10,13 @@ from pathlib import Path
 from types import UnionType
 from typing import TYPE_CHECKING, Any, Callable, Iterator, Union, get_args, get_origin
 
-import sexpdata
 from dataclasses_json import CatchAll
 from dataclasses_json.utils import CatchAllVar
 from sexpdata import Symbol
 
 from faebryk.libs.exceptions import UserResourceException, downgrade
-from faebryk.libs.sexp.util import prettify_sexp_string
+from faebryk.libs.sexp import codec
+from faebryk.libs.sexp.decode_cache import DecodeCache
 from faebryk.libs.util import (
     ConfigFlag,
     cast_assert,
@@ -32,6 +34,22 @@ if TYPE_CHECKING:
 SEXP_LOG = ConfigFlag(
     "SEXP_LOG", default=False, descr="Enable sexp decode logging (very verbose)"
 )
+SEXP_CACHE = ConfigFlag(
+    "SEXP_CACHE", default=True, descr="Reuse decoded files of previous builds"
+)
+
+# Files are only cached within `decode_cache`
+_decode_cache: ContextVar[DecodeCache | None] = ContextVar("decode_cache", default=None)
+
+
+@contextmanager
+def decode_cache(cache: DecodeCache | None):
+    """Reuse decoded files from the given cache within this context."""
+    token = _decode_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _decode_cache.reset(token)
 
 
 logger = logging.getLogger(__name__)
@@ -540,28 +558,40 @@ def loads[T: DataclassInstance](
 ) -> T:
     text = s
     sexp = s
+    miss = None
+    cache = _decode_cache.get()
     if isinstance(s, Path):
-        text = s.read_text(encoding="utf-8")
+        if cache is not None:
+            cached, miss = cache.load(s, t, variant=str(ignore_assertions))
+            if miss is None:
+                return cached
+            text = miss.text
+        else:
+            text = s.read_text(encoding="utf-8")
     if isinstance(text, str):
         try:
-            sexp = sexpdata.loads(text)
+            sexp = codec.loads(text)
         except Exception as e:
             raise ParseError(f"Failed to parse sexp: {text}") from e
 
     try:
-        return _decode([sexp], t, ignore_assertions=ignore_assertions)
+        out = _decode([sexp], t, ignore_assertions=ignore_assertions)
     except Exception as e:
         if isinstance(s, Path):
             raise DecodeError(f"Failed to decode file {s}\n\n{e}") from e
         else:
             raise DecodeError(f"Failed to decode sexp\n\n{e}") from e
 
+    if miss is not None:
+        assert cache is not None
+        cache.store(miss, out)
+    return out
+
 
 def dumps(obj, path: PathLike | None = None) -> str:
     path = Path(path) if path else None
     sexp = _encode(obj)[0]
-    text = sexpdata.dumps(sexp)
-    text = prettify_sexp_string(text)
+    text = codec.dumps(sexp)
     if path:
         path.write_text(text, encoding="utf-8")
     return text
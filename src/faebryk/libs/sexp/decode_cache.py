@@ -0,0 +1,162 @@
+# This file is part of the faebryk project
+# SPDX-License-Identifier: MIT
+
+import hashlib
+import importlib.metadata
+import inspect
+import logging
+import os
+import pickle
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from faebryk.libs.paths import get_cache_dir
+from faebryk.libs.util import ConfigFlagString, once
+
+logger = logging.getLogger(__name__)
+
+SEXP_CACHE_PATH = ConfigFlagString(
+    "SEXP_CACHE_PATH",
+    default=str(get_cache_dir() / "sexp"),
+    descr="Location of the decoded file snapshots",
+)
+
+
+@once
+def _source_digest(module_name: str) -> str:
+    module = sys.modules[module_name]
+    try:
+        return hashlib.sha256(Path(inspect.getfile(module)).read_bytes()).hexdigest()
+    except (OSError, TypeError):
+        return ""
+
+
+@once
+def _decoder_digest() -> str:
+    """
+    Installed package version and sources of all kicad file formats, which the
+    decoded types of a file may reference across modules.
+    """
+    h = hashlib.sha256()
+    try:
+        h.update(importlib.metadata.version("atopile").encode())
+    except importlib.metadata.PackageNotFoundError:
+        pass
+    kicad_dir = Path(__file__).parents[1] / "kicad"
+    for path in sorted(kicad_dir.glob("fileformats*.py")):
+        h.update(path.name.encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class DecodeCache:
+    """
+    Pickled snapshots of decoded files, one per file path and target type.
+
+    A snapshot is reused if the file has the same size and modification time
+    as when it was decoded, or otherwise if its content hash is unchanged.
+    Snapshots are invalidated by changes to the decoder, the kicad file formats,
+    the module of the target type or the installed package version.
+
+    Snapshots are unpickled, so the cache lives in the user cache directory
+    rather than in the (possibly shared) project.
+    """
+
+    @dataclass
+    class Header:
+        salt: str
+        digest: str
+        mtime_ns: int
+        size: int
+
+    @dataclass
+    class Miss:
+        """File content and header to store the decoded object with"""
+
+        snapshot: Path
+        header: "DecodeCache.Header"
+        text: str
+
+    def __init__(self, path: Path | None = None):
+        self.path = path if path is not None else Path(SEXP_CACHE_PATH.get())
+
+    @staticmethod
+    def _salt(t: type, variant: str) -> str:
+        return hashlib.sha256(
+            "\x1f".join(
+                [
+                    sys.version,
+                    str(pickle.HIGHEST_PROTOCOL),
+                    _source_digest(__name__),
+                    _source_digest("faebryk.libs.sexp.dataclass_sexp"),
+                    _decoder_digest(),
+                    _source_digest(t.__module__),
+                    t.__qualname__,
+                    variant,
+                ]
+            ).encode()
+        ).hexdigest()
+
+    def _snapshot(self, file: Path, t: type, variant: str) -> Path:
+        name = hashlib.sha256(
+            "\x1f".join(
+                [str(file.resolve()), t.__module__, t.__qualname__, variant]
+            ).encode()
+        ).hexdigest()
+        return self.path / f"{name}.pickle"
+
+    def load(
+        self, file: Path, t: type, variant: str = ""
+    ) -> tuple[Any, None] | tuple[None, "DecodeCache.Miss"]:
+        """
+        Returns the cached object, or on a miss the file content to decode.
+        """
+        snapshot = self._snapshot(file, t, variant)
+        salt = self._salt(t, variant)
+        # before reading, so later changes to the file are never missed
+        stat = file.stat()
+
+        text: str | None = None
+        try:
+            with snapshot.open("rb") as f:
+                header = pickle.load(f)
+                if isinstance(header, self.Header) and header.salt == salt:
+                    if (header.mtime_ns, header.size) == (
+                        stat.st_mtime_ns,
+                        stat.st_size,
+                    ):
+                        return pickle.load(f), None
+                    text = file.read_text(encoding="utf-8")
+                    if _digest(text) == header.digest:
+                        return pickle.load(f), None
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.debug(f"Ignoring broken snapshot {snapshot}: {e}")
+
+        if text is None:
+            text = file.read_text(encoding="utf-8")
+        header = self.Header(
+            salt=salt,
+            digest=_digest(text),
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+        )
+        return None, self.Miss(snapshot=snapshot, header=header, text=text)
+
+    def store(self, miss: "DecodeCache.Miss", obj: Any):
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            tmp = miss.snapshot.with_suffix(f".{os.getpid()}.tmp")
+            with tmp.open("wb") as f:
+                pickle.dump(miss.header, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp.replace(miss.snapshot)
+        except Exception as e:
+            logger.debug(f"Failed to store snapshot {miss.snapshot}: {e}")
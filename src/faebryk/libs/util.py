@@ -1376,7 +1376,7 @@ class FuncDict[T, U, H: Hashable = int](collections.abc.MutableMapping[T, U]):
             hashed = self._hasher(item)  # type: ignore
         except TypeError:
             return False
-        return item in self._keys[hashed]
+        return item in self._keys.get(hashed, ())
 
     def keys(self) -> Iterator[T]:
         yield from chain.from_iterable(self._keys.values())
@@ -1392,7 +1392,9 @@ class FuncDict[T, U, H: Hashable = int](collections.abc.MutableMapping[T, U]):
 
     def __getitem__(self, key: T) -> U:
         hashed = self._hasher(key)
-        for test_key, value in zip(self._keys[hashed], self._values[hashed]):
+        for test_key, value in zip(
+            self._keys.get(hashed, ()), self._values.get(hashed, ())
+        ):
             if test_key == key:
                 return value
         raise KeyError(key)
@@ -1411,12 +1413,20 @@ class FuncDict[T, U, H: Hashable = int](collections.abc.MutableMapping[T, U]):
     def __delitem__(self, key: T):
         hashed_key = self._hasher(key)
         try:
-            idx = self._keys[hashed_key].index(key)
+            idx = self._keys.get(hashed_key, []).index(key)
         except ValueError:
             raise KeyError(key)
         else:
             del self._values[hashed_key][idx]
             del self._keys[hashed_key][idx]
+            # don't keep empty buckets around
+            if not self._keys[hashed_key]:
+                del self._keys[hashed_key]
+                del self._values[hashed_key]
+
+    def clear(self):
+        self._keys.clear()
+        self._values.clear()
 
     def items(self) -> Iterable[tuple[T, U]]:
         """Iter key-value pairs as items, just like a dict."""
@@ -1542,9 +1552,15 @@ class EquivalenceClasses[T: Hashable]:
             return
         val1 = values[0]
         for val in values[1:]:
-            self.classes[val1].update(self.classes[val])
-            for v in self.classes[val]:
-                self.classes[v] = self.classes[val1]
+            target, source = self.classes[val1], self.classes[val]
+            if target is source:
+                continue
+            # union by size: only relabel the members of the smaller class
+            if len(source) > len(target):
+                target, source = source, target
+            target.update(source)
+            for v in source:
+                self.classes[v] = target
 
     def is_eq(self, a: T, b: T) -> bool:
         return self.classes[a] is self.classes[b]
@@ -0,0 +1,51 @@
+# This file is part of the faebryk project
+# SPDX-License-Identifier: MIT
+
+import logging
+import random
+
+import pytest
+
+import faebryk.libs.sets.numeric_sets as numeric_sets
+from faebryk.libs.sets.numeric_sets import Numeric_Interval, Numeric_Interval_Disjoint
+from faebryk.libs.test.times import Times
+
+logger = logging.getLogger(__name__)
+
+
+def _random_intervals(count: int, rng: random.Random) -> Numeric_Interval_Disjoint:
+    intervals = []
+    for _ in range(count):
+        center = rng.uniform(-1e3, 1e3)
+        intervals.append(Numeric_Interval(center, center + rng.uniform(0, 10)))
+    return Numeric_Interval_Disjoint(*intervals)
+
+
+@pytest.mark.parametrize("count", [4, 8, 16, 32])
+def test_performance_numeric_interval_disjoint_ops(
+    count: int, monkeypatch: pytest.MonkeyPatch
+):
+    rng = random.Random(0)
+    samples = [(_random_intervals(count, rng), _random_intervals(count, rng))]
+    samples *= 5
+
+    timings = Times(multi_sample_strategy=Times.MultiSampleStrategy.AVG_ACC)
+    ops = ["op_add_intervals", "op_mul_intervals"]
+
+    results = {}
+    for backend, min_pairs in [("decimal", 1 << 62), ("float", 0)]:
+        monkeypatch.setattr(numeric_sets, "FLOAT_FASTPATH_MIN_PAIRS_ADD", min_pairs)
+        monkeypatch.setattr(numeric_sets, "FLOAT_FASTPATH_MIN_PAIRS_MUL", min_pairs)
+        for op in ops:
+            for left, right in samples:
+                results[backend, op] = getattr(left, op)(right)
+                timings.add(f"{op} {backend}")
+
+    for op in ops:
+        assert results["decimal", op] == results["float", op]
+
+    logger.info(f"\n{timings}")
+    acc = Times.MultiSampleStrategy.ACC
+    for op in ops:
+        speedup = timings.get(f"{op} decimal", acc) / timings.get(f"{op} float", acc)
+        logger.info(f"----> Speedup {op} ({count}x{count}): {speedup:.1f}x")
@@ -0,0 +1,71 @@
+# This file is part of the faebryk project
+# SPDX-License-Identifier: MIT
+
+import logging
+from typing import cast
+
+import faebryk.library._F as F
+from faebryk.core.graph import GraphFunctions
+from faebryk.core.module import Module
+from faebryk.core.node import Node
+from faebryk.core.trait import Trait, TraitImpl
+from faebryk.libs.library import L
+from faebryk.libs.test.times import Times
+
+logger = logging.getLogger(__name__)
+
+
+def _try_get_trait_scan[T: Trait](node: Node, trait: type[T]) -> T | None:
+    """Child scan with python filter, as done before the per-node trait index"""
+    if TraitImpl.is_traitimpl_type(trait):
+        trait = trait.__trait__
+    out = node.get_children(
+        direct_only=True,
+        types=Trait,
+        f_filter=lambda impl: trait.is_traitimpl(impl)
+        and cast(TraitImpl, impl).is_implemented(),
+    )
+    return cast(T, next(iter(out))) if out else None
+
+
+def test_performance_traits_lookup():
+    count = 1000
+    timings = Times(multi_sample_strategy=Times.MultiSampleStrategy.AVG_ACC)
+
+    class App(Module):
+        resistors = L.list_field(count, F.Resistor)
+
+    app = App()
+    timings.add("construct")
+
+    traits = [F.can_bridge, F.has_designator_prefix, F.has_part_picked]
+
+    for r in app.resistors:
+        for t in traits:
+            _try_get_trait_scan(r, t)
+        timings.add("scan")
+
+    for r in app.resistors:
+        for t in traits:
+            r.try_get_trait(t)
+        timings.add("indexed")
+
+    for r in app.resistors:
+        for t in traits:
+            assert (r.try_get_trait(t) is None) == (_try_get_trait_scan(r, t) is None)
+
+    gf = GraphFunctions(app.get_graph())
+    with timings.context("nodes_with_trait scan"):
+        scan = [
+            (n, n.get_trait(F.can_bridge))
+            for n in gf.node_projection()
+            if n.has_trait(F.can_bridge)
+        ]
+    with timings.context("nodes_with_trait indexed"):
+        indexed = gf.nodes_with_trait(F.can_bridge)
+    assert set(scan) == set(indexed)
+
+    logger.info(f"\n{timings}")
+    acc = Times.MultiSampleStrategy.ACC
+    speedup = timings.get("scan", acc) / timings.get("indexed", acc)
+    logger.info(f"----> Speedup try_get_trait: {speedup:.1f}x")
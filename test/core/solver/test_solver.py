@@ -1,16 +1,21 @@
 # This file is part of the faebryk project
 # SPDX-License-Identifier: MIT
 
+import json
 import logging
 import math
 from decimal import Decimal
 from itertools import pairwise
 from operator import add, mul, sub, truediv
+from pathlib import Path
 from random import random
 from typing import Any, Iterable
 
 import pytest
 
+import faebryk.core.solver.cache as solver_cache
+import faebryk.core.solver.defaultsolver as defaultsolver
+import faebryk.core.solver.parallel as solver_parallel
 import faebryk.library._F as F
 from faebryk.core.cpp import Graph
 from faebryk.core.module import Module
@@ -43,7 +48,9 @@ from faebryk.core.parameter import (
     SymmetricDifference,
     Union,
 )
+from faebryk.core.solver.cache import SolverCache
 from faebryk.core.solver.defaultsolver import DefaultSolver
+from faebryk.core.solver.trace import SolverTrace
 from faebryk.core.solver.utils import (
     CanonicalExpression,
     CanonicalLiteral,
@@ -588,6 +595,120 @@ def test_nested_additions():
     assert repr_map.try_get_literal(D) == Quantity_Interval_Disjoint.from_value(3)
 
 
+def test_solver_cache_reuses_unchanged_graphs(tmp_path: Path):
+    class App(Module):
+        A = L.p_field(units=dimensionless)
+        B = L.p_field(units=dimensionless)
+
+    def solve(extra: bool = False):
+        app = App()
+        app.A.alias_is(Range(1, 2, units=dimensionless))
+        app.B.alias_is(app.A + 1)
+        C = Parameter(units=dimensionless)
+        D = Parameter(units=dimensionless)
+        if extra:
+            D.alias_is(Range(3, 4, units=dimensionless))
+            C.alias_is(D * 2)
+
+        solver = DefaultSolver()
+        solver.cache = SolverCache(tmp_path)
+        solver.update_superset_cache(app, *([C] if extra else []))
+        if extra:
+            assert solver.inspect_get_known_supersets(C) == Range(
+                6, 8, units=dimensionless
+            )
+        return solver.inspect_get_known_supersets(app.B)
+
+    assert solve() == Range(2, 3, units=dimensionless)
+    (entry,) = tmp_path.iterdir()
+
+    # tamper with the stored results to observe that they are reused
+    data = json.loads(entry.read_text())
+    for result in data["results"].values():
+        result["literal"] = Quantity_Interval_Disjoint.from_value(42).serialize()
+    entry.write_text(json.dumps(data))
+
+    assert solve() == Quantity_Interval_Disjoint.from_value(42)
+    # solved next to the cached graph
+    assert solve(extra=True) == Quantity_Interval_Disjoint.from_value(42)
+
+
+def test_solver_cache_invalidated_by_solver_change(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    def solve():
+        A = Parameter(units=dimensionless)
+        B = Parameter(units=dimensionless)
+        A.alias_is(Range(1, 2, units=dimensionless))
+        B.alias_is(A + 1)
+
+        solver = DefaultSolver()
+        solver.cache = SolverCache(tmp_path)
+        solver.update_superset_cache(A, B)
+
+    solve()
+    (entry,) = tmp_path.iterdir()
+
+    monkeypatch.setattr(solver_cache, "_solver_version", lambda: "changed")
+    solve()
+    assert len(list(tmp_path.iterdir())) == 2
+    assert entry.exists()
+
+
+def test_solver_parallel_matches_serial(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(solver_parallel, "_PARALLEL_MIN_EXPRESSIONS", 0)
+    solved = []
+
+    def solve_parallel(graphs, workers):
+        out = solver_parallel.solve_parallel(graphs, workers)
+        solved.extend(out)
+        return out
+
+    monkeypatch.setattr(defaultsolver, "solve_parallel", solve_parallel)
+
+    def solve(workers: int):
+        A, B, C, D = times(4, lambda: Parameter(units=dimensionless))
+        A.alias_is(Range(1, 2, units=dimensionless))
+        B.alias_is(A + 1)
+        C.alias_is(Range(3, 4, units=dimensionless))
+        D.alias_is(C * 2)
+
+        solver = DefaultSolver()
+        solver.workers = workers
+        solver.update_superset_cache(A, B, C, D)
+        return [solver.inspect_get_known_supersets(p) for p in (B, D)]
+
+    assert solve(workers=2) == solve(workers=0)
+    assert len(solved) == 2
+
+
+def test_solver_trace(tmp_path: Path):
+    A = Parameter(units=dimensionless)
+    B = Parameter(units=dimensionless)
+    A.alias_is(Range(1, 2, units=dimensionless))
+    B.alias_is(A + 1)
+
+    solver = DefaultSolver()
+    solver.trace = SolverTrace(tmp_path)
+    solver.update_superset_cache(A, B)
+
+    records = SolverTrace.load(tmp_path)
+    assert records
+    assert {r.solve for r in records} == {0}
+    assert any(r.dirty for r in records)
+    assert all(r.duration >= 0 for r in records)
+
+    # unterminated array format, can be appended to
+    events = json.loads(
+        (tmp_path / SolverTrace.CHROME).read_text().rstrip().rstrip(",") + "]"
+    )
+    assert len(events) == len(records) + 1
+
+    stats = SolverTrace.summarize(records)
+    assert sum(s.runs for s in stats) == len(records)
+    assert [s.total for s in stats] == sorted((s.total for s in stats), reverse=True)
+
+
 def test_combined_add_and_multiply_with_ranges():
     A = Parameter()
     B = Parameter()
@@ -31,17 +31,22 @@ from faebryk.core.solver.mutator import (
     MutationStage,
     Mutator,
     Transformations,
+    _same_compact_repr,
 )
 from faebryk.core.solver.utils import (
     Associative,
+    CongruenceTable,
     ContradictionByLiteral,
     FullyAssociative,
     MutatorUtils,
+    PredicateIndex,
+    make_lit,
 )
 from faebryk.libs.library import L
 from faebryk.libs.logging import rich_to_string
+from faebryk.libs.sets.quantity_sets import Quantity_Interval
 from faebryk.libs.units import P
-from faebryk.libs.util import cast_assert, times
+from faebryk.libs.util import KeyErrorAmbiguous, cast_assert, times
 
 logger = logging.getLogger(__name__)
 
@@ -142,6 +147,190 @@ def test_mutator_no_graph_merge():
     assert cast_assert(Parameter, mutator.get_mutated(p1)).get_graph() is G_new
 
 
+def test_mutation_map_dirty_graphs():
+    A = Parameter()
+    B = Parameter()
+    context = ParameterOperatable.ReprContext()
+
+    @algorithm("")
+    def algo(mutator: Mutator):
+        pass
+
+    @algorithm("")
+    def algo_other(mutator: Mutator):
+        pass
+
+    mutation_map = MutationMap.identity(
+        A.get_graph(), B.get_graph(), print_context=context
+    )
+    # never ran
+    assert mutation_map.get_dirty_graphs(algo) == {A.get_graph(), B.get_graph()}
+
+    mutator = Mutator(mutation_map, algo=algo, iteration=0, terminal=True)
+    mutator.mutate_parameter(A)
+    result = mutator.close()
+    assert result.dirty
+    mutation_map = mutation_map.extend(result.mutation_stage)
+
+    A_new = cast_assert(Parameter, mutation_map.map_forward(A).maps_to)
+    assert mutation_map.map_forward(B).maps_to is B
+    assert mutation_map.get_dirty_graphs(algo) == {A_new.get_graph()}
+    assert mutation_map.get_dirty_graphs(algo_other) == {
+        A_new.get_graph(),
+        B.get_graph(),
+    }
+
+    # clean run on dirty graphs only, untouched graph passes through
+    mutator = Mutator(
+        mutation_map,
+        algo=algo,
+        iteration=1,
+        terminal=True,
+        graphs=mutation_map.get_dirty_graphs(algo),
+    )
+    assert mutator.G == {A_new.get_graph()}
+    result = mutator.close()
+    assert not result.dirty
+    mutation_map = mutation_map.extend(result.mutation_stage)
+    assert mutation_map.get_dirty_graphs(algo) == set()
+    assert mutation_map.map_forward(B).maps_to is B
+
+
+def test_mutator_extend_in_place():
+    A = Parameter()
+    B = Parameter()
+    E = A + B
+    context = ParameterOperatable.ReprContext()
+
+    @algorithm("")
+    def copy(mutator: Mutator):
+        mutator.mutate_parameter(A)
+
+    @algorithm("")
+    def create(mutator: Mutator):
+        A_new, B_new = mutator.get_copy(A_solver), mutator.get_copy(B_solver)
+        mutator.create_expression(Multiply, A_new, B_new)
+
+    mutation_map = MutationMap.identity(A.get_graph(), print_context=context)
+
+    # never extend the input graphs
+    mutator = Mutator(mutation_map, algo=copy, iteration=1, terminal=True)
+    result = mutator.run()
+    assert result.mutation_stage.output_graphs[0] is not A.get_graph()
+    mutation_map = mutation_map.extend(result.mutation_stage)
+
+    A_solver = cast_assert(Parameter, mutation_map.map_forward(A).maps_to)
+    B_solver = cast_assert(Parameter, mutation_map.map_forward(B).maps_to)
+    E_solver = cast_assert(Add, mutation_map.map_forward(E).maps_to)
+    G = A_solver.get_graph()
+    last_stage = mutation_map.last_stage
+
+    mutator = Mutator(mutation_map, algo=create, iteration=1, terminal=True)
+    result = mutator.run()
+    assert result.dirty
+    stage = result.mutation_stage
+    assert stage.output_graphs == [G]
+    assert stage.map_forward(A_solver) is A_solver
+    assert stage.map_forward(E_solver) is E_solver
+    assert stage.input_operables == {A_solver, B_solver, E_solver}
+
+    (created,) = stage.transformations.created
+    assert isinstance(created, Multiply)
+    assert created.operands == (A_solver, B_solver)
+    assert stage.output_operables == {A_solver, B_solver, E_solver, created}
+    assert stage.dirty_graphs == {G}
+    # the previous stage keeps its outputs
+    assert last_stage.output_operables == {A_solver, B_solver, E_solver}
+
+    # never extend graphs of earlier iterations
+    mutator = Mutator(mutation_map, algo=create, iteration=2, terminal=True)
+    assert mutator.run().mutation_stage.output_graphs[0] is not G
+
+
+def test_mutator_extend_in_place_merging_graphs():
+    A = Parameter()
+    B = Parameter()
+    context = ParameterOperatable.ReprContext()
+
+    @algorithm("")
+    def copy(mutator: Mutator):
+        mutator.mutate_parameter(A)
+        mutator.mutate_parameter(B)
+
+    @algorithm("")
+    def create(mutator: Mutator):
+        A_new, B_new = mutator.get_copy(A_solver), mutator.get_copy(B_solver)
+        mutator.create_expression(Multiply, A_new, B_new)
+
+    mutation_map = MutationMap.identity(
+        A.get_graph(), B.get_graph(), print_context=context
+    )
+    result = Mutator(mutation_map, algo=copy, iteration=1, terminal=True).run()
+    mutation_map = mutation_map.extend(result.mutation_stage)
+    A_solver = cast_assert(Parameter, mutation_map.map_forward(A).maps_to)
+    B_solver = cast_assert(Parameter, mutation_map.map_forward(B).maps_to)
+
+    result = Mutator(mutation_map, algo=create, iteration=1, terminal=True).run()
+    (G,) = result.mutation_stage.output_graphs
+    assert G is not A_solver.get_graph()
+    assert A_solver.get_graph() is not B_solver.get_graph()
+
+
+def test_mutation_map_is_triggered():
+    A = Parameter()
+    B = Parameter()
+    A + B
+    context = ParameterOperatable.ReprContext()
+
+    @algorithm("", triggers=Add)
+    def on_add(mutator: Mutator):
+        pass
+
+    @algorithm("", triggers=(Multiply, Is))
+    def on_multiply(mutator: Mutator):
+        pass
+
+    @algorithm("")
+    def create(mutator: Mutator):
+        A_new, B_new = mutator.get_copy(A_solver), mutator.get_copy(B_solver)
+        mutator.create_expression(Multiply, A_new, B_new)
+
+    @algorithm("")
+    def mutate(mutator: Mutator):
+        mutator.mutate_parameter(A_solver)
+
+    def run(algo):
+        nonlocal mutation_map
+        result = Mutator(mutation_map, algo=algo, iteration=0, terminal=True).run()
+        mutation_map = mutation_map.extend(result.mutation_stage)
+
+    mutation_map = MutationMap.identity(A.get_graph(), print_context=context)
+    A_solver = cast_assert(Parameter, mutation_map.map_forward(A).maps_to)
+    B_solver = cast_assert(Parameter, mutation_map.map_forward(B).maps_to)
+
+    # never ran
+    assert mutation_map.is_triggered(on_add)
+    assert mutation_map.is_triggered(on_multiply)
+    run(on_add)
+    run(on_multiply)
+    assert not mutation_map.is_triggered(on_add)
+    assert not mutation_map.is_triggered(on_multiply)
+    # always triggered without trigger types
+    assert mutation_map.is_triggered(create)
+
+    run(create)
+    assert not mutation_map.is_triggered(on_add)
+    assert mutation_map.is_triggered(on_multiply)
+    run(on_multiply)
+    assert not mutation_map.is_triggered(on_multiply)
+
+    # expressions operating on mutated operables changed too
+    A_solver = cast_assert(Parameter, mutation_map.map_forward(A).maps_to)
+    run(mutate)
+    assert mutation_map.is_triggered(on_add)
+    assert mutation_map.is_triggered(on_multiply)
+
+
 def test_get_expressions_involved_in():
     A = Parameter()
     B = Parameter()
@@ -171,6 +360,106 @@ def test_get_expressions_involved_in():
     assert res == {E1, E2, E3}
 
 
+def test_congruence_table():
+    A = Parameter()
+    B = Parameter()
+
+    table = CongruenceTable[Expression]()
+    E1 = A + B
+    assert table.insert(E1) == []
+    # commutative
+    assert table.insert(B + A) == [E1]
+    assert table.insert(A - B) == []
+    E2 = B - A
+    assert table.insert(E2) == []
+    assert table.insert(B - A) == [E2]
+
+    # literals
+    E3 = Add(A, make_lit(5))
+    assert table.insert(E3) == []
+    assert table.insert(Add(A, make_lit(6))) == []
+    E3_2 = Add(make_lit(5), A)
+    assert table.insert(E3_2) == [E3]
+    # literal equality is approximate, compared with all of them
+    assert table.insert(Add(A, make_lit(5 + 1e-12))) == [E3, E3_2]
+
+    # constrained
+    E4 = A.operation_is_ge(B)
+    E4.constrain()
+    assert table.insert(E4) == []
+    assert table.insert(A.operation_is_ge(B)) == []
+    E5 = A.operation_is_ge(B)
+    E5.constrain()
+    assert table.insert(E5) == [E4]
+
+
+def test_predicate_index():
+    A, B, C = times(3, Parameter)
+    A.alias_is(make_lit(5))
+    A.constrain_subset(make_lit(Quantity_Interval(0, 10)))
+    B.constrain_subset(make_lit(Quantity_Interval(0, 10)))
+    B.constrain_subset(make_lit(Quantity_Interval(5, 20)))
+    unconstrained = C.operation_is_subset(make_lit(Quantity_Interval(0, 1)))
+
+    index = PredicateIndex()
+    for p in (A, B, C):
+        for allow_subset in (False, True):
+            assert index.try_extract_literal(
+                p, allow_subset=allow_subset
+            ) == ParameterOperatable.try_extract_literal(p, allow_subset=allow_subset)
+    assert index.try_extract_literal(B, allow_subset=True) == make_lit(
+        Quantity_Interval(5, 10)
+    )
+    assert index.try_extract_literal(C, allow_subset=True) is None
+
+    # constraints are checked on lookup
+    unconstrained.constrain()
+    assert index.try_extract_literal(C, allow_subset=True) == make_lit(
+        Quantity_Interval(0, 1)
+    )
+
+    A.alias_is(make_lit(6))
+    index = PredicateIndex()
+    with pytest.raises(KeyErrorAmbiguous):
+        index.try_extract_literal(A)
+
+
+def test_same_compact_repr():
+    A, B, C = times(3, Parameter)
+    E1 = A + B
+
+    # parameters are numbered by first occurrence
+    assert _same_compact_repr(A + B, B + C)
+    assert not _same_compact_repr(A + A, A + B)
+    assert not _same_compact_repr(A + B, A + A)
+    assert _same_compact_repr(E1 * E1, E1 * (A + B))
+    assert _same_compact_repr(A + make_lit(5), B + make_lit(5))
+    assert not _same_compact_repr(A + make_lit(5), A + make_lit(6))
+    assert not _same_compact_repr(A + B, A * B)
+
+    E2 = A.operation_is_ge(B)
+    E3 = A.operation_is_ge(B)
+    assert _same_compact_repr(E2, E3)
+    # only constrained expressions show whether they are terminated
+    E2._solver_terminated = True
+    assert _same_compact_repr(E2, E3)
+    E2.constrain()
+    assert not _same_compact_repr(E2, E3)
+    E3.constrain()
+    assert not _same_compact_repr(E2, E3)
+
+    for left, right in [
+        (A + B, B + C),
+        (E1 * E1, A * B),
+        (E1 * E1, E1 * (A + B)),
+        (E2, E3),
+        (A + make_lit(5), B + make_lit(5)),
+    ]:
+        assert _same_compact_repr(left, right) == (
+            left.compact_repr() == right.compact_repr()
+        )
+
+
 def test_get_correlations_basic():
     A = Parameter()
     B = Parameter()
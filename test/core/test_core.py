@@ -270,3 +270,36 @@ def test_get_children_modules_tree():
         types=F.Capacitor, f_filter=lambda x: type(x) is F.Capacitor
     )
     assert mods == {cap1, cap2, *cap3.capacitors}
+
+
+def test_graph_nodes_of_type_index():
+    from faebryk.core.graph import GraphFunctions
+
+    class ModuleSpecial(Module):
+        pass
+
+    class App(Module):
+        m: Module
+        s: ModuleSpecial
+        mif: ModuleInterface
+
+    app = App()
+    G = app.get_graph()
+
+    assert GraphFunctions(G).nodes_of_type(ModuleSpecial) == {app.s}
+    assert GraphFunctions(G).nodes_of_type(Module) == {app, app.m, app.s}
+    assert GraphFunctions(G).nodes_of_types((ModuleSpecial, ModuleInterface)) == {
+        app.s,
+        app.mif,
+    }
+    assert GraphFunctions(G).nodes_of_types(ModuleSpecial | ModuleInterface) == {
+        app.s,
+        app.mif,
+    }
+    assert GraphFunctions(G).nodes_of_type(Node) == set(G.node_projection())
+
+    # index follows graph merges
+    other = ModuleSpecial()
+    app.add(other)
+    G = app.get_graph()
+    assert GraphFunctions(G).nodes_of_type(ModuleSpecial) == {app.s, other}
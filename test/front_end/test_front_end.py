@@ -345,6 +345,52 @@ def test_import_ato(bob: Bob, tmp_path):
     assert isinstance(r1, F.Resistor)
 
 
+def test_prefetch_imports(bob: Bob, tmp_path, monkeypatch: pytest.MonkeyPatch):
+    from atopile import front_end
+
+    prefetched = {}
+    monkeypatch.setattr(
+        front_end.parser,
+        "prefetch",
+        lambda sources, stats: prefetched.update(sources),
+    )
+
+    some_module_search_path = tmp_path / "path" / "to"
+    some_module_search_path.mkdir(parents=True)
+    (some_module_search_path / "a.ato").write_text(
+        'import Resistor; from "b.ato" import B\nmodule A:\n    pass\n',
+        encoding="utf-8",
+    )
+    (some_module_search_path / "b.ato").write_text(
+        'import B2 from "path/to/a.ato"\nmodule B:\n    pass\n',
+        encoding="utf-8",
+    )
+
+    text = dedent(
+        """
+        from "path/to/a.ato" import A
+        from "missing.ato" import M
+        from "thing.py" import T
+        """
+    )
+    ctx = parse_text_as_file(text)
+    bob.search_paths.append(tmp_path)
+    bob.prefetch_imports(bob.index_ast(ctx))
+
+    assert set(prefetched) == {
+        some_module_search_path / "a.ato",
+        some_module_search_path / "b.ato",
+    }
+
+    # files parsed before are not read again
+    prefetched.clear()
+    monkeypatch.setitem(
+        front_end.parser.cache, str(some_module_search_path / "b.ato"), ctx
+    )
+    bob.prefetch_imports(bob.index_ast(ctx))
+    assert set(prefetched) == {some_module_search_path / "a.ato"}
+
+
 @pytest.mark.parametrize(
     "module,count", [("A", 1), ("B", 3), ("C", 5), ("D", 6), ("E", 6)]
 )
@@ -1700,3 +1746,63 @@ def test_reserved_keywords_as_identifiers(name: str, template: str):
 
     with pytest.raises(errors.UserSyntaxError):
         parse_text_as_file(template.format(name=name))
+
+
+def test_block_plans_build_identical_graphs(monkeypatch: pytest.MonkeyPatch):
+    import atopile.front_end as front_end
+
+    text = dedent(
+        """
+        #pragma experiment("FOR_LOOP")
+        #pragma experiment("TRAITS")
+        import Resistor, ElectricPower, has_part_removed
+
+        module Cell:
+            \"\"\"docstring\"\"\"
+            power = new ElectricPower
+            r1 = new Resistor; r2 = new Resistor
+            signal a
+            r1.resistance = 10kohm +/- 5%
+            r2.resistance = 1kohm to 2kohm
+            power.voltage = 3.3V +/- 5%
+            power.hv ~ r1.unnamed[0]; r1.unnamed[1] ~ a
+            a ~ r2.unnamed[0]
+            r2.unnamed[1] ~ power.lv
+            assert r1.resistance within 9kohm to 11kohm
+            pass
+
+        module App:
+            cells = new Cell[4]
+            power = new ElectricPower
+            for cell in cells:
+                cell.power ~ power
+                trait has_part_removed
+        """
+    )
+
+    def _describe(node: L.Node):
+        def _name(n: L.Node) -> str:
+            return n.get_full_name().removeprefix(node.get_full_name())
+
+        out = []
+        for n in node.get_children(direct_only=False, types=L.Node):
+            desc = [_name(n), type(n).__name__]
+            if isinstance(n, L.ModuleInterface):
+                desc.append(sorted(_name(m) for m in n.get_connected()))
+            if isinstance(n, fab_param.Parameter):
+                desc.append(
+                    sorted(
+                        (type(op).__name__, str(op.get_operand_literals()))
+                        for op in n.get_operations()
+                    )
+                )
+            out.append(desc)
+        return sorted(out)
+
+    def _build():
+        return Bob().build_ast(parse_text_as_file(text), TypeRef(["App"]))
+
+    monkeypatch.setattr(front_end, "BLOCK_PLANS", False)
+    expected = _describe(_build())
+    monkeypatch.setattr(front_end, "BLOCK_PLANS", True)
+    assert _describe(_build()) == expected
@@ -2,6 +2,8 @@
 # SPDX-License-Identifier: MIT
 
 import logging
+import os
+import shutil
 from pathlib import Path
 
 import pytest
@@ -18,7 +20,9 @@ from faebryk.libs.kicad.fileformats_latest import (
 )
 from faebryk.libs.kicad.fileformats_sch import C_kicad_sch_file, C_kicad_sym_file
 from faebryk.libs.kicad.fileformats_version import kicad_footprint_file
+from faebryk.libs.sexp import dataclass_sexp
 from faebryk.libs.sexp.dataclass_sexp import JSON_File, SEXP_File
+from faebryk.libs.sexp.decode_cache import DecodeCache
 from faebryk.libs.test.fileformats import (
     _FP_DIR,
     _FPLIB_DIR,  # noqa: F401
@@ -205,3 +209,29 @@ def test_v5_fp_convert(fp_path: Path):
 def test_v6_fp_convert(fp_path: Path):
     fp = kicad_footprint_file(fp_path)
     assert fp.footprint.name.split(":")[-1] == fp_path.stem
+
+
+def test_decode_cache(tmp_path: Path):
+    cache = DecodeCache(tmp_path / "c")
+    pcb_path = tmp_path / PCBFILE.name
+    with dataclass_sexp.decode_cache(cache):
+        shutil.copy(PCBFILE, pcb_path)
+
+        decoded = C_kicad_pcb_file.loads(pcb_path)
+        cached = C_kicad_pcb_file.loads(pcb_path)
+        assert cached is not decoded
+        assert cached.dumps() == decoded.dumps()
+
+        # touched, but same content
+        os.utime(pcb_path, ns=(0, 0))
+        assert C_kicad_pcb_file.loads(pcb_path).dumps() == decoded.dumps()
+
+        # changed content
+        decoded.kicad_pcb.generator = "changed"
+        decoded.dumps(pcb_path)
+        assert C_kicad_pcb_file.loads(pcb_path).kicad_pcb.generator == "changed"
+
+    # not cached outside of the context
+    shutil.rmtree(cache.path)
+    C_kicad_pcb_file.loads(pcb_path)
+    assert not cache.path.exists()
@@ -3,13 +3,16 @@
 
 import logging
 from dataclasses import dataclass, field
+from pathlib import Path
 
 import pytest
+import sexpdata
 from dataclasses_json import CatchAll
 from git import Optional
 
 import faebryk.library._F as F  # noqa: F401  # This is required to prevent a circular import
 from faebryk.libs.kicad.fileformats_latest import C_kicad_pcb_file
+from faebryk.libs.sexp import codec
 from faebryk.libs.sexp.dataclass_sexp import (
     DecodeError,
     SymEnum,
@@ -18,6 +21,7 @@ from faebryk.libs.sexp.dataclass_sexp import (
     loads,
     sexp_field,
 )
+from faebryk.libs.sexp.util import prettify_sexp_string
 from faebryk.libs.test.fileformats import (
     _FPLIB_DIR,  # noqa: F401
     _NETLIST_DIR,  # noqa: F401
@@ -27,7 +31,12 @@ from faebryk.libs.test.fileformats import (
     _SYM_DIR,  # noqa: F401
     _VERSION_DIR,  # noqa: F401
     DEFAULT_VERSION,  # noqa: F401
+    FPFILE,
+    FPLIBFILE,
+    NETFILE,
     PCBFILE,
+    SCHFILE,
+    SYMFILE,
 )
 
 logger = logging.getLogger(__name__)
@@ -156,3 +165,36 @@ def test_print_sexp():
     for obj, path, name_path in level2:
         name = "".join(name_path)
         logger.debug(f"{name:70}  {[type(p).__name__ for p in path + [obj]]}")
+
+
+@pytest.mark.parametrize(
+    "path",
+    [PCBFILE, FPFILE, NETFILE, SCHFILE, SYMFILE, FPLIBFILE],
+    ids=lambda p: p.name,
+)
+def test_codec_matches_sexpdata(path: Path):
+    text = path.read_text(encoding="utf-8")
+    sexp = sexpdata.loads(text)
+
+    assert repr(codec.loads(text)) == repr(sexp)
+    assert codec.dumps(sexp) == prettify_sexp_string(sexpdata.dumps(sexp))
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '(a "with \\"quotes\\" (and parens)" b)',
+        '(a "esc \\n \\t \\\\ \\q" "" nil t 1_0 inf -0.5 1e-05 0x1)',
+        "(a ; comment (b)\n (c))",
+        "(a 'b)",
+        "(a [b c])",
+        "(a b\\ c)",
+        '(a " " "\x0b")',
+        "(a () (()) ((b)) c)",
+    ],
+)
+def test_codec_edge_cases(text: str):
+    sexp = sexpdata.loads(text)
+
+    assert repr(codec.loads(text)) == repr(sexp)
+    assert codec.dumps(sexp) == prettify_sexp_string(sexpdata.dumps(sexp))
@@ -0,0 +1,228 @@
+# This file is part of the faebryk project
+# SPDX-License-Identifier: MIT
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+import pytest
+from requests.exceptions import ReadTimeout
+
+from faebryk.libs.picker.api.api import (
+    ApiClient,
+    ApiHTTPError,
+    ApiQueryError,
+    _decode_component_results,
+    _decode_components_field,
+    _JsonStream,
+)
+from faebryk.libs.picker.api.models import LCSCParams
+
+
+def _component(lcsc: int) -> dict:
+    return {
+        "lcsc": lcsc,
+        "manufacturer_name": "mfr",
+        "part_number": f"PN{lcsc}",
+        "package": "0402",
+        "datasheet_url": "",
+        "description": "",
+        "is_basic": 1,
+        "is_preferred": 0,
+        "stock": 100,
+        "price": [{"qTo": None, "price": 0.1, "qFrom": 1}],
+        "attributes": {},
+    }
+
+
+class StubApi:
+    """
+    Local stand-in for the components API.
+    `handler` maps (method, path, body) to (status, body).
+    The first `stalls` responses stop after a few bytes of the body.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str, str, dict | None], tuple[int, dict]],
+        stalls: int = 0,
+    ):
+        self.handler = handler
+        self.stalls = stalls
+        self.requests: list[tuple[str, str, dict | None]] = []
+        self.inflight = 0
+        self.max_inflight = 0
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def _handle(self, method: str):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length)) if length else None
+                with stub._lock:
+                    stub.requests.append((method, self.path, body))
+                    stub.inflight += 1
+                    stub.max_inflight = max(stub.max_inflight, stub.inflight)
+                try:
+                    status, out = stub.handler(method, self.path, body)
+                finally:
+                    with stub._lock:
+                        stub.inflight -= 1
+                data = json.dumps(out).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                with stub._lock:
+                    stall = stub.stalls > 0
+                    stub.stalls -= stall
+                if stall:
+                    self.wfile.write(data[:8])
+                    self.wfile.flush()
+                    time.sleep(1)
+                    return
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _client(url: str) -> ApiClient:
+    return ApiClient(
+        ApiClient.ApiConfig(
+            api_url=url, batch_size=3, max_inflight=2, retries=2, retry_backoff=0
+        )
+    )
+
+
+def _query_handler(method: str, path: str, body: dict | None):
+    assert method == "POST" and path == "/v0/query"
+    assert body is not None
+    time.sleep(0.05)
+    return 200, {
+        "results": [{"components": [_component(q["lcsc"])]} for q in body["queries"]]
+    }
+
+
+def test_fetch_parts_multiple_batched():
+    queries = [LCSCParams(lcsc=i, quantity=1) for i in range(10)]
+
+    with StubApi(_query_handler) as stub:
+        results = _client(stub.url).fetch_parts_multiple(queries)
+
+    assert [[c.lcsc for c in r] for r in results] == [[i] for i in range(10)]
+    assert sorted(len(body["queries"]) for _, _, body in stub.requests) == [
+        1,
+        3,
+        3,
+        3,
+    ]
+    assert stub.max_inflight == 2
+
+
+def test_fetch_retries_throttled():
+    failures = [503, 429]
+
+    def handler(method: str, path: str, body: dict | None):
+        if failures:
+            return failures.pop(0), {"detail": "busy"}
+        return 200, {"components": [_component(1)]}
+
+    with StubApi(handler) as stub:
+        parts = _client(stub.url).fetch_part_by_lcsc(1)
+
+    assert [c.lcsc for c in parts] == [1]
+    assert len(stub.requests) == 3
+
+
+def test_fetch_gives_up_after_retries():
+    with StubApi(lambda *_: (503, {"detail": "down"})) as stub:
+        with pytest.raises(ApiHTTPError):
+            _client(stub.url).fetch_part_by_lcsc(1)
+
+    assert len(stub.requests) == 3
+
+
+def _lcsc_handler(method: str, path: str, body: dict | None):
+    return 200, {"components": [_component(1)]}
+
+
+def test_fetch_retries_stalled_body():
+    with StubApi(_lcsc_handler, stalls=2) as stub:
+        parts = _client(stub.url)._get(
+            "/v0/component/lcsc/1", _decode_components_field, timeout=0.2
+        )
+
+    assert [c.lcsc for c in parts] == [1]
+    assert len(stub.requests) == 3
+
+
+def test_fetch_stalled_body_times_out():
+    with StubApi(_lcsc_handler, stalls=3) as stub:
+        with pytest.raises(ReadTimeout):
+            _client(stub.url)._get(
+                "/v0/component/lcsc/1", _decode_components_field, timeout=0.2
+            )
+
+    assert len(stub.requests) == 3
+
+
+def test_fetch_parts_multiple_query_errors():
+    def handler(method: str, path: str, body: dict | None):
+        assert body is not None
+        lcscs = [q["lcsc"] for q in body["queries"]]
+        if 4 in lcscs:
+            return 400, {
+                "detail": {
+                    "errors": [
+                        {"message": "not found"} if i == 4 else None for i in lcscs
+                    ]
+                }
+            }
+        return _query_handler(method, path, body)
+
+    queries = [LCSCParams(lcsc=i, quantity=1) for i in range(7)]
+    with StubApi(handler) as stub:
+        with pytest.raises(ApiQueryError) as e:
+            _client(stub.url).fetch_parts_multiple(queries)
+
+    assert [i for i, err in enumerate(e.value.errors) if err is not None] == [4]
+    assert len(e.value.errors) == len(queries)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_json_stream_chunked(chunk_size: int):
+    doc = {
+        "meta": {"next": None, "count": 12345, "tags": ["a", "ü"]},
+        "results": [
+            {"info": 1.5, "components": [_component(i) for i in range(n)]}
+            for n in (0, 1, 3)
+        ],
+        "trailer": 1000,
+    }
+    data = json.dumps(doc, ensure_ascii=False, indent=1).encode()
+    chunks = [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+    results = _JsonStream(chunks).field("results", _decode_component_results)
+
+    assert [[c.lcsc for c in r] for r in results] == [[], [0], [0, 1, 2]]
@@ -0,0 +1,90 @@
+# This file is part of the faebryk project
+# SPDX-License-Identifier: MIT
+
+import time
+from pathlib import Path
+
+import pytest
+from easyeda2kicad.easyeda import easyeda_api
+
+from faebryk.libs.picker.easyeda_cache import EasyedaCache
+from test.libs.picker.test_api import StubApi
+
+KNOWN = {f"C{i}" for i in range(10)} - {"C7"}
+FAILING = {
+    "C20": (500, {"success": False, "code": 500}),
+    "C21": (200, {"success": False, "code": 429}),
+    "C22": (200, {"success": True, "code": 0, "result": None}),
+}
+
+
+def _handler(method: str, path: str, body: dict | None):
+    assert method == "GET"
+    lcsc_id = path.split("/")[3]
+    time.sleep(0.05)
+    if lcsc_id in FAILING:
+        return FAILING[lcsc_id]
+    if lcsc_id not in KNOWN:
+        return 200, {"success": False, "code": 404}
+    return 200, {"success": True, "code": 0, "result": {"lcsc": lcsc_id}}
+
+
+@pytest.fixture
+def stub(monkeypatch: pytest.MonkeyPatch):
+    with StubApi(_handler) as stub:
+        monkeypatch.setattr(
+            easyeda_api,
+            "API_ENDPOINT",
+            stub.url + "/api/products/{lcsc_id}/components?version=6.4.19.5",
+        )
+        yield stub
+
+
+def test_easyeda_cache_prefetch(tmp_path: Path, stub: StubApi):
+    cache = EasyedaCache(tmp_path / "easyeda.sqlite", no_data_max_age=3600, workers=3)
+    ids = [f"C{i}" for i in range(10)]
+
+    cache.prefetch(ids + ids)
+    assert len(stub.requests) == 10
+    assert 1 < stub.max_inflight <= 3
+
+    for lcsc_id in ids:
+        assert cache.get(lcsc_id) == ({"lcsc": lcsc_id} if lcsc_id in KNOWN else {})
+    cache.prefetch(ids)
+    assert len(stub.requests) == 10
+
+    # shared between caches of the same store
+    cache.close()
+    cache = EasyedaCache(tmp_path / "easyeda.sqlite", no_data_max_age=3600)
+    assert cache.get("C3") == {"lcsc": "C3"}
+    assert cache.get("C7") == {}
+    assert len(stub.requests) == 10
+
+
+def test_easyeda_cache_no_data_expires(tmp_path: Path, stub: StubApi):
+    cache = EasyedaCache(tmp_path / "easyeda.sqlite", no_data_max_age=-1)
+
+    assert cache.get("C7") == {}
+    assert cache.lookup("C7") is None
+    assert cache.get("C7") == {}
+    assert len(stub.requests) == 2
+
+    assert cache.get("C3") == {"lcsc": "C3"}
+    assert cache.get("C3") == {"lcsc": "C3"}
+    assert len(stub.requests) == 3
+
+
+def test_easyeda_cache_failures_not_stored(tmp_path: Path, stub: StubApi):
+    cache = EasyedaCache(tmp_path / "easyeda.sqlite", no_data_max_age=3600)
+
+    cache.prefetch(FAILING)
+    assert len(stub.requests) == 3
+    for lcsc_id in FAILING:
+        assert cache.lookup(lcsc_id) is None
+        assert cache.get(lcsc_id) == {}
+        assert cache.lookup(lcsc_id) is None
+    assert len(stub.requests) == 6
+
+    # unknown parts are a definitive answer
+    assert cache.get("C7") == {}
+    assert cache.lookup("C7") == {}
@@ -0,0 +1,117 @@
+# This file is part of the faebryk project
+# SPDX-License-Identifier: MIT
+
+from pathlib import Path
+
+import faebryk.library._F as F
+from faebryk.libs.library import L
+from faebryk.libs.picker.api.models import (
+    Component,
+    LCSCParams,
+    ManufacturerPartParams,
+    ResistorParams,
+)
+from faebryk.libs.picker.api.parts_db import PartsDB
+from faebryk.libs.sets.quantity_sets import Quantity_Interval_Disjoint
+from faebryk.libs.sets.sets import EnumSet
+from faebryk.libs.units import P
+
+
+def _resistor(lcsc: int, ohms: float, package: str, is_basic: int = 1) -> Component:
+    resistance = Quantity_Interval_Disjoint.from_value(
+        L.Range.from_center_rel(ohms * P.ohm, 0.01)
+    )
+    return Component.from_dict(  # type: ignore
+        {
+            "lcsc": lcsc,
+            "manufacturer_name": "mfr",
+            "part_number": f"R{lcsc}",
+            "package": package,
+            "datasheet_url": "",
+            "description": "",
+            "is_basic": is_basic,
+            "is_preferred": 0,
+            "stock": 100,
+            "price": [{"qTo": None, "price": 0.01, "qFrom": 1}],
+            "attributes": {
+                "resistance": resistance.serialize(),
+                "max_power": None,
+                "max_voltage": None,
+            },
+        }
+    )
+
+
+def _query(
+    ohms: tuple[float, float], *packages: F.has_package.Package
+) -> ResistorParams:
+    return ResistorParams(  # type: ignore
+        resistance=L.Range(ohms[0] * P.ohm, ohms[1] * P.ohm),
+        max_power=None,
+        max_voltage=None,
+        package=EnumSet(*packages) if packages else None,
+        qty=1,
+    )
+
+
+PARTS = [
+    _resistor(1, 100, "0402"),
+    _resistor(2, 1000, "0402", is_basic=0),
+    _resistor(3, 1000, "0402"),
+    _resistor(4, 1000, "0603"),
+    _resistor(5, 10000, "0402"),
+]
+
+
+def test_parts_db_remote_results(tmp_path: Path):
+    db = PartsDB(tmp_path / "parts.sqlite", max_age=3600)
+    query = _query((900, 1100))
+    assert db.lookup(query) is None
+
+    db.store([query, LCSCParams(lcsc=5, quantity=1)], [PARTS[1:4], [PARTS[4]]])
+
+    # persisted
+    db.close()
+    db = PartsDB(tmp_path / "parts.sqlite", max_age=3600)
+    assert [c.lcsc for c in db.lookup(query) or []] == [2, 3, 4]
+    assert [c.lcsc for c in db.lookup(LCSCParams(lcsc=3, quantity=1)) or []] == [3]
+    assert [
+        c.lcsc for c in db.lookup(ManufacturerPartParams("mfr", "R4", quantity=1)) or []
+    ] == [4]
+
+    # no dump and not the same query: ask remote
+    assert db.lookup(_query((900, 1200))) is None
+
+    # stale
+    db.max_age = -1
+    assert db.lookup(query) is None
+    assert db.lookup(LCSCParams(lcsc=3, quantity=1)) is None
+
+
+def test_parts_db_range_query(tmp_path: Path):
+    db = PartsDB(tmp_path / "parts.sqlite", max_age=3600)
+    db.import_components("resistors", PARTS)
+
+    def _lcscs(*args) -> list[int]:
+        return [c.lcsc for c in db.lookup(_query(*args)) or []]
+
+    # basic parts first
+    assert _lcscs((900, 1100)) == [3, 4, 2]
+    assert _lcscs((900, 1100), F.has_package.Package.R0402) == [3, 2]
+    assert _lcscs((900, 1100), F.has_package.Package.R0805) == []
+    # packages of other module types
+    assert _lcscs((900, 1100), F.has_package.Package.C0402) == []
+    # tolerance range of the parts has to be within the query
+    assert _lcscs((995, 1100)) == []
+    assert _lcscs((0, 20000)) == [1, 3, 4, 5, 2]
+
+    db.max_results = 2
+    assert _lcscs((0, 20000)) == [1, 3]
+
+
+def test_parts_db_offline(tmp_path: Path):
+    db = PartsDB(tmp_path / "parts.sqlite", max_age=3600, offline=True)
+    db.store([_query((50, 150))], [PARTS[:1]])
+
+    assert [c.lcsc for c in db.lookup(_query((90, 200))) or []] == [1]
+    assert db.lookup(LCSCParams(lcsc=42, quantity=1)) == []
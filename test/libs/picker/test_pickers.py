@@ -5,25 +5,36 @@ import logging
 import sys
 from pathlib import Path
 from tempfile import mkdtemp
+from types import SimpleNamespace
 from typing import TYPE_CHECKING
 
 import pytest
 
 import faebryk.library._F as F
+import faebryk.libs.picker.api.picker_lib as picker_lib
 import faebryk.libs.picker.lcsc as lcsc
+from faebryk.core.graph import GraphFunctions
 from faebryk.core.module import Module
+from faebryk.core.parameter import Expression
 from faebryk.core.solver.defaultsolver import DefaultSolver
 from faebryk.core.solver.nullsolver import NullSolver
+from faebryk.core.solver.utils import Contradiction
 from faebryk.libs.library import L
+from faebryk.libs.picker.api.models import Component
 from faebryk.libs.picker.api.picker_lib import (
     NotCompatibleException,
     check_and_attach_candidates,
     get_candidates,
 )
-from faebryk.libs.picker.picker import PickError, pick_part_recursively
+from faebryk.libs.picker.picker import (
+    PickError,
+    _pick_batch,
+    pick_part_recursively,
+)
+from faebryk.libs.sets.quantity_sets import Quantity_Interval_Disjoint
 from faebryk.libs.sets.sets import EnumSet
 from faebryk.libs.units import P
-from faebryk.libs.util import groupby
+from faebryk.libs.util import Tree, groupby
 
 sys.path.append(str(Path(__file__).parent))
 
@@ -214,6 +225,195 @@ def test_pick_error_group():
     assert isinstance(ex.value.exceptions[0], PickError)
 
 
+def test_find_modules_deduplicates(monkeypatch: pytest.MonkeyPatch):
+    class App(Module):
+        decoupling = L.list_field(4, F.Capacitor)
+        bulk: F.Capacitor
+
+    app = App()
+    for c in app.decoupling:
+        c.capacitance.constrain_subset(L.Range.from_center_rel(100 * P.nF, 0.2))
+    app.bulk.capacitance.constrain_subset(L.Range.from_center_rel(10 * P.uF, 0.2))
+
+    solver = DefaultSolver()
+    solver.update_superset_cache(app)
+
+    processed = []
+
+    def _fetch_parts(queries):
+        return [[] for _ in queries]
+
+    def _process_candidates(module, candidates):
+        processed.append(module)
+        return candidates
+
+    monkeypatch.setattr(picker_lib, "_fetch_parts", _fetch_parts)
+    monkeypatch.setattr(picker_lib, "_process_candidates", _process_candidates)
+
+    modules = [*app.decoupling, app.bulk]
+    parts = picker_lib._find_modules(Tree({m: Tree() for m in modules}), solver)
+
+    assert parts.keys() == set(modules)
+    assert len(processed) == 2
+
+
+def test_candidate_fingerprint_pin_heuristic():
+    class Pinned(Module):
+        a: F.Electrical
+
+        @L.rt_field
+        def pin_association_heuristic(self):
+            return F.has_pin_association_heuristic_lookup_table(
+                mapping={self.a: ["A"]}, accept_prefix=False, case_sensitive=False
+            )
+
+    c1, c2 = F.Capacitor(), F.Capacitor()
+    p1, p2 = Pinned(), Pinned()
+
+    fingerprint = picker_lib._candidate_fingerprint
+    assert fingerprint(c1) == fingerprint(c2)
+    # checked against the pinmap of each instance
+    assert fingerprint(p1) != fingerprint(p2)
+
+
+def test_compatible_parameters_grouped(monkeypatch: pytest.MonkeyPatch):
+    class App(Module):
+        decoupling = L.list_field(4, F.Capacitor)
+        bulk: F.Capacitor
+
+    app = App()
+    for c in app.decoupling:
+        c.capacitance.constrain_subset(L.Range.from_center_rel(100 * P.nF, 0.2))
+    app.bulk.capacitance.constrain_subset(L.Range.from_center_rel(10 * P.uF, 0.2))
+
+    solver = DefaultSolver()
+    solver.update_superset_cache(app)
+
+    checked = []
+    monkeypatch.setattr(picker_lib, "get_raw", checked.append)
+
+    part = Component(
+        lcsc=1,
+        manufacturer_name="",
+        part_number="",
+        package="0402",
+        datasheet_url="",
+        description="",
+        is_basic=1,
+        is_preferred=0,
+        stock=1,
+        price=[],
+        attributes={
+            "capacitance": Quantity_Interval_Disjoint(
+                L.Range.from_center_rel(100 * P.nF, 0.1)
+            ).serialize()
+        },
+    )
+    modules = [*app.decoupling, app.bulk]
+    mappings = picker_lib._get_compatible_parameters_grouped(
+        [(m, part) for m in modules], solver
+    )
+
+    # checked once for the decoupling capacitors and once for the bulk one
+    assert len(checked) == 2
+    for m in app.decoupling:
+        mapping = mappings[m]
+        assert isinstance(mapping, dict)
+        assert mapping[m.capacitance] == part.attribute_literals["capacitance"]
+    bulk = mappings[app.bulk]
+    assert isinstance(bulk, NotCompatibleException)
+    assert bulk.module is app.bulk
+    assert bulk.param is app.bulk.capacitance
+
+
+def test_pick_batch_bisects(monkeypatch: pytest.MonkeyPatch):
+    modules = [L.Module() for _ in range(16)]
+    bad = modules[5]
+    checks = []
+
+    def _get_compatible_parameters(module, c, solver):
+        return {module: c}
+
+    def _check_parameters_compatible(mappings, solver, allow_not_deducible):
+        checks.append(len(mappings))
+        if any(bad in mapping for mapping in mappings):
+            raise Contradiction("bad pick", involved=[], mutator=None)  # type: ignore
+
+    monkeypatch.setattr(
+        picker_lib, "_get_compatible_parameters", _get_compatible_parameters
+    )
+    monkeypatch.setattr(
+        picker_lib, "_check_parameters_compatible", _check_parameters_compatible
+    )
+
+    batch = [(m, SimpleNamespace(lcsc_display=f"C{i}")) for i, m in enumerate(modules)]
+    picked = _pick_batch(batch, NullSolver())  # type: ignore
+
+    assert picked == [p for p in batch if p[0] is not bad]
+    # one failing module costs two checks per bisection level
+    assert len(checks) == 1 + 2 * 4
+
+
+def test_pick_batch_leaves_no_predicates(monkeypatch: pytest.MonkeyPatch):
+    rdiv = F.ResistorVoltageDivider()
+    rdiv.ratio.constrain_subset(L.Range.from_center_rel(0.5, 0.1))
+    r_top, r_bottom = rdiv.r_top, rdiv.r_bottom
+
+    solver = DefaultSolver()
+    solver.update_superset_cache(rdiv)
+
+    def _get_compatible_parameters_grouped(module_candidates, solver):
+        return {m: {m.resistance: c.resistance} for m, c in module_candidates}
+
+    monkeypatch.setattr(
+        picker_lib,
+        "_get_compatible_parameters_grouped",
+        _get_compatible_parameters_grouped,
+    )
+
+    def _part(resistance):
+        return SimpleNamespace(
+            resistance=L.Range.from_center_rel(resistance, 0.01),
+            lcsc_display=str(resistance),
+        )
+
+    def _expressions():
+        return GraphFunctions(rdiv.get_graph()).nodes_of_type(Expression)
+
+    expressions = _expressions()
+    state = solver.state
+
+    # the first candidates give a ratio of 1/11
+    batch = [(r_top, _part(10 * P.kohm)), (r_bottom, _part(1 * P.kohm))]
+    assert _pick_batch(batch, solver) == batch[:1]
+    assert _expressions() == expressions
+    # the solver keeps its state of the design
+    assert solver.state is state
+
+    # the design is still solvable with the bottom resistor fitting the top one
+    batch = [(r_top, _part(10 * P.kohm)), (r_bottom, _part(10 * P.kohm))]
+    assert _pick_batch(batch, solver) == batch
+    assert _expressions() == expressions
+
+
+def test_copy_operables_only_reachable():
+    class App(Module):
+        rdiv1: F.ResistorVoltageDivider
+        rdiv2: F.ResistorVoltageDivider
+
+    app = App()
+    app.rdiv1.ratio.constrain_subset(L.Range.from_center_rel(0.5, 0.1))
+    app.rdiv2.ratio.constrain_subset(L.Range.from_center_rel(0.1, 0.1))
+
+    copies = picker_lib._copy_operables([app.rdiv1.r_top.resistance])
+
+    assert app.rdiv1.r_bottom.resistance in copies
+    assert app.rdiv1.ratio in copies
+    assert app.rdiv2.r_top.resistance not in copies
+    assert app.rdiv2.ratio not in copies
+    assert all(copy.get_graph() is not app.get_graph() for copy in copies.values())
+
+
 def test_pick_dependency_simple():
     class App(Module):
         r1: F.Resistor
@@ -9,6 +9,7 @@ import pytest
 
 from faebryk.libs.util import (
     DAG,
+    EquivalenceClasses,
     SharedReference,
     assert_once,
     complete_type_string,
@@ -205,3 +206,18 @@ def test_dag():
 def test_complete_type_string():
     a = {"a": 1, 5: object(), "c": {"a": 1}}
     assert complete_type_string(a) == "dict[str | int, int | object | dict[str, int]]"
+
+
+def test_equivalence_classes():
+    eq = EquivalenceClasses[int](range(6))
+    eq.add_eq(0, 1)
+    eq.add_eq(2, 3, 4)
+    eq.add_eq(1, 4)
+    # already equal
+    eq.add_eq(3, 0)
+
+    assert eq.classes[0] == {0, 1, 2, 3, 4}
+    assert all(eq.is_eq(0, i) for i in range(5))
+    assert not eq.is_eq(0, 5)
+    assert sorted(map(sorted, eq.get())) == [[0, 1, 2, 3, 4], [5]]
+    assert eq.get(only_multi=True) == [{0, 1, 2, 3, 4}]
@@ -0,0 +1,170 @@
+import textwrap
+import threading
+from pathlib import Path
+
+import pytest
+
+from atopile import front_end, parse
+from atopile.front_end import Bob
+from atopile.lsp.lsp_diagnostics import DocumentDiagnostics
+from atopile.lsp.lsp_worker import BuildWorker, Diagnostics
+
+SRC = textwrap.dedent("""
+    import Resistor
+
+    module A:
+        r = new Nope
+
+    module B:
+        r = new Resistor
+        r.resistance = 1kohm +/- 1%
+
+    module C:
+        b = new B
+""")
+
+
+@pytest.fixture
+def built(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    bob = Bob()
+    monkeypatch.setattr(front_end, "bob", bob)
+    built = []
+    build_context = bob.build_context
+
+    def _build_context(context, ref):
+        built.append(str(ref))
+        return build_context(context, ref)
+
+    monkeypatch.setattr(bob, "build_context", _build_context)
+    return built
+
+
+def _lines(diagnostics) -> list[tuple[int, str]]:
+    return sorted((d.range.start.line, d.message) for d in diagnostics)
+
+
+def test_diagnostics_reuse_unchanged_blocks(tmp_path: Path, built: list[str]):
+    diagnostics = DocumentDiagnostics()
+    path = tmp_path / "doc.ato"
+    missing = "No class or block definition found for `Nope`"
+
+    assert _lines(diagnostics.get(path, SRC)) == [(4, missing)]
+    assert built == ["A", "B", "C"]
+
+    # moved blocks keep their results
+    built.clear()
+    assert _lines(diagnostics.get(path, "\n\n" + SRC)) == [(6, missing)]
+    assert built == []
+
+    # changed blocks are built again, with the blocks depending on them
+    built.clear()
+    src = SRC.replace("module B:", "module B:\n    x = new Nope2")
+    assert _lines(diagnostics.get(path, src)) == [
+        (4, missing),
+        (7, "No class or block definition found for `Nope2`"),
+    ]
+    assert built == ["B", "C"]
+
+    # only syntax errors while the document doesn't parse
+    built.clear()
+    broken = diagnostics.get(path, SRC.replace("module A:", "module A"))
+    assert broken and all("Nope" not in d.message for d in broken)
+    assert built == []
+
+    assert diagnostics.get(path, SRC + "\n", cancelled=lambda: True) is None
+
+
+def test_diagnostics_imports_changed_on_disk(tmp_path: Path, built: list[str]):
+    diagnostics = DocumentDiagnostics()
+    path = tmp_path / "doc.ato"
+    (tmp_path / "lib.ato").write_text("module L:\n    pass\n", encoding="utf-8")
+    src = 'from "lib.ato" import L\n\nmodule A:\n    l = new L\n    l.x = 1\n'
+
+    assert diagnostics.get(path, src) == []
+    assert diagnostics.get(path, src) == []
+    assert built == ["A"]
+
+    (tmp_path / "lib.ato").write_text(
+        "module L:\n    pass\n\nmodule M:\n    pass\n", encoding="utf-8"
+    )
+    assert diagnostics.get(path, src) == []
+    assert built == ["A", "A"]
+
+
+def test_diagnostics_import_after_block(tmp_path: Path, built: list[str]):
+    diagnostics = DocumentDiagnostics()
+    path = tmp_path / "doc.ato"
+    (tmp_path / "lib.ato").write_text("module L:\n    pass\n", encoding="utf-8")
+    src = 'module A:\n    l = new L\n\nfrom "lib.ato" import L\n'
+
+    assert diagnostics.get(path, src) == []
+    assert built == ["A"]
+
+
+def test_build_worker_supersedes(tmp_path: Path, built: list[str]):
+    published: list[Diagnostics] = []
+    failures: list[str] = []
+    done = threading.Event()
+
+    def _on_diagnostics(result: Diagnostics):
+        published.append(result)
+        if result.version == 3:
+            done.set()
+
+    worker = BuildWorker(_on_diagnostics, failures.append, in_process=True)
+    path = tmp_path / "doc.ato"
+    try:
+        for version in [1, 2, 3]:
+            worker.diagnose(path.as_uri(), version, path, SRC)
+        assert done.wait(timeout=60)
+    finally:
+        worker.close()
+
+    assert not failures
+    assert [r.version for r in published] == sorted(r.version for r in published)
+    assert published[-1].version == 3
+    assert len(published[-1].diagnostics) == 1
+
+
+def test_build_worker_process_parses_imports_in_parallel(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    # cold parse tree cache, so the imports are parsed in the parse pool
+    monkeypatch.setenv("FBRK_AST_CACHE_PATH", str(tmp_path / "ast.sqlite"))
+    monkeypatch.setenv("FBRK_PARSE_WORKERS", "2")
+    size = 0
+    for i in range(2):
+        lib = "".join(f"module L{i}_{j}:\n    pass\n" for j in range(5000))
+        (tmp_path / f"lib{i}.ato").write_text(lib, encoding="utf-8")
+        size += len(lib)
+    assert size > parse._PARALLEL_MIN_SIZE
+
+    published: list[Diagnostics] = []
+    failures: list[str] = []
+    done = threading.Event()
+
+    def _on_diagnostics(result: Diagnostics):
+        published.append(result)
+        done.set()
+
+    def _on_failure(message: str):
+        failures.append(message)
+        done.set()
+
+    worker = BuildWorker(_on_diagnostics, _on_failure, in_process=False)
+    path = tmp_path / "doc.ato"
+    src = (
+        'from "lib0.ato" import L0_0\n'
+        'from "lib1.ato" import L1_0\n'
+        "module A:\n"
+        "    a = new L0_0\n"
+        "    b = new L1_0\n"
+    )
+    try:
+        worker.diagnose(path.as_uri(), 1, path, src)
+        assert done.wait(timeout=300)
+    finally:
+        worker.close()
+
+    assert not failures
+    assert [r.diagnostics for r in published] == [[]]
@@ -14,3 +14,162 @@ def test_syntax_error():
         parse_text_as_file(src)
 
     assert exc_info.value.origin_start is not None
+
+
+SRC = textwrap.dedent("""
+    #pragma experiment("FOR_LOOP")
+    import Resistor
+
+    module A:
+        \"\"\"doc\"\"\"
+        r = new Resistor  # comment
+        r.resistance = 10kohm +/- 5%
+
+        for x in [r]:
+            x.unnamed[0] ~ x.unnamed[1]
+""")
+
+
+def test_parse_cache_roundtrip():
+    from antlr4 import InputStream
+
+    from atopile.parse_cache import dump_tree, load_tree
+    from atopile.parse_utils import PygmentsLexerReconstructor, format_src_info
+    from atopile.parser.AtoParser import AtoParser
+
+    tree = parse_text_as_file(SRC, "a.ato")
+    input = InputStream(SRC)
+    input.name = "b.ato"
+    loaded = load_tree(dump_tree(tree), input)
+
+    assert loaded.toStringTree(recog=loaded.parser) == tree.toStringTree(
+        recog=tree.parser
+    )
+    assert [
+        (t.type, t.channel, t.text, t.line, t.column, t.tokenIndex)
+        for t in loaded.parser.getInputStream().tokens
+    ] == [
+        (t.type, t.channel, t.text, t.line, t.column, t.tokenIndex)
+        for t in tree.parser.getInputStream().tokens
+    ]
+
+    # source locations and snippets used for error reporting
+    def _assigns(t):
+        blockdef = t.stmt(2).compound_stmt().blockdef()
+        return [
+            s.simple_stmts().simple_stmt(0).assign_stmt()
+            for s in blockdef.block().stmt()
+            if s.simple_stmts() and s.simple_stmts().simple_stmt(0).assign_stmt()
+        ]
+
+    for a, b in zip(_assigns(tree), _assigns(loaded), strict=True):
+        assert isinstance(b, AtoParser.Assign_stmtContext)
+        assert format_src_info(b) == format_src_info(a).replace("a.ato", "b.ato")
+        assert (
+            PygmentsLexerReconstructor.from_ctx(b, 1, 1).get_code()
+            == PygmentsLexerReconstructor.from_ctx(a, 1, 1).get_code()
+        )
+
+
+def test_parse_cache_skips_parser(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    from atopile import parse, parse_cache
+
+    cache = parse_cache.ParseCache(tmp_path / "ast.sqlite", max_age=3600)
+    monkeypatch.setattr(parse_cache, "get_parse_cache", lambda: cache)
+
+    path = tmp_path / "a.ato"
+    path.write_text(SRC, encoding="utf-8")
+    tree = parse.FileParser().get_ast_from_file(path)
+
+    def _no_parse(*args, **kwargs):
+        raise AssertionError("parsed again")
+
+    parse_input = parse._parse_input
+    monkeypatch.setattr(parse, "_parse_input", _no_parse)
+    cached = parse.FileParser().get_ast_from_file(path)
+    assert cached is not tree
+    assert cached.getText() == tree.getText()
+    assert cached.start.getInputStream().name == str(path)
+    assert parse.FileParser().get_ast_from_text(SRC, path).getText() == tree.getText()
+
+    # changed sources are parsed again, syntax errors are not stored
+    with pytest.raises(AssertionError, match="parsed again"):
+        parse.parser.get_ast_from_text(SRC + "\n", path)
+    monkeypatch.setattr(parse, "_parse_input", parse_input)
+    # neither is text that's not read from a file
+    parse.parser.get_ast_from_text(SRC + "\n", path)
+    assert cache.lookup(parse_cache.source_key(SRC + "\n")) is None
+    with pytest.raises(ExceptionGroup):
+        parse.parser.get_ast_from_text("a = 1\n b = 2\n")
+    assert cache.lookup(parse_cache.source_key("a = 1\n b = 2\n")) is None
+
+
+def test_parse_cache_failing_db(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    from atopile import parse, parse_cache
+
+    cache = parse_cache.ParseCache(tmp_path / "ast.sqlite", max_age=3600)
+    monkeypatch.setattr(parse_cache, "get_parse_cache", lambda: cache)
+    path = tmp_path / "a.ato"
+    path.write_text(SRC, encoding="utf-8")
+
+    # a failing database only costs the cache
+    cache.close()
+    tree = parse.FileParser().get_ast_from_file(path)
+    assert tree.getText() == parse_text_as_file(SRC).getText()
+
+
+def test_parse_cache_refreshed_on_lookup(tmp_path):
+    import time
+
+    from atopile import parse_cache
+
+    age = 2 * parse_cache._REFRESH_AFTER
+    cache = parse_cache.ParseCache(tmp_path / "ast.sqlite", max_age=2 * age)
+    cache.store("key", b"data")
+    with cache._db:
+        cache._db.execute("UPDATE trees SET stored = ?", [time.time() - age])
+    assert cache.lookup("key") == b"data"
+    cache.close()
+
+    # still used, so not expired
+    cache = parse_cache.ParseCache(
+        tmp_path / "ast.sqlite", max_age=parse_cache._REFRESH_AFTER + 1
+    )
+    assert cache.lookup("key") == b"data"
+
+
+def test_parse_prefetch(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    from atopile import parse, parse_cache
+
+    cache = parse_cache.ParseCache(tmp_path / "ast.sqlite", max_age=3600)
+    monkeypatch.setattr(parse_cache, "get_parse_cache", lambda: cache)
+    monkeypatch.setattr(parse, "_PARALLEL_MIN_SIZE", 0)
+    monkeypatch.setattr(parse, "PARSE_WORKERS", 2)
+
+    sources = {
+        tmp_path / f"{i}.ato": SRC.replace("module A", f"module A{i}") for i in range(3)
+    }
+    sources[tmp_path / "bad.ato"] = "a = 1\n b = 2\n"
+    for path, src in sources.items():
+        path.write_text(src, encoding="utf-8")
+
+    stats = {path: parse.stat_source(path) for path in sources}
+    # edited after being read, before being parsed
+    edited = tmp_path / "2.ato"
+    edited.write_text(sources[edited] + "\n", encoding="utf-8")
+
+    file_parser = parse.FileParser()
+    file_parser.prefetch(sources, stats)
+    assert file_parser.changed_files() == [str(edited)]
+
+    assert set(file_parser.cache) == {str(tmp_path / f"{i}.ato") for i in range(3)}
+    for i in range(3):
+        path = tmp_path / f"{i}.ato"
+        tree = file_parser.get_ast_from_file(path)
+        assert tree.getText() == parse_text_as_file(sources[path]).getText()
+        assert tree.start.getInputStream().name == str(path)
+        assert cache.lookup(parse_cache.source_key(sources[path])) is not None
+
+    # syntax errors are reported on use
+    with pytest.raises(UserSyntaxError):
+        file_parser.get_ast_from_file(tmp_path / "bad.ato")
@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from faebryk.libs.test.times import Times
+
+logger = logging.getLogger(__name__)
+
+SESSION = Path(__file__).parent / "common" / "resources" / "lsp" / "edit_session.jsonl"
+# Time between requests checking the server answers while building [s]
+PROBE_INTERVAL = 0.1
+
+
+class _LspClient:
+    """Talks to a language server over stdio, timestamping what it receives."""
+
+    def __init__(self, cwd: Path, env: dict[str, str]):
+        self.process = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                "from atopile.lsp import LSP_SERVER; LSP_SERVER.start_io()",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=cwd,
+            env=env,
+        )
+        self.received: list[tuple[float, dict]] = []
+        self._next_id = 0
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        assert self.process.stdout is not None
+        while True:
+            length = None
+            while (header := self.process.stdout.readline()) not in (b"\r\n", b""):
+                if header.lower().startswith(b"content-length:"):
+                    length = int(header.split(b":")[1])
+            if not header or length is None:
+                return
+            message = json.loads(self.process.stdout.read(length))
+            self.received.append((time.perf_counter(), message))
+
+    def send(self, method: str, params: dict, request: bool = False) -> int | None:
+        assert self.process.stdin is not None
+        message = {"jsonrpc": "2.0", "method": method, "params": params}
+        if request:
+            self._next_id += 1
+            message["id"] = self._next_id
+        data = json.dumps(message).encode()
+        self.process.stdin.write(b"Content-Length: %d\r\n\r\n" % len(data) + data)
+        self.process.stdin.flush()
+        return message.get("id")
+
+    def wait_for(self, predicate, timeout: float) -> dict:
+        end = time.perf_counter() + timeout
+        while time.perf_counter() < end:
+            for _, message in self.received:
+                if predicate(message):
+                    return message
+            time.sleep(0.01)
+        raise TimeoutError()
+
+    def close(self):
+        self.process.kill()
+        self.process.wait()
+
+
+def _replay(tmp_path: Path, worker: bool) -> dict[str, list[float]]:
+    """
+    Replay the recorded edit session against a server.
+
+    Returns per published diagnostics the latency since the change of that
+    version was sent, and per probe request the time the server took to
+    answer.
+    """
+    tmp_path.mkdir(parents=True, exist_ok=True)
+    (tmp_path / "ato.yaml").write_text(
+        "requires-atopile: ^0.3.0\nbuilds:\n  default:\n    entry: app.ato:App\n",
+        encoding="utf-8",
+    )
+    uri = (tmp_path / "app.ato").as_uri()
+    events = [json.loads(line) for line in SESSION.read_text().splitlines()]
+
+    env = {
+        **os.environ,
+        "NONINTERACTIVE": "1",
+        "FBRK_LSP_BUILD_WORKER": "1" if worker else "0",
+    }
+    client = _LspClient(tmp_path, env)
+    try:
+        client.send(
+            "initialize",
+            {"processId": None, "rootUri": tmp_path.as_uri(), "capabilities": {}},
+            request=True,
+        )
+        client.wait_for(lambda m: m.get("id") == 1, timeout=60)
+        client.send("initialized", {})
+
+        sent: dict[int, float] = {}
+        probes: dict[int, float] = {}
+        version = 0
+        start = time.perf_counter()
+        next_probe = start
+        for event in events:
+            while (now := time.perf_counter()) < start + event["time"]:
+                if now >= next_probe:
+                    probe = client.send("atopile/probe", {}, request=True)
+                    assert probe is not None
+                    probes[probe] = now
+                    next_probe = now + PROBE_INTERVAL
+                time.sleep(0.005)
+
+            document = {"uri": uri, "version": version}
+            match event["method"]:
+                case "textDocument/didOpen":
+                    version = 1
+                    (tmp_path / "app.ato").write_text(event["text"], encoding="utf-8")
+                    client.send(
+                        event["method"],
+                        {
+                            "textDocument": {
+                                **document,
+                                "version": version,
+                                "languageId": "ato",
+                                "text": event["text"],
+                            }
+                        },
+                    )
+                case "textDocument/didChange":
+                    version += 1
+                    client.send(
+                        event["method"],
+                        {
+                            "textDocument": {**document, "version": version},
+                            "contentChanges": event["changes"],
+                        },
+                    )
+                case "textDocument/didSave":
+                    client.send(event["method"], {"textDocument": document})
+            sent.setdefault(version, time.perf_counter())
+
+        client.wait_for(
+            lambda m: m.get("method") == "textDocument/publishDiagnostics"
+            and m["params"].get("version") == version,
+            timeout=120,
+        )
+
+        latencies = [
+            t - sent[m["params"]["version"]]
+            for t, m in client.received
+            if m.get("method") == "textDocument/publishDiagnostics"
+        ]
+        answers = [
+            t - probes[m["id"]] for t, m in client.received if m.get("id") in probes
+        ]
+        return {"latency": latencies, "probe": answers}
+    finally:
+        client.close()
+
+
+@pytest.mark.slow
+def test_performance_lsp_edit_session(tmp_path: Path):
+    timings = Times(multi_sample_strategy=Times.MultiSampleStrategy.ALL)
+
+    for worker in [False, True]:
+        mode = "worker" if worker else "thread"
+        results = _replay(tmp_path / mode, worker)
+        for name, samples in results.items():
+            assert samples
+            for sample in samples:
+                timings._add(f"{name} {mode}", sample)
+
+    logger.info(f"\n{timings}")
+    for name in ["latency", "probe"]:
+        thread = timings.get(f"{name} thread", Times.MultiSampleStrategy.P80)
+        worker = timings.get(f"{name} worker", Times.MultiSampleStrategy.P80)
+        logger.info(f"----> P80 {name}: thread {thread:.3f}s, worker {worker:.3f}s")